@@ -1,15 +1,29 @@
 from awscli.customizations.commands import BasicCommand
+from kinesis_awscli_plugin.copystream import CopyCommand
+from kinesis_awscli_plugin.export import ExportCommand
+from kinesis_awscli_plugin.getfleetmetrics import GetFleetMetricsCommand
 from kinesis_awscli_plugin.getshardmetrics import GetShardMetricsCommand
 from kinesis_awscli_plugin.getstreammetrics import GetStreamMetricsCommand
+from kinesis_awscli_plugin.lag import LagCommand
+from kinesis_awscli_plugin.plancapacity import PlanCapacityCommand
 from kinesis_awscli_plugin.pull import PullCommand
 from kinesis_awscli_plugin.push import PushCommand
+from kinesis_awscli_plugin.readshm import ReadShmCommand
+from kinesis_awscli_plugin.servemetrics import ServeMetricsCommand
 
 
 def awscli_initialize(event_emitter):
     event_emitter.register('building-command-table.kinesis', inject_commands)
 
 def inject_commands(command_table, session, **kwargs):
+    command_table['copy'] = CopyCommand(session)
+    command_table['export'] = ExportCommand(session)
+    command_table['get-fleet-metrics'] = GetFleetMetricsCommand(session)
     command_table['get-shard-metrics'] = GetShardMetricsCommand(session)
     command_table['get-stream-metrics'] = GetStreamMetricsCommand(session)
+    command_table['lag'] = LagCommand(session)
+    command_table['plan-capacity'] = PlanCapacityCommand(session)
     command_table['pull'] = PullCommand(session)
     command_table['push'] = PushCommand(session)
+    command_table['read-shm'] = ReadShmCommand(session)
+    command_table['serve-metrics'] = ServeMetricsCommand(session)
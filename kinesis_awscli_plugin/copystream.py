@@ -0,0 +1,262 @@
+import copy
+import datetime
+import logging
+import sys
+from threading import Event
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.lib.batchqueue import BatchQueue
+from kinesis_awscli_plugin.lib.checkpointer import Checkpointer
+from kinesis_awscli_plugin.lib.ratelimiter import TokenBucket
+from kinesis_awscli_plugin.lib.recordscopier import RecordsCopier
+from kinesis_awscli_plugin.lib.recordspuller import RecordsPuller
+from kinesis_awscli_plugin.lib.shardlineage import ShardLineage
+from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+from kinesis_awscli_plugin.lib.utils import Utils
+
+logger = logging.getLogger(__name__)
+
+
+class CopyCommand(BasicCommand):
+
+    NAME = 'copy'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('This command copies the records of a Kinesis stream to '
+                   'another stream, for example in another region or with a '
+                   'different number of shards. All source shards are read '
+                   'concurrently and written with PutRecords, child shards '
+                   'of a split or merge once their parents were read to '
+                   'their end. This keeps the order of the records of a '
+                   'partition key across a reshard. Partition keys and '
+                   'payload bytes are kept as they are. The command returns '
+                   'when every shard was copied to its end or the duration '
+                   'is over.')
+
+    # payload bytes that may be queued for writing
+    QUEUE_BYTES = 64 * 1024 * 1024
+
+    # write limits of a Kinesis shard
+    SHARD_RECORDS_PER_SECOND = 1000
+    SHARD_BYTES_PER_SECOND = 1024 * 1024
+
+    SHARD_ITERATOR_TYPES = {
+        'latest': 'LATEST',
+        'trim-horizon': 'TRIM_HORIZON',
+        'at-timestamp': 'AT_TIMESTAMP',
+    }
+
+    ARG_TABLE = [
+        {
+            'name': 'source-stream',
+            'required': True,
+            'help_text': 'Specifies the stream the records are read from'
+        },
+        {
+            'name': 'target-stream',
+            'required': True,
+            'help_text': 'Specifies the stream the records are written to'
+        },
+        {
+            'name': 'target-region',
+            'required': False,
+            'help_text':
+            'Region of the target stream. Defaults to the region of the '
+            'source stream.'
+        },
+        {
+            'name': 'shard-id',
+            'required': False,
+            'help_text': 'Specifies the source shard that should be copied. '
+            'If not specified all shards of the source stream are copied.'
+        },
+        {
+            'name': 'start',
+            'default': 'latest',
+            'choices': sorted(SHARD_ITERATOR_TYPES.keys()),
+            'help_text':
+            'Specifies where copying starts if there is no checkpoint for '
+            'the shard. Defaults to "latest".'
+        },
+        {
+            'name': 'timestamp',
+            'required': False,
+            'help_text': 'The arrival time in UTC of the first copied records '
+            'for --start at-timestamp. Time format is ISO8601. '
+            'Example: "{0}".'.format(
+                TimeUtils.iso8601(datetime.datetime.utcnow() -
+                                  datetime.timedelta(hours=1)))
+        },
+        {
+            'name': 'checkpoint-file',
+            'required': False,
+            'help_text':
+            'Specifies a file that stores the sequence number of the last '
+            'copied record per source shard. Copying resumes after the '
+            'checkpointed records.'
+        },
+        {
+            'name': 'pull-delay',
+            'cli_type_name': 'integer',
+            'default': '200',
+            'help_text':
+            'Specifies the delay in milliseconds between two GetRecords calls '
+            'on a source shard. Defaults to 200 milliseconds.'
+        },
+        {
+            'name': 'duration',
+            'cli_type_name': 'integer',
+            'default': '-1',
+            'help_text':
+            'Specifies how many seconds the command should copy. '
+            'Defaults to -1 (infinite).'
+        },
+        {
+            'name': 'max-records-per-second',
+            'cli_type_name': 'integer',
+            'required': False,
+            'help_text':
+            'Maximum number of records written to the target stream per '
+            'second. Defaults to the write limit of the open target shards, '
+            '1000 records per shard.'
+        },
+        {
+            'name': 'max-bytes-per-second',
+            'cli_type_name': 'integer',
+            'required': False,
+            'help_text':
+            'Maximum number of bytes written to the target stream per second. '
+            'Defaults to the write limit of the open target shards, 1 MB per '
+            'shard.'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        self.validate_args(args)
+        self.source_helper = KinesisHelper(self._session, parsed_globals)
+        target_globals = parsed_globals
+        if args.target_region is not None:
+            target_globals = copy.copy(parsed_globals)
+            target_globals.region = args.target_region
+        self.target_helper = KinesisHelper(self._session, target_globals)
+        self.checkpointer = None
+        if args.checkpoint_file is not None:
+            self.checkpointer = Checkpointer(args.checkpoint_file)
+        self._call(args, parsed_globals)
+        return 0
+
+    def validate_args(self, args):
+        if args.start == 'at-timestamp':
+            if args.timestamp is None:
+                raise ValueError(
+                    'Parameter --timestamp is required for --start at-timestamp')
+            args.timestamp = TimeUtils.to_datetime(args.timestamp)
+        if args.source_stream == args.target_stream and \
+                args.target_region is None:
+            raise ValueError('Source and target stream must be different')
+
+    def _call(self, options, parsed_globals):
+        stop_flag = Event()
+        if options.shard_id is None:
+            lineage = ShardLineage(
+                self.source_helper.stream_shard_descriptions(
+                    options.source_stream))
+        else:
+            lineage = ShardLineage([{'ShardId': options.shard_id}])
+
+        queue = BatchQueue(self.QUEUE_BYTES)
+        records_limiter, bytes_limiter = self.create_limiters(options)
+        copier = RecordsCopier(stop_flag, queue, self.target_helper,
+                               options.target_stream, int(options.pull_delay),
+                               self.checkpointer, records_limiter,
+                               bytes_limiter)
+        copier.start()
+
+        self.read_shards(stop_flag, queue, options, lineage)
+        # the copier leaves once all pulled records were written
+        copier.join()
+        sys.stderr.write('Copied %d records, %d writes were retried\n' %
+                         (copier.records_copied, copier.records_retried))
+
+    def read_shards(self, stop_flag, queue, options, lineage):
+        '''
+        Reads the root shards and then the children of every shard that was
+        read to its end. The records of a parent are queued before the ones
+        of its children and the copier writes them in queue order.
+        '''
+        pullers = {}
+        ended_shard_ids = set()
+
+        def start(shard_ids):
+            for shard_id in shard_ids:
+                puller = self.create_shard_puller(stop_flag, queue, options,
+                                                  shard_id)
+                puller.start()
+                pullers[shard_id] = puller
+
+        start(lineage.roots())
+        try:
+            while len(pullers) > 0 and not stop_flag.is_set():
+                stop_flag.wait(0.2)
+                for shard_id, puller in list(pullers.items()):
+                    if puller.is_alive():
+                        continue
+                    del pullers[shard_id]
+                    if puller.reached_shard_end:
+                        ended_shard_ids.add(shard_id)
+                        start(lineage.ready_children(shard_id,
+                                                     ended_shard_ids))
+        except KeyboardInterrupt:
+            pass
+        logger.debug('Shutting down...')
+        stop_flag.set()
+        for puller in pullers.values():
+            puller.join()
+
+    def create_shard_puller(self, stop_flag, queue, options, shard_id):
+        return RecordsPuller(
+            stop_flag,
+            queue,
+            self.source_helper.client,
+            self.create_shard_iterator(options, shard_id),
+            int(options.pull_delay),
+            int(options.duration),
+            shard_id=shard_id,
+            iterator_factory=self.shard_iterator_factory(options, shard_id), )
+
+    def create_limiters(self, options):
+        records_per_second = options.max_records_per_second
+        bytes_per_second = options.max_bytes_per_second
+        if records_per_second is None or bytes_per_second is None:
+            open_shards = self.target_helper.open_shard_count(
+                options.target_stream)
+            if records_per_second is None:
+                records_per_second = open_shards * self.SHARD_RECORDS_PER_SECOND
+            if bytes_per_second is None:
+                bytes_per_second = open_shards * self.SHARD_BYTES_PER_SECOND
+        return (TokenBucket(int(records_per_second)),
+                TokenBucket(int(bytes_per_second)))
+
+    def shard_iterator_factory(self, options, shard_id):
+        return lambda sequence_number: self.create_shard_iterator(
+            options, shard_id, sequence_number)
+
+    def create_shard_iterator(self, options, shard_id, sequence_number=None):
+        # resume after the last pulled record, then after the last
+        # checkpoint and only then from the requested start position
+        if sequence_number is None and self.checkpointer is not None:
+            sequence_number = self.checkpointer.get(shard_id)
+        if sequence_number is not None:
+            return self.source_helper.get_shard_iterator(
+                options.source_stream,
+                shard_id,
+                'AFTER_SEQUENCE_NUMBER',
+                sequence_number=sequence_number)
+        return self.source_helper.get_shard_iterator(
+            options.source_stream,
+            shard_id,
+            self.SHARD_ITERATOR_TYPES[options.start],
+            timestamp=options.timestamp)
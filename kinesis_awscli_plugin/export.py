@@ -0,0 +1,218 @@
+import logging
+import datetime
+from threading import Event
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.lib.batchqueue import BatchQueue
+from kinesis_awscli_plugin.lib.recordformatter import RecordFormatter
+from kinesis_awscli_plugin.lib.recordrenderer import RecordRenderer
+from kinesis_awscli_plugin.lib.recordsink import RecordSink
+from kinesis_awscli_plugin.lib.recordspuller import RecordsPuller
+from kinesis_awscli_plugin.lib.segmentedshardreader import SegmentedShardReader
+from kinesis_awscli_plugin.lib.shardlineage import ShardLineage
+from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+from kinesis_awscli_plugin.lib.utils import Utils
+
+logger = logging.getLogger(__name__)
+
+
+class ExportCommand(BasicCommand):
+
+    NAME = 'export'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('This command exports all records of a Kinesis stream '
+                   'that arrived between start time and end time. All shards '
+                   'are read concurrently, child shards of a split or merge '
+                   'once their parents were read to their end. Children of '
+                   'shards that were still open at the end time are not '
+                   'read. The command returns when every shard reached the '
+                   'end time.')
+
+    # payload bytes that may be queued for rendering
+    QUEUE_BYTES = 64 * 1024 * 1024
+
+    ARG_TABLE = [
+        {
+            'name': 'stream-name',
+            'required': True,
+            'help_text': 'Specifies the Kinesis stream name'
+        },
+        {
+            'name': 'start-time',
+            'required': True,
+            'help_text': 'The arrival time in UTC of the first exported records. Time format is ISO8601. '\
+                         'Example: "{0}". Relative times like "30 minutes ago" can be used if the '\
+                         'Python module dateparser is installed.'.format(
+                            TimeUtils.iso8601(datetime.datetime.utcnow() - datetime.timedelta(hours=1)))
+        },
+        {
+            'name': 'end-time',
+            'required': False,
+            'help_text': 'The arrival time in UTC of the last exported records. Time format is ISO8601. '\
+                         'Default is "now". Relative times like "30 minutes ago" can be used if the '\
+                         'Python module dateparser is installed.'
+        },
+        {
+            'name': 'shard-id',
+            'required': False,
+            'help_text': 'Specifies the shard id that should be exported. '
+            'If not specified all shards of the stream are exported.'
+        },
+        {
+            'name': 'pull-delay',
+            'cli_type_name': 'integer',
+            'default': '200',
+            'help_text':
+            'Specifies the delay in milliseconds between two GetRecords calls '
+            'on a shard. Defaults to 200 milliseconds, the read limit of 5 '
+            'calls per second and shard.'
+        },
+        {
+            'name': 'output-format',
+            'default': 'raw',
+            'choices': RecordFormatter.OUTPUT_FORMATS,
+            'help_text':
+            'Specifies how records are written. See "aws kinesis pull help". '
+            'Defaults to "raw".'
+        },
+        {
+            'name': 'sink-dir',
+            'required': False,
+            'help_text':
+            'Writes records to gzip compressed files in this directory '
+            'instead of standard output. Every shard gets its own '
+            'subdirectory.'
+        },
+        {
+            'name': 'segments',
+            'cli_type_name': 'integer',
+            'default': '1',
+            'help_text':
+            'Splits the time range of every shard into this many segments '
+            'that are read concurrently within the read limits of the shard. '
+            'Records are still written in sequence order. Useful to backfill '
+            'a single shard with a lot of retained data. Defaults to 1.'
+        },
+        {
+            'name': 'spool-dir',
+            'required': False,
+            'help_text':
+            'Directory for the temporary files that hold segments until they '
+            'are written. Defaults to the system temporary directory.'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        args = self.collect_args(args)
+        self.validate_args(args)
+        self.kinesis_helper = KinesisHelper(self._session, parsed_globals)
+        self._call(args, parsed_globals)
+        return 0
+
+    def collect_args(self, args):
+        # dateparser returns offset-aware times for "Z" or "+hh:mm", the
+        # readers compare them with naive UTC arrival timestamps
+        args.start_time = TimeUtils.to_naive_utc(
+            TimeUtils.to_datetime(args.start_time))
+        if args.end_time is None:
+            args.end_time = datetime.datetime.utcnow()
+        else:
+            args.end_time = TimeUtils.to_naive_utc(
+                TimeUtils.to_datetime(args.end_time))
+        return args
+
+    def validate_args(self, args):
+        if args.start_time > args.end_time:
+            raise ValueError("Parameter start-time is newer than end-time")
+        if int(args.segments) < 1:
+            raise ValueError("Parameter segments must be at least 1")
+
+    def _call(self, options, parsed_globals):
+        stop_flag = Event()
+        if options.shard_id is None:
+            lineage = ShardLineage(
+                self.kinesis_helper.stream_shard_descriptions(
+                    options.stream_name))
+        else:
+            lineage = ShardLineage([{'ShardId': options.shard_id}])
+
+        queue = BatchQueue(self.QUEUE_BYTES)
+        if options.sink_dir is not None:
+            renderer = RecordSink(stop_flag, queue, options.pull_delay,
+                                  options.sink_dir,
+                                  output_format=options.output_format)
+        else:
+            renderer = RecordRenderer(stop_flag, queue, options.pull_delay,
+                                      output_format=options.output_format)
+        renderer.start()
+
+        self.read_shards(stop_flag, queue, options, lineage)
+        # the stop flag is set, the renderer leaves once all exported
+        # records are written
+        renderer.join()
+
+    def read_shards(self, stop_flag, queue, options, lineage):
+        '''
+        Reads the root shards and then the children of every shard that was
+        closed before the end time. The other shards were not alive in the
+        exported time range: parents closed before the start time are
+        left after a single empty read, children of shards still open at
+        the end time are never read.
+        '''
+        pullers = {}
+        ended_shard_ids = set()
+
+        def start(shard_ids):
+            for shard_id in shard_ids:
+                puller = self.create_shard_reader(stop_flag, queue, options,
+                                                  shard_id)
+                puller.start()
+                pullers[shard_id] = puller
+
+        start(lineage.roots())
+        try:
+            while len(pullers) > 0 and not stop_flag.is_set():
+                stop_flag.wait(0.2)
+                for shard_id, puller in list(pullers.items()):
+                    if puller.is_alive():
+                        continue
+                    del pullers[shard_id]
+                    if puller.reached_shard_end:
+                        ended_shard_ids.add(shard_id)
+                        start(lineage.ready_children(shard_id,
+                                                     ended_shard_ids))
+        except KeyboardInterrupt:
+            pass
+        stop_flag.set()
+        for puller in pullers.values():
+            puller.join()
+
+    def create_shard_reader(self, stop_flag, queue, options, shard_id):
+        if int(options.segments) > 1:
+            return SegmentedShardReader(
+                stop_flag,
+                queue,
+                self.kinesis_helper,
+                options.stream_name,
+                shard_id,
+                options.start_time,
+                options.end_time,
+                int(options.segments),
+                options.spool_dir, )
+        return RecordsPuller(
+            stop_flag,
+            queue,
+            self.kinesis_helper.client,
+            self.kinesis_helper.get_shard_iterator(
+                options.stream_name,
+                shard_id,
+                'AT_TIMESTAMP',
+                timestamp=options.start_time),
+            int(options.pull_delay),
+            -1,
+            shard_id=shard_id,
+            end_timestamp=options.end_time, )
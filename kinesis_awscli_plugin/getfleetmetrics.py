@@ -0,0 +1,183 @@
+import copy
+import datetime
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.getstreammetrics import GetStreamMetricsCommand
+from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
+from kinesis_awscli_plugin.lib.fleetmetricsgetter import FleetMetricsGetter
+from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+from kinesis_awscli_plugin.lib.utils import Utils
+
+
+class GetFleetMetricsCommand(BasicCommand):
+
+    NAME = 'get-fleet-metrics'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('Gets stream-level metrics of all streams in one or more '
+                   'regions and ranks the streams in a single list. Every '
+                   'stream shows the metrics aggregated over the time range, '
+                   'its open shard count and its utilization: the highest '
+                   'percentage of the write limits of its shards (1 MB or '
+                   '1000 records per second) used in any minute.')
+
+    DEFAULT_METRIC_NAMES = [
+        'IncomingBytes', 'IncomingRecords',
+        'WriteProvisionedThroughputExceeded',
+        'ReadProvisionedThroughputExceeded'
+    ]
+
+    ALLOWED_STATISTICS = GetStreamMetricsCommand.ALLOWED_STATISTICS
+
+    DEFAULT_DURATION = 60
+
+    ARG_TABLE = [
+        {
+            'name': 'regions',
+            'required': False,
+            'help_text':
+            'Comma separated list of regions, e.g. "us-east-1,eu-west-1". '
+            'Defaults to the configured region.'
+        },
+        {
+            'name': 'metric-names',
+            'required': False,
+            'help_text':
+            'Comma separated list of stream-level metrics. Defaults to '
+            '"{0}".'.format(','.join(DEFAULT_METRIC_NAMES))
+        },
+        {
+            'name': 'statistic',
+            'default': 'Sum',
+            'choices': ALLOWED_STATISTICS,
+            'help_text':
+            'The statistic of the metrics. The datapoints of the time range '
+            'are added up for Sum and SampleCount and averaged for Average. '
+            'Defaults to "Sum".'
+        },
+        {
+            'name': 'sort-by',
+            'default': FleetMetricsGetter.UTILIZATION,
+            'help_text':
+            'Streams are ranked by this column in descending order: one of '
+            'the metric names, "OpenShardCount" or "Utilization". Defaults '
+            'to "Utilization".'
+        },
+        {
+            'name': 'limit',
+            'cli_type_name': 'integer',
+            'required': False,
+            'help_text': 'Only shows the first LIMIT streams of the ranking.'
+        },
+        {
+            'name': 'start-time',
+            'required': False,
+            'help_text':
+            'The start time of the metrics in UTC. Time format is ISO8601. '
+            'Defaults to now minus {0} minutes. Relative times like "1 day '
+            'ago" can be used if the Python module dateparser is '
+            'installed.'.format(DEFAULT_DURATION)
+        },
+        {
+            'name': 'end-time',
+            'required': False,
+            'help_text':
+            'The end time of the metrics in UTC. Time format is ISO8601. '
+            'Defaults to now.'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        args = self.collect_args(args, parsed_globals)
+        self.validate_args(args)
+        regions = []
+        for region in args.regions:
+            region_globals = copy.copy(parsed_globals)
+            region_globals.region = region
+            regions.append((region,
+                            KinesisHelper(self._session, region_globals),
+                            CloudWatchHelper(self._session, region_globals)))
+        fleet_metrics_getter = FleetMetricsGetter(
+            regions=regions,
+            start_time=args.start_time,
+            end_time=args.end_time,
+            metric_names=args.metric_names,
+            statistic=args.statistic,
+            # long ranges need the coarser datapoints CloudWatch keeps
+            period=CloudWatchHelper.choose_period(args.start_time,
+                                                  args.end_time), )
+        streams = fleet_metrics_getter.get(args.sort_by)
+        if args.limit is not None:
+            streams = streams[:int(args.limit)]
+        output = self.create_fleet_metrics_output(streams, args)
+        Utils.display_response(self._session, self.NAME, output,
+                               parsed_globals)
+        return 0
+
+    def collect_args(self, args, parsed_globals):
+        if args.regions is None:
+            region = parsed_globals.region or \
+                self._session.get_config_variable('region')
+            args.regions = [region]
+        else:
+            args.regions = args.regions.split(',')
+
+        if args.metric_names is None:
+            args.metric_names = self.DEFAULT_METRIC_NAMES
+        else:
+            args.metric_names = args.metric_names.split(',')
+
+        if args.start_time is None:
+            args.start_time = datetime.datetime.utcnow() - datetime.timedelta(
+                minutes=self.DEFAULT_DURATION)
+        else:
+            args.start_time = TimeUtils.to_datetime(args.start_time)
+
+        if args.end_time is None:
+            args.end_time = datetime.datetime.utcnow()
+        else:
+            args.end_time = TimeUtils.to_datetime(args.end_time)
+        return args
+
+    def validate_args(self, args):
+        if None in args.regions:
+            raise ValueError('No region configured. Use --regions')
+
+        for _metric in args.metric_names:
+            if _metric not in GetStreamMetricsCommand.STREAM_METRIC_NAMES:
+                raise ValueError(
+                    "{0} not found. Metric name must be one of the following: {1}".
+                    format(_metric,
+                           str(GetStreamMetricsCommand.STREAM_METRIC_NAMES)))
+
+        sort_keys = args.metric_names + [
+            'OpenShardCount', FleetMetricsGetter.UTILIZATION
+        ]
+        if args.sort_by not in sort_keys:
+            raise ValueError('Parameter --sort-by must be one of the '
+                             'following: {0}'.format(str(sort_keys)))
+
+        if args.limit is not None and int(args.limit) < 1:
+            raise ValueError('Parameter --limit must be at least 1')
+
+        if args.start_time > args.end_time:
+            raise ValueError("Parameter start-time is newer than end-time")
+
+    def create_fleet_metrics_output(self, streams, args):
+        output = {}
+        output['Description'] = "Streams in {0} between {1} and {2} sorted by {3}".format(
+            ', '.join(args.regions),
+            TimeUtils.iso8601(args.start_time),
+            TimeUtils.iso8601(args.end_time),
+            args.sort_by, )
+        output['StartTime'] = TimeUtils.iso8601(args.start_time)
+        output['EndTime'] = TimeUtils.iso8601(args.end_time)
+        output['Regions'] = args.regions
+        output['MetricNames'] = args.metric_names
+        output['Statistic'] = args.statistic
+        output['SortBy'] = args.sort_by
+        output['Streams'] = streams
+        return output
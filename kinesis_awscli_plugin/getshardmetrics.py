@@ -2,6 +2,7 @@ import json
 import os
 import sys
 import datetime
+from threading import Event
 
 from awscli.customizations.commands import BasicCommand
 
@@ -9,6 +10,11 @@ from kinesis_awscli_plugin.lib.shardmetricsgetter import ShardMetricsGetter
 from kinesis_awscli_plugin.lib.timeutils import TimeUtils
 from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
 from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
+from kinesis_awscli_plugin.lib.datapointcache import DatapointCache
+from kinesis_awscli_plugin.lib.metricsmatrix import MetricsMatrix
+from kinesis_awscli_plugin.lib.metricswatcher import MetricsWatcher
+from kinesis_awscli_plugin.lib.shardrowwriter import ShardRowWriter
+from kinesis_awscli_plugin.lib.threads import ExitChecker
 from kinesis_awscli_plugin.lib.utils import Utils
 
 
@@ -20,7 +26,8 @@ class GetShardMetricsCommand(BasicCommand):
 
     DESCRIPTION = """Get Shard Metrics for a Kinesis Stream. The metrics 
       are sorted using the average over the specified duration as the 
-      sort key."""
+      sort key, or another statistic of the datapoints of each shard. The
+      output also shows how unevenly the load is spread over the shards."""
 
     ALLOWED_METRIC_NAMES = [
         'IncomingBytes', 'IncomingRecords',
@@ -72,13 +79,85 @@ class GetShardMetricsCommand(BasicCommand):
                           TimeUtils.iso8601(datetime.datetime.utcnow())
                        )
         },
+        {
+          'name': 'sort-by',
+          'default': 'Average',
+          'choices': MetricsMatrix.STATISTICS,
+          'help_text': 'The statistic of the datapoints of each shard the shards are sorted by, in descending '\
+                       'order. P50, P95 and P99 are percentiles. Defaults to "Average".'
+        },
+        {
+          'name': 'period',
+          'cli_type_name': 'integer',
+          'required': False,
+          'help_text': 'Seconds covered by a datapoint, rounded up to a multiple of 60. Default is 60. The period '\
+                       'is raised for start times older than CloudWatch keeps datapoints of that resolution: '\
+                       '5 minutes after 15 days and 1 hour after 63 days.'
+        },
+        {
+          'name': 'max-points',
+          'cli_type_name': 'integer',
+          'required': False,
+          'help_text': 'Maximum number of datapoints per metric. The period is raised until the time range fits, '\
+                       'e.g. a week with --max-points 168 returns hourly datapoints.'
+        },
+        {
+          'name': 'cache-file',
+          'required': False,
+          'help_text': 'SQLite file that caches the fetched datapoints. Only the time ranges that are not '\
+                       'cached yet are fetched from CloudWatch. Datapoints of the last {0} minutes are '\
+                       'never cached because CloudWatch may still update them.'.format(
+                          DatapointCache.SETTLE_TIME // 60
+                       )
+        },
+        {
+          'name': 'cache-ttl',
+          'cli_type_name': 'integer',
+          'default': '168',
+          'help_text': 'Hours after which cached datapoints are evicted if they were not fetched again. '\
+                       'Defaults to 168 (one week).'
+        },
+        {
+          'name': 'watch',
+          'cli_type_name': 'integer',
+          'required': False,
+          'help_text': 'Refreshes the metrics every WATCH seconds until the command is interrupted. The window '\
+                       'between start-time and now rolls forward and only the periods since the last refresh '\
+                       'are fetched. Cannot be combined with end-time.'
+        },
+        {
+          'name': 'watch-format',
+          'default': 'table',
+          'choices': MetricsWatcher.REPORT_FORMATS,
+          'help_text': 'With --watch, renders the window as table that is refreshed in place or writes new and '\
+                       'changed datapoints as one JSON document per line. Defaults to "table".'
+        },
+        {
+          'name': 'output-stream',
+          'required': False,
+          'choices': ShardRowWriter.OUTPUT_FORMATS,
+          'help_text': 'Writes a row per shard to standard output as soon as its batch of up to {0} shards is '\
+                       'fetched, as JSON lines or CSV, instead of one document at the end. Memory stays flat for '\
+                       'any number of shards. The rows are in shard order and not sorted, CSV rows have no '\
+                       'datapoints.'.format(CloudWatchHelper.MAX_QUERIES_PER_REQUEST)
+        },
+        {
+          'name': 'no-datapoints',
+          'action': 'store_true',
+          'help_text': 'Omits the raw datapoints of the shards and only shows their statistics.'
+        },
     ]
 
     def _run_main(self, args, parsed_globals):
         args = self.collect_args(args)
         self.validate_args(args)
+        args.period = CloudWatchHelper.choose_period(
+            args.start_time, args.end_time,
+            None if args.period is None else int(args.period),
+            None if args.max_points is None else int(args.max_points))
         self.cloudwatch_helper = CloudWatchHelper(self._session,
-                                                  parsed_globals)
+                                                  parsed_globals,
+                                                  self.create_cache(args))
         self.kinesis_helper = KinesisHelper(self._session, parsed_globals)
         if self.kinesis_helper.shard_metrics_enabled(
                 args.stream_name) == False:
@@ -92,15 +171,54 @@ class GetShardMetricsCommand(BasicCommand):
             metric_name=args.metric_name,
             start_time=args.start_time,
             end_time=args.end_time,
-            statistic=args.statistic, )
-        shard_metrics = shard_metrics_getter.get()
+            statistic=args.statistic,
+            period=args.period, )
+        if args.watch is not None:
+            self.watch(shard_metrics_getter, args)
+            return 0
+        if args.output_stream is not None:
+            self.stream(shard_metrics_getter, args)
+            return 0
+        shard_matrix = shard_metrics_getter.get_matrix()
 
-        output = self.create_shard_metrics_output(shard_metrics, args)
+        output = self.create_shard_metrics_output(shard_matrix, args)
         Utils.display_response(self._session, 'get-shard-metrics', output,
                          parsed_globals)
         return 0
 
+    def watch(self, shard_metrics_getter, args):
+        # the shards are only listed once
+        shard_ids = shard_metrics_getter.get_shard_ids_for_stream()
+        stop_flag = Event()
+        watcher = MetricsWatcher(
+            stop_flag,
+            lambda start_time, end_time: shard_metrics_getter.get_shard_metrics(
+                shard_ids, start_time, end_time),
+            args.end_time - args.start_time,
+            args.statistic,
+            int(args.watch),
+            sys.stdout,
+            args.watch_format,
+            id_name='ShardId', )
+        watcher.start()
+        ExitChecker.wait_on_exit(stop_flag)
+        watcher.join()
+
+    def stream(self, shard_metrics_getter, args):
+        writer = ShardRowWriter(sys.stdout, args.output_stream, args.statistic,
+                                not args.no_datapoints)
+        for shard_matrix in shard_metrics_getter.get_matrices():
+            writer.write_matrix(shard_matrix)
+
+    def create_cache(self, args):
+        if args.cache_file is None:
+            return None
+        return DatapointCache(args.cache_file,
+                              ttl=int(args.cache_ttl) * 3600)
+
     def collect_args(self, args):
+        if args.watch is not None and args.end_time is not None:
+            raise ValueError('Parameter --watch cannot be combined with --end-time')
         if args.start_time is None:
             args.start_time = datetime.datetime.utcnow() - datetime.timedelta(
                 minutes=self.DEFAULT_DURATION)
@@ -131,22 +249,48 @@ class GetShardMetricsCommand(BasicCommand):
         if args.start_time > args.end_time:
             raise ValueError("Parameter start-time is newer than end-time")
 
-    def create_shard_metrics_output(self, sorted_shard_array, args):
+        if args.watch is not None and args.output_stream is not None:
+            raise ValueError('Parameter --watch cannot be combined with --output-stream')
+
+        if args.watch is not None and int(args.watch) < 1:
+            raise ValueError('Parameter --watch must be at least 1 second')
+
+        if args.period is not None and int(args.period) < 1:
+            raise ValueError('Parameter --period must be at least 1 second')
+
+        if args.max_points is not None and int(args.max_points) < 1:
+            raise ValueError('Parameter --max-points must be at least 1')
+
+    def create_shard_metrics_output(self, shard_matrix, args):
         output = {}
 
-        output['Description'] = "Sorted datapoint average of '{0}' ({1}) per minute between {2} and {3}".format(
+        output['Description'] = "Datapoints of '{0}' ({1}) per {2} seconds between {3} and {4} sorted by {5}".format(
                 args.metric_name,
                 args.statistic,
+                args.period,
                 TimeUtils.iso8601(args.start_time),
-                TimeUtils.iso8601(args.end_time), )
+                TimeUtils.iso8601(args.end_time),
+                args.sort_by, )
         # args not json serializable. Need to do by hand
         output['StartTime'] = TimeUtils.iso8601(args.start_time)
         output['EndTime'] = TimeUtils.iso8601(args.end_time)
         output['MetricName'] = args.metric_name
         output['Statistic'] = args.statistic
+        output['Period'] = args.period
+        output['SortBy'] = args.sort_by
+
+        skew = shard_matrix.skew(args.sort_by)
+        output['Skew'] = dict((name, round(value, 4)) for name, value in skew.items())
 
-        output['ShardMetrics'] = map(
-          lambda _shard: {'ShardId': _shard.metric_id, 'DatapointAverage': round(_shard.datapoint_average, 2), 'Datapoints': _shard.datapoints},
-          sorted_shard_array
-        )
+        stats = shard_matrix.stats()
+        shard_metrics = []
+        for index in shard_matrix.order(args.sort_by):
+            _shard = shard_matrix.metrics_array[index]
+            shard_output = {'ShardId': _shard.metric_id}
+            if not args.no_datapoints:
+                shard_output['Datapoints'] = _shard.datapoints
+            for name in MetricsMatrix.STATISTICS:
+                shard_output['Datapoint' + name] = round(stats[name][index], 2)
+            shard_metrics.append(shard_output)
+        output['ShardMetrics'] = shard_metrics
         return output
@@ -2,12 +2,16 @@ import json
 import os
 import sys
 import datetime
+from threading import Event
 
 from awscli.customizations.commands import BasicCommand
 
 from kinesis_awscli_plugin.lib.streammetricsgetter import StreamMetricsGetter
 from kinesis_awscli_plugin.lib.timeutils import TimeUtils
 from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
+from kinesis_awscli_plugin.lib.datapointcache import DatapointCache
+from kinesis_awscli_plugin.lib.metricswatcher import MetricsWatcher
+from kinesis_awscli_plugin.lib.threads import ExitChecker
 from kinesis_awscli_plugin.lib.utils import Utils
 
 
@@ -82,25 +86,105 @@ class GetStreamMetricsCommand(BasicCommand):
                           TimeUtils.iso8601(datetime.datetime.utcnow())
                        )
         },
+        {
+          'name': 'period',
+          'cli_type_name': 'integer',
+          'required': False,
+          'help_text': 'Seconds covered by a datapoint, rounded up to a multiple of 60. Default is 60. The period '\
+                       'is raised for start times older than CloudWatch keeps datapoints of that resolution: '\
+                       '5 minutes after 15 days and 1 hour after 63 days.'
+        },
+        {
+          'name': 'max-points',
+          'cli_type_name': 'integer',
+          'required': False,
+          'help_text': 'Maximum number of datapoints per metric. The period is raised until the time range fits, '\
+                       'e.g. a week with --max-points 168 returns hourly datapoints.'
+        },
+        {
+          'name': 'cache-file',
+          'required': False,
+          'help_text': 'SQLite file that caches the fetched datapoints. Only the time ranges that are not '\
+                       'cached yet are fetched from CloudWatch. Datapoints of the last {0} minutes are '\
+                       'never cached because CloudWatch may still update them.'.format(
+                          DatapointCache.SETTLE_TIME // 60
+                       )
+        },
+        {
+          'name': 'cache-ttl',
+          'cli_type_name': 'integer',
+          'default': '168',
+          'help_text': 'Hours after which cached datapoints are evicted if they were not fetched again. '\
+                       'Defaults to 168 (one week).'
+        },
+        {
+          'name': 'watch',
+          'cli_type_name': 'integer',
+          'required': False,
+          'help_text': 'Refreshes the metrics every WATCH seconds until the command is interrupted. The window '\
+                       'between start-time and now rolls forward and only the periods since the last refresh '\
+                       'are fetched. Cannot be combined with end-time.'
+        },
+        {
+          'name': 'watch-format',
+          'default': 'table',
+          'choices': MetricsWatcher.REPORT_FORMATS,
+          'help_text': 'With --watch, renders the window as table that is refreshed in place or writes new and '\
+                       'changed datapoints as one JSON document per line. Defaults to "table".'
+        },
     ]
 
     def _run_main(self, args, parsed_globals):
         args = self.collect_args(args)
         self.validate_args(args)
+        args.period = CloudWatchHelper.choose_period(
+            args.start_time, args.end_time,
+            None if args.period is None else int(args.period),
+            None if args.max_points is None else int(args.max_points))
         stream_metrics_array = []
         stream_metrics_getter = StreamMetricsGetter(
-            cloudwatch_helper=CloudWatchHelper(self._session, parsed_globals),
+            cloudwatch_helper=CloudWatchHelper(self._session, parsed_globals,
+                                               self.create_cache(args)),
             stream_name=args.stream_name,
             start_time=args.start_time,
             end_time=args.end_time,
-            statistic=args.statistic, )
+            statistic=args.statistic,
+            period=args.period, )
+        if args.watch is not None:
+            self.watch(stream_metrics_getter, args)
+            return 0
         stream_metrics = stream_metrics_getter.get(args.metric_names)
         output = self.create_stream_metrics_output(stream_metrics, args)
         Utils.display_response(self._session, 'get-stream-metrics', output,
                          parsed_globals)
         return 0
 
+    def watch(self, stream_metrics_getter, args):
+        stop_flag = Event()
+        watcher = MetricsWatcher(
+            stop_flag,
+            lambda start_time, end_time: stream_metrics_getter.get(
+                args.metric_names, start_time, end_time),
+            args.end_time - args.start_time,
+            args.statistic,
+            int(args.watch),
+            sys.stdout,
+            args.watch_format,
+            id_name='Metric',
+            sort=False, )
+        watcher.start()
+        ExitChecker.wait_on_exit(stop_flag)
+        watcher.join()
+
+    def create_cache(self, args):
+        if args.cache_file is None:
+            return None
+        return DatapointCache(args.cache_file,
+                              ttl=int(args.cache_ttl) * 3600)
+
     def collect_args(self, args):
+        if args.watch is not None and args.end_time is not None:
+            raise ValueError('Parameter --watch cannot be combined with --end-time')
         if args.start_time is None:
             args.start_time = datetime.datetime.utcnow() - datetime.timedelta(
                 minutes=self.DEFAULT_DURATION)
@@ -135,6 +219,15 @@ class GetStreamMetricsCommand(BasicCommand):
         if args.start_time > args.end_time:
             raise ValueError("Parameter start-time is newer than end-time")
 
+        if args.watch is not None and int(args.watch) < 1:
+            raise ValueError('Parameter --watch must be at least 1 second')
+
+        if args.period is not None and int(args.period) < 1:
+            raise ValueError('Parameter --period must be at least 1 second')
+
+        if args.max_points is not None and int(args.max_points) < 1:
+            raise ValueError('Parameter --max-points must be at least 1')
+
     def create_stream_metrics_output(self, metrics_array, args):
         output = {}
 
@@ -148,6 +241,7 @@ class GetStreamMetricsCommand(BasicCommand):
         output['EndTime'] = TimeUtils.iso8601(args.end_time)
         output['MetricNames'] = args.metric_names
         output['Statistic'] = args.statistic
+        output['Period'] = args.period
 
         output['Metrics'] = map(
           lambda _kinesis_metrics: {'Metric': _kinesis_metrics.metric_id, 'Datapoints': _kinesis_metrics.datapoints},
@@ -0,0 +1,152 @@
+import logging
+import sys
+from threading import Event
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.lib.threads import ExitChecker
+from kinesis_awscli_plugin.lib.lagreporter import LagReporter
+from kinesis_awscli_plugin.lib.lagsampler import LagSampler
+from kinesis_awscli_plugin.lib.lagtracker import LagTracker
+from kinesis_awscli_plugin.lib.recordspuller import RecordsPuller
+from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.utils import Utils
+
+logger = logging.getLogger(__name__)
+
+
+class LagCommand(BasicCommand):
+
+    NAME = 'lag'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('This command reads the shards of a Kinesis stream without '
+                   'rendering records and reports per shard how many '
+                   'milliseconds the reader is behind the tip of the stream '
+                   'and how many records and bytes it reads per second. '
+                   'With a checkpoint file it reports the lag of the '
+                   'consumer that writes the checkpoints instead. The file '
+                   'is read again every interval and every shard is sampled '
+                   'with a single GetRecords call after its checkpoint, no '
+                   'records are read.')
+
+    SHARD_ITERATOR_TYPES = {
+        'latest': 'LATEST',
+        'trim-horizon': 'TRIM_HORIZON',
+    }
+
+    ARG_TABLE = [
+        {
+            'name': 'stream-name',
+            'required': True,
+            'help_text': 'Specifies the Kinesis stream name'
+        },
+        {
+            'name': 'shard-id',
+            'required': False,
+            'help_text': 'Specifies the shard id that should be monitored. '
+            'If not specified all shards of the stream are monitored.'
+        },
+        {
+            'name': 'start',
+            'default': 'latest',
+            'choices': sorted(SHARD_ITERATOR_TYPES.keys()),
+            'help_text':
+            'Specifies where reading starts if there is no checkpoint for the '
+            'shard. Defaults to "latest".'
+        },
+        {
+            'name': 'checkpoint-file',
+            'required': False,
+            'help_text':
+            'Reports the lag after the records in the checkpoint file written '
+            'by "aws kinesis pull --checkpoint-file", sampled every interval. '
+            'The file is not modified.'
+        },
+        {
+            'name': 'pull-delay',
+            'cli_type_name': 'integer',
+            'default': '1000',
+            'help_text':
+            'Specifies the delay in milliseconds before pulling the '
+            'next batch of records. Not used with a checkpoint file. '
+            'Defaults to 1000 milliseconds.'
+        },
+        {
+            'name': 'duration',
+            'cli_type_name': 'integer',
+            'default': '-1',
+            'help_text':
+            'Specifies how many seconds the command should monitor the stream. '
+            'Defaults to -1 (infinite).'
+        },
+        {
+            'name': 'interval',
+            'cli_type_name': 'integer',
+            'default': '5',
+            'help_text':
+            'Seconds between two reports. Defaults to 5 seconds.'
+        },
+        {
+            'name': 'report-format',
+            'default': 'table',
+            'choices': LagReporter.REPORT_FORMATS,
+            'help_text':
+            'Writes the report as table that is refreshed in place or as one '
+            'JSON document per shard and report. Defaults to "table".'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        self.kinesis_helper = KinesisHelper(self._session, parsed_globals)
+        self._call(args, parsed_globals)
+        return 0
+
+    def _call(self, options, parsed_globals):
+        threads = []
+        stop_flag = Event()
+        lag_tracker = LagTracker()
+        if options.shard_id is None:
+            shard_ids = self.kinesis_helper.stream_shards(options.stream_name)
+        else:
+            shard_ids = [options.shard_id]
+
+        reporter = LagReporter(stop_flag, lag_tracker, int(options.interval),
+                               sys.stdout, options.report_format)
+        reporter.start()
+        threads.append(reporter)
+
+        if options.checkpoint_file is not None:
+            sampler = LagSampler(
+                stop_flag,
+                self.kinesis_helper,
+                options.stream_name,
+                shard_ids,
+                options.checkpoint_file,
+                lag_tracker,
+                int(options.interval),
+                default_iterator_type=self.SHARD_ITERATOR_TYPES[options.start],
+                duration=int(options.duration), )
+            sampler.start()
+            threads.append(sampler)
+        else:
+            for shard_id in shard_ids:
+                # without a queue the puller only reports what it reads
+                puller = RecordsPuller(
+                    stop_flag,
+                    None,
+                    self.kinesis_helper.client,
+                    self.kinesis_helper.get_shard_iterator(
+                        options.stream_name, shard_id,
+                        self.SHARD_ITERATOR_TYPES[options.start]),
+                    int(options.pull_delay),
+                    int(options.duration),
+                    shard_id=shard_id,
+                    lag_tracker=lag_tracker, )
+                puller.start()
+                threads.append(puller)
+
+        ExitChecker.wait_on_exit(stop_flag)
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,91 @@
+import collections
+import logging
+import multiprocessing
+from six.moves import queue as Queue
+
+from kinesis_awscli_plugin.lib.recordfilter import RecordFilter
+from kinesis_awscli_plugin.lib.recordformatter import RecordFormatter
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+# filter and formatter of a worker process, compiled once per process
+_worker_filter = None
+_worker_formatter = None
+
+
+def _init_worker(filter_arguments, output_format):
+    global _worker_filter, _worker_formatter
+    if filter_arguments is not None:
+        _worker_filter = RecordFilter(*filter_arguments)
+    _worker_formatter = RecordFormatter(output_format)
+
+
+def decode_batch(record_batch):
+    '''
+    Filters and formats a record batch in a worker process. The records are
+    not sent back to the parent process, only the formatted bytes.
+    '''
+    if _worker_filter is not None:
+        record_batch = _worker_filter.filter_batch(record_batch)
+    formatted = _worker_formatter.format_batch(record_batch)
+    record_batch.release()
+    record_batch.formatted = formatted
+    return record_batch
+
+
+class BatchDecoder(BaseThread):
+    '''
+    Moves filtering and formatting of record batches off the renderer
+    thread into a pool of worker processes. Batches are handed to the
+    workers as a whole and forwarded to the output queue in the order they
+    were read, which keeps the records of every shard in order.
+
+    The renderer must watch output_stop_flag instead of stop_flag. It is
+    set once all pending batches were forwarded.
+    '''
+
+    def __init__(self,
+                 stop_flag,
+                 input_queue,
+                 output_queue,
+                 output_stop_flag,
+                 workers,
+                 filter_arguments=None,
+                 output_format='raw'):
+        super(BatchDecoder, self).__init__(stop_flag)
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.output_stop_flag = output_stop_flag
+        self.max_pending = 4 * workers
+        self.pending = collections.deque()
+        # create the pool before the reader threads start
+        self.pool = multiprocessing.Pool(
+            workers, _init_worker, (filter_arguments, output_format))
+
+    def _run(self):
+        try:
+            while True:
+                if self.output_stop_flag.is_set():
+                    # the renderer left early
+                    self.stop_flag.set()
+                    break
+                self.forward_decoded()
+                if len(self.pending) >= self.max_pending:
+                    self.pending[0].wait(0.1)
+                    continue
+                try:
+                    record_batch = self.input_queue.get(True, 0.1)
+                    self.pending.append(
+                        self.pool.apply_async(decode_batch, (record_batch, )))
+                except Queue.Empty:
+                    if self.stop_flag.is_set() and len(self.pending) == 0:
+                        logger.debug('Decoder is leaving...')
+                        break
+        finally:
+            self.pool.terminate()
+            self.output_stop_flag.set()
+
+    def forward_decoded(self):
+        while len(self.pending) > 0 and self.pending[0].ready():
+            self.output_queue.put(self.pending.popleft().get())
@@ -0,0 +1,40 @@
+import collections
+from six.moves import queue as Queue
+
+
+class BatchQueue(Queue.Queue):
+    '''
+    Queue of record batches that is bounded by the bytes of the queued
+    batches instead of their number, so a few shards with large records
+    cannot buffer an unbounded amount of memory. A batch larger than
+    max_bytes is still accepted if the queue is empty.
+    '''
+
+    def __init__(self, max_bytes):
+        Queue.Queue.__init__(self, max_bytes)
+
+    def _init(self, maxsize):
+        self.queue = collections.deque()
+        self.queued_bytes = 0
+
+    def _qsize(self, len=len):
+        # every batch counts at least one byte, so a queue of empty
+        # batches is not mistaken for an empty queue. Python 2 checks for
+        # a full queue with ==, so the size is capped at maxsize.
+        size = self.queued_bytes + len(self.queue)
+        if self.maxsize > 0:
+            return min(size, self.maxsize)
+        return size
+
+    def _put(self, record_batch):
+        self.queue.append((record_batch, record_batch.size))
+        self.queued_bytes += record_batch.size
+
+    def _get(self):
+        record_batch, size = self.queue.popleft()
+        self.queued_bytes -= size
+        return record_batch
+
+    def batch_count(self):
+        with self.mutex:
+            return len(self.queue)
@@ -0,0 +1,178 @@
+import math
+
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+
+class CapacityPlanner(object):
+    '''
+    Recommends the number of shards of a stream and the shards to split or
+    merge, from the Sum of the shard-level metrics per period.
+
+    The utilization of a shard in a period is the largest share of its
+    limits it used: 1 MB and 1000 records per second written and 2 MB per
+    second read. The peak utilization is the highest of all periods.
+    Shards above the target utilization or with throttled requests are
+    split evenly by hash key, adjacent shards whose combined peak stays
+    below the target are merged. Projections assume that the records of a
+    shard are spread evenly over its hash key range.
+    '''
+
+    WRITE_BYTES_PER_SECOND = 1024 * 1024
+    WRITE_RECORDS_PER_SECOND = 1000
+    READ_BYTES_PER_SECOND = 2 * 1024 * 1024
+
+    # metrics and the per second limit of a shard they are compared with
+    LIMITS = [
+        ('IncomingBytes', WRITE_BYTES_PER_SECOND),
+        ('IncomingRecords', WRITE_RECORDS_PER_SECOND),
+        ('OutgoingBytes', READ_BYTES_PER_SECOND),
+    ]
+
+    THROTTLE_METRIC_NAMES = ['WriteProvisionedThroughputExceeded',
+                             'ReadProvisionedThroughputExceeded']
+
+    METRIC_NAMES = [name for name, _ in LIMITS] + THROTTLE_METRIC_NAMES
+
+    def __init__(self,
+                 shard_descriptions,
+                 metrics_by_name,
+                 period,
+                 target_utilization=70.0):
+        self.period = period
+        self.target_utilization = target_utilization
+        self.shards = self.open_shards(shard_descriptions)
+        # metric name -> shard id -> {epoch seconds: sum}
+        self._sums = {}
+        for metric_name, metrics_array in metrics_by_name.items():
+            self._sums[metric_name] = dict(
+                (metrics.metric_id, dict(
+                    (TimeUtils.to_epoch(datapoint['Timestamp']),
+                     float(datapoint['Sum']))
+                    for datapoint in metrics.datapoints))
+                for metrics in metrics_array)
+
+    @staticmethod
+    def open_shards(shard_descriptions):
+        '''
+        The shards without an ending sequence number in hash key order.
+        '''
+        return sorted(
+            [shard for shard in shard_descriptions
+             if 'EndingSequenceNumber' not in shard['SequenceNumberRange']],
+            key=lambda shard: int(shard['HashKeyRange']['StartingHashKey']))
+
+    def usage(self, shard_ids):
+        '''
+        Per period sums of the limited metrics of the shards together.
+        '''
+        usage = {}
+        for index, (metric_name, _) in enumerate(self.LIMITS):
+            sums = self._sums.get(metric_name, {})
+            for shard_id in shard_ids:
+                for timestamp, value in sums.get(shard_id, {}).items():
+                    usage.setdefault(timestamp, [0.0] * len(self.LIMITS))
+                    usage[timestamp][index] += value
+        return usage
+
+    def peak(self, shard_ids):
+        '''
+        Peak utilization in shards, e.g. 1.5 for one and a half times the
+        limits of a shard, and the metric that reached it.
+        '''
+        peak = 0.0
+        limiting = None
+        for values in self.usage(shard_ids).values():
+            for (metric_name, limit), value in zip(self.LIMITS, values):
+                utilization = value / (self.period * limit)
+                if utilization > peak:
+                    peak = utilization
+                    limiting = metric_name
+        return peak, limiting
+
+    def throttles(self, shard_id, metric_name):
+        return sum(self._sums.get(metric_name, {}).get(shard_id, {}).values())
+
+    def plan(self):
+        target = self.target_utilization / 100.0
+        shard_ids = [shard['ShardId'] for shard in self.shards]
+        stream_peak, stream_limiting = self.peak(shard_ids)
+        shards = []
+        splits = []
+        split_ids = set()
+        for shard in self.shards:
+            shard_id = shard['ShardId']
+            peak, limiting = self.peak([shard_id])
+            throttles = [self.throttles(shard_id, metric_name)
+                         for metric_name in self.THROTTLE_METRIC_NAMES]
+            shards.append({
+                'ShardId': shard_id,
+                'PeakUtilization': round(100 * peak, 2),
+                'LimitingMetric': limiting,
+                'WriteThrottles': throttles[0],
+                'ReadThrottles': throttles[1],
+            })
+            if peak > target or sum(throttles) > 0:
+                count = max(2, int(math.ceil(peak / target)))
+                splits.append({
+                    'ShardId': shard_id,
+                    'PeakUtilization': round(100 * peak, 2),
+                    'NewShardCount': count,
+                    'NewStartingHashKeys': self.split_hash_keys(shard, count),
+                    'ProjectedUtilization': round(100 * peak / count, 2),
+                })
+                split_ids.add(shard_id)
+        merges = self.merges(split_ids, target)
+        shards.sort(key=lambda shard: -shard['PeakUtilization'])
+        return {
+            'OpenShardCount': len(self.shards),
+            'TargetUtilization': self.target_utilization,
+            'PeakStreamUtilization': round(100 * stream_peak, 2),
+            'LimitingMetric': stream_limiting,
+            'RecommendedShardCount': max(
+                1, int(math.ceil(round(stream_peak / target, 6)))),
+            'ProjectedShardCount': len(self.shards) + sum(
+                split['NewShardCount'] - 1 for split in splits) - len(merges),
+            'Splits': splits,
+            'Merges': merges,
+            'Shards': shards,
+        }
+
+    def merges(self, split_ids, target):
+        merges = []
+        index = 0
+        while index < len(self.shards) - 1:
+            left = self.shards[index]
+            right = self.shards[index + 1]
+            pair = [left['ShardId'], right['ShardId']]
+            adjacent = int(left['HashKeyRange']['EndingHashKey']) + 1 == \
+                int(right['HashKeyRange']['StartingHashKey'])
+            throttled = sum(self.throttles(shard_id, metric_name)
+                            for shard_id in pair
+                            for metric_name in self.THROTTLE_METRIC_NAMES)
+            if adjacent and throttled == 0 and \
+                    not split_ids.intersection(pair):
+                peak, _ = self.peak(pair)
+                if peak <= target:
+                    merges.append({
+                        'ShardIds': pair,
+                        'PeakUtilizations': [
+                            round(100 * self.peak([shard_id])[0], 2)
+                            for shard_id in pair
+                        ],
+                        'ProjectedUtilization': round(100 * peak, 2),
+                    })
+                    index += 2
+                    continue
+            index += 1
+        return merges
+
+    @staticmethod
+    def split_hash_keys(shard, count):
+        '''
+        Starting hash keys of the new shards but the first when the hash
+        key range of the shard is split into count even parts.
+        '''
+        start = int(shard['HashKeyRange']['StartingHashKey'])
+        end = int(shard['HashKeyRange']['EndingHashKey'])
+        size = end - start + 1
+        return [str(start + size * part // count) for part in range(1, count)]
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpointer(object):
+    '''
+    Keeps the sequence number of the last processed record of every shard
+    and persists them as JSON to the checkpoint file. Checkpoints are
+    kept in memory and only written every flush_interval seconds. The file
+    is replaced atomically so a crash never leaves a partial checkpoint.
+    '''
+
+    def __init__(self, path, flush_interval=5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._sequence_numbers = self._load()
+        self._dirty = False
+        self._last_flush = time.time()
+
+    def get(self, shard_id):
+        with self._lock:
+            return self._sequence_numbers.get(shard_id)
+
+    def checkpoint(self, shard_id, sequence_number):
+        with self._lock:
+            self._sequence_numbers[shard_id] = sequence_number
+            self._dirty = True
+            flush_due = time.time() - self._last_flush >= self.flush_interval
+        if flush_due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._write(dict(self._sequence_numbers))
+            self._dirty = False
+            self._last_flush = time.time()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def _write(self, sequence_numbers):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint')
+        try:
+            with os.fdopen(fd, 'w') as temp_file:
+                json.dump(sequence_numbers, temp_file, indent=2, sort_keys=True)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            # os.replace is atomic on all platforms, os.rename only on POSIX
+            getattr(os, 'replace', os.rename)(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        logger.debug('Wrote checkpoints for %d shards to %s' %
+                     (len(sequence_numbers), self.path))
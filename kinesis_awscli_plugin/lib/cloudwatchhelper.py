@@ -1,15 +1,262 @@
+import datetime
+import math
+import time
+from collections import OrderedDict
+
+from dateutil.tz import tzutc
+
 from kinesis_awscli_plugin.lib.awshelper import AWSHelper
+from kinesis_awscli_plugin.lib.fetchscheduler import FetchScheduler
+from kinesis_awscli_plugin.lib.ratelimiter import TokenBucket
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
 
 
 class CloudWatchHelper(AWSHelper):
-    def __init__(self, session, args):
+
+    MAX_QUERIES_PER_REQUEST = 500
+    # datapoints of all queries in a GetMetricData response
+    MAX_DATAPOINTS_PER_REQUEST = 100800
+
+    DEFAULT_PERIOD = 60
+
+    # CloudWatch keeps 1 minute datapoints for 15 days, 5 minute datapoints
+    # for 63 days and hourly datapoints for 455 days
+    RETENTION = [
+        (15 * 86400, 300),
+        (63 * 86400, 3600),
+    ]
+
+    # default CloudWatch quotas of transactions per second
+    GET_METRIC_DATA_TPS = 50
+
+    MAX_CONCURRENT_REQUESTS = 10
+
+    # GetMetricData returns values without units. The units of the Kinesis
+    # metrics are added to the datapoints, so they look like the ones of
+    # GetMetricStatistics.
+    METRIC_UNITS = {
+        'IncomingBytes': 'Bytes',
+        'IncomingRecords': 'Count',
+        'OutgoingBytes': 'Bytes',
+        'OutgoingRecords': 'Count',
+        'WriteProvisionedThroughputExceeded': 'Count',
+        'ReadProvisionedThroughputExceeded': 'Count',
+        'IteratorAgeMilliseconds': 'Milliseconds',
+        'PutRecord.Bytes': 'Bytes',
+        'PutRecord.Latency': 'Milliseconds',
+        'PutRecord.Success': 'Count',
+        'PutRecords.Bytes': 'Bytes',
+        'PutRecords.Latency': 'Milliseconds',
+        'PutRecords.Records': 'Count',
+        'PutRecords.Success': 'Count',
+        'GetRecords.Bytes': 'Bytes',
+        'GetRecords.IteratorAge': 'Milliseconds',
+        'GetRecords.IteratorAgeMilliseconds': 'Milliseconds',
+        'GetRecords.Latency': 'Milliseconds',
+        'GetRecords.Records': 'Count',
+        'GetRecords.Success': 'Count',
+    }
+
+    def __init__(self, session, args, cache=None):
         super(CloudWatchHelper, self).__init__(session)
         self.client = self.get_generic_client('cloudwatch', args)
+        # an optional DatapointCache
+        self.cache = cache
+        # the scheduler and limiters are shared by all requests of the
+        # helper, however many getters use it
+        self.scheduler = FetchScheduler(self.MAX_CONCURRENT_REQUESTS)
+        self.get_metric_data_limiter = TokenBucket(self.GET_METRIC_DATA_TPS)
 
     def get_metric_datapoints(self, **cw_args):
         response = self.client.get_metric_statistics(**cw_args)
         return response['Datapoints']
 
+    def get_metric_data(self, queries, start_time, end_time):
+        '''
+        Fetches the datapoints of many metrics with GetMetricData, packing
+        up to 500 metrics into a request. Each query is a dict with
+        Namespace, MetricName, Dimensions, Statistic and Period. Returns a
+        list of datapoints per query, in the order of the queries and in
+        the format of GetMetricStatistics.
+
+        With a cache only the ranges missing from the cache are fetched.
+        '''
+        if self.cache is not None:
+            return self.get_cached_metric_data(queries, start_time, end_time)
+        return self.get_uncached_metric_data(queries, start_time, end_time)
+
+    def get_cached_metric_data(self, queries, start_time, end_time):
+        now = time.time()
+        start = TimeUtils.to_epoch(start_time)
+        end = TimeUtils.to_epoch(end_time)
+        # queries with the same missing range share requests
+        requests = OrderedDict()
+        for index, query in enumerate(queries):
+            for missing in self.cache.missing_ranges(
+                    query, self.align(start, query), end,
+                    self.cache.settled_until(query['Period'], now)):
+                requests.setdefault(missing, []).append(index)
+        unsettled = [[] for _ in queries]
+        for (range_start, range_end), indices in requests.items():
+            results = self.get_uncached_metric_data(
+                [queries[index] for index in indices],
+                TimeUtils.from_epoch(range_start),
+                TimeUtils.from_epoch(range_end))
+            for index, datapoints in zip(indices, results):
+                query = queries[index]
+                settled = self.cache.settled_until(query['Period'], now)
+                pairs = [(TimeUtils.to_epoch(datapoint['Timestamp']),
+                          datapoint[query['Statistic']])
+                         for datapoint in datapoints]
+                if range_start < settled:
+                    self.cache.store(query, range_start,
+                                     min(range_end, settled), pairs)
+                unsettled[index].extend(
+                    datapoint for datapoint, (timestamp, _) in zip(
+                        datapoints, pairs) if timestamp >= settled)
+        datapoints = []
+        for index, query in enumerate(queries):
+            cached = self.cache.get(
+                query, self.align(start, query),
+                min(end, self.cache.settled_until(query['Period'], now)))
+            datapoints.append(self.to_datapoints(query, {
+                'Timestamps': [timestamp for timestamp, _ in cached],
+                'Values': [value for _, value in cached],
+            }) + unsettled[index])
+        self.cache.evict()
+        return datapoints
+
+    def align(self, timestamp, query):
+        # CloudWatch returns datapoints at multiples of the period
+        return timestamp // query['Period'] * query['Period']
+
+    def get_uncached_metric_data(self, queries, start_time, end_time):
+        # requests of up to 500 queries and a time window each are fetched
+        # concurrently, the pages of a request one after the other
+        requests = []
+        for first in range(0, len(queries), self.MAX_QUERIES_PER_REQUEST):
+            last = min(first + self.MAX_QUERIES_PER_REQUEST, len(queries))
+            for window_start, window_end in self.split_time_range(
+                    queries[first:last], start_time, end_time):
+                requests.append((first, last, window_start, window_end))
+        results = self.scheduler.map(
+            lambda request: self.fetch_metric_data(queries, *request),
+            requests)
+        datapoints = [[] for _ in queries]
+        timestamps = [set() for _ in queries]
+        # the windows of a query are in ascending order
+        for (first, last, _, _), result in zip(requests, results):
+            for index, window_datapoints in zip(range(first, last), result):
+                for datapoint in window_datapoints:
+                    # windows may share their boundary
+                    if datapoint['Timestamp'] in timestamps[index]:
+                        continue
+                    timestamps[index].add(datapoint['Timestamp'])
+                    datapoints[index].append(datapoint)
+        return datapoints
+
+    def split_time_range(self, queries, start_time, end_time):
+        '''
+        Splits the time range into windows whose datapoints fit into a
+        single GetMetricData response, so long ranges are fetched with
+        concurrent requests rather than one page after the other.
+        '''
+        if not isinstance(start_time, datetime.datetime) or \
+                not isinstance(end_time, datetime.datetime):
+            return [(start_time, end_time)]
+        period = min(query['Period'] for query in queries)
+        points = max(self.MAX_DATAPOINTS_PER_REQUEST // len(queries), 1)
+        window = points * period
+        start = TimeUtils.to_epoch(start_time)
+        end = TimeUtils.to_epoch(end_time)
+        if end - start <= window:
+            return [(start_time, end_time)]
+        windows = []
+        window_start = start
+        # later windows start at multiples of the period
+        window_end = (start // period + points) * period
+        while window_start < end:
+            windows.append((TimeUtils.from_epoch(window_start),
+                            TimeUtils.from_epoch(min(window_end, end))))
+            window_start = window_end
+            window_end += window
+        return windows
+
+    @staticmethod
+    def choose_period(start_time, end_time, period=None, max_points=None,
+                      now=None):
+        '''
+        Period in seconds for a time range: the requested period, raised so
+        the range has at most max_points datapoints per metric and to the
+        resolution CloudWatch still keeps for the start of the range.
+        Periods are multiples of a minute.
+        '''
+        if period is None:
+            period = CloudWatchHelper.DEFAULT_PERIOD
+        if max_points is not None:
+            duration = TimeUtils.to_epoch(end_time) - \
+                TimeUtils.to_epoch(start_time)
+            period = max(period, int(math.ceil(duration / max_points)))
+        if now is None:
+            now = datetime.datetime.utcnow()
+        age = TimeUtils.to_epoch(now) - TimeUtils.to_epoch(start_time)
+        for retention, resolution in CloudWatchHelper.RETENTION:
+            if age > retention:
+                period = max(period, resolution)
+        return int(math.ceil(period / 60.0)) * 60
+
+    def fetch_metric_data(self, queries, first, last, start_time, end_time):
+        datapoints = [[] for _ in range(first, last)]
+        metric_data_queries = [
+            self.get_metric_data_query(index, queries[index])
+            for index in range(first, last)
+        ]
+        request = {
+            'MetricDataQueries': metric_data_queries,
+            'StartTime': start_time,
+            'EndTime': end_time,
+            'ScanBy': 'TimestampAscending',
+        }
+        while True:
+            response = self.scheduler.call(
+                lambda request: self.client.get_metric_data(**request),
+                request, self.get_metric_data_limiter)
+            for result in response['MetricDataResults']:
+                index = int(result['Id'][1:])
+                datapoints[index - first].extend(
+                    self.to_datapoints(queries[index], result))
+            if response.get('NextToken') is None:
+                return datapoints
+            request = dict(request, NextToken=response['NextToken'])
+
+    def get_metric_data_query(self, index, query):
+        return {
+            # ids have to start with a lower case letter
+            'Id': 'm%d' % index,
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': query['Namespace'],
+                    'MetricName': query['MetricName'],
+                    'Dimensions': query['Dimensions'],
+                },
+                'Period': query['Period'],
+                'Stat': query['Statistic'],
+            },
+            'ReturnData': True,
+        }
+
+    def to_datapoints(self, query, result):
+        # the AWS CLI returns the timestamps as ISO8601 strings, the cache
+        # as epoch seconds. Both become datetimes in UTC like the ones of
+        # botocore, so datapoints of all sources compare and sort alike.
+        unit = self.METRIC_UNITS.get(query['MetricName'], 'None')
+        return [{
+            'Timestamp': TimeUtils.parse_timestamp(timestamp).replace(
+                tzinfo=tzutc()),
+            query['Statistic']: value,
+            'Unit': unit
+        } for timestamp, value in zip(result['Timestamps'], result['Values'])]
+
     def get_shard_dimensions(self, stream_name, shard_id):
         return [
             {
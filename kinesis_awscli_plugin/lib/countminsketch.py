@@ -0,0 +1,41 @@
+import hashlib
+import struct
+from array import array
+
+
+class CountMinSketch(object):
+    '''
+    Fixed size frequency table for an unbounded number of keys. Every key
+    is counted in one cell per row, estimate() returns the smallest of
+    these cells. Estimates are never too low and too high by at most
+    2 * total / width with a probability of 1 - 0.5 ** depth.
+    '''
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.total = 0.0
+        self._rows = [array('d', [0.0]) * width for row in range(depth)]
+
+    def cells(self, key):
+        '''
+        Returns the cell of key in every row. Callers that update several
+        sketches with the same key compute them once.
+        '''
+        first, second = struct.unpack(
+            '>QQ', hashlib.md5(key.encode('utf-8')).digest())
+        # double hashing derives any number of rows from two hashes
+        return [(first + row * second) % self.width
+                for row in range(self.depth)]
+
+    def add(self, key, count=1, cells=None):
+        if cells is None:
+            cells = self.cells(key)
+        for row, cell in zip(self._rows, cells):
+            row[cell] += count
+        self.total += count
+
+    def estimate(self, key, cells=None):
+        if cells is None:
+            cells = self.cells(key)
+        return min(row[cell] for row, cell in zip(self._rows, cells))
@@ -0,0 +1,197 @@
+import logging
+import sqlite3
+import time
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class DatapointCache(object):
+    '''
+    SQLite file of CloudWatch datapoints, so repeated queries only fetch
+    the time ranges they have not seen before. Datapoints are keyed by
+    stream, shard, metric, statistic, period and timestamp. For every
+    series the cache records the time ranges it covers, which tells a
+    range without datapoints apart from one that was never fetched.
+
+    Only settled datapoints are cached. The most recent settle_time
+    seconds are still being aggregated by CloudWatch and always fetched
+    again. Ranges not fetched for ttl seconds are evicted, and the least
+    recently fetched ranges once the cache holds more than max_datapoints.
+    Adjacent ranges are merged and keep the fetch time of their oldest
+    part, so no datapoint stays longer than ttl seconds, however often the
+    ranges next to it are fetched.
+
+    All times are seconds since the epoch.
+    '''
+
+    SETTLE_TIME = 300
+    TTL = 7 * 24 * 3600
+    MAX_DATAPOINTS = 5000000
+
+    SERIES = 'stream_name = ? AND shard_id = ? AND metric_name = ? AND ' \
+             'statistic = ? AND period = ?'
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS datapoints ('
+        '  stream_name TEXT NOT NULL,'
+        '  shard_id TEXT NOT NULL,'
+        '  metric_name TEXT NOT NULL,'
+        '  statistic TEXT NOT NULL,'
+        '  period INTEGER NOT NULL,'
+        '  timestamp REAL NOT NULL,'
+        '  value REAL NOT NULL,'
+        '  PRIMARY KEY (stream_name, shard_id, metric_name, statistic, '
+        '    period, timestamp))',
+        'CREATE TABLE IF NOT EXISTS coverage ('
+        '  stream_name TEXT NOT NULL,'
+        '  shard_id TEXT NOT NULL,'
+        '  metric_name TEXT NOT NULL,'
+        '  statistic TEXT NOT NULL,'
+        '  period INTEGER NOT NULL,'
+        '  range_start REAL NOT NULL,'
+        '  range_end REAL NOT NULL,'
+        '  fetched REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS coverage_series ON coverage ('
+        '  stream_name, shard_id, metric_name, statistic, period, '
+        '  range_start)',
+    ]
+
+    def __init__(self,
+                 path,
+                 ttl=TTL,
+                 max_datapoints=MAX_DATAPOINTS,
+                 settle_time=SETTLE_TIME):
+        self.path = path
+        self.ttl = ttl
+        self.max_datapoints = max_datapoints
+        self.settle_time = settle_time
+        self._lock = Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
+
+    @staticmethod
+    def series(query):
+        '''
+        The key of the series of a metric query of CloudWatchHelper.
+        '''
+        dimensions = dict((dimension['Name'], dimension['Value'])
+                          for dimension in query['Dimensions'])
+        return (dimensions.get('StreamName', ''),
+                dimensions.get('ShardId', ''), query['MetricName'],
+                query['Statistic'], query['Period'])
+
+    def settled_until(self, period, now=None):
+        '''
+        Start of the first period that may still change.
+        '''
+        if now is None:
+            now = time.time()
+        return (now - self.settle_time) // period * period
+
+    def missing_ranges(self, query, start, end, settled):
+        '''
+        The ranges between start and end that have to be fetched: the
+        gaps in the coverage before settled and everything after it.
+        '''
+        with self._lock:
+            covered = self._connection.execute(
+                'SELECT range_start, range_end FROM coverage WHERE ' +
+                self.SERIES + ' AND range_end > ? AND range_start < ? '
+                'ORDER BY range_start',
+                self.series(query) + (start, min(end, settled))).fetchall()
+        missing = []
+        position = start
+        for range_start, range_end in covered:
+            if range_start > position:
+                missing.append((position, range_start))
+            position = max(position, range_end)
+        if position < end:
+            missing.append((position, end))
+        return missing
+
+    def store(self, query, start, end, datapoints):
+        '''
+        Stores the (timestamp, value) datapoints of the settled range from
+        start to end and marks the range as covered.
+        '''
+        series = self.series(query)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO datapoints (stream_name, shard_id, '
+                'metric_name, statistic, period, timestamp, value) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [series + (timestamp, value)
+                 for timestamp, value in datapoints
+                 if start <= timestamp < end])
+            # merge with overlapping and adjacent ranges
+            fetched = now
+            for range_start, range_end, range_fetched in \
+                    self._connection.execute(
+                        'SELECT range_start, range_end, fetched FROM '
+                        'coverage WHERE ' + self.SERIES +
+                        ' AND range_end >= ? AND range_start <= ?',
+                        series + (start, end)).fetchall():
+                start = min(start, range_start)
+                end = max(end, range_end)
+                fetched = min(fetched, range_fetched)
+            self._connection.execute(
+                'DELETE FROM coverage WHERE ' + self.SERIES +
+                ' AND range_end >= ? AND range_start <= ?',
+                series + (start, end))
+            self._connection.execute(
+                'INSERT INTO coverage (stream_name, shard_id, metric_name, '
+                'statistic, period, range_start, range_end, fetched) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                series + (start, end, fetched))
+
+    def get(self, query, start, end):
+        '''
+        The cached (timestamp, value) datapoints between start and end in
+        ascending order.
+        '''
+        with self._lock:
+            return self._connection.execute(
+                'SELECT timestamp, value FROM datapoints WHERE ' +
+                self.SERIES + ' AND timestamp >= ? AND timestamp < ? '
+                'ORDER BY timestamp',
+                self.series(query) + (start, end)).fetchall()
+
+    def evict(self):
+        now = time.time()
+        with self._lock, self._connection:
+            expired = self._connection.execute(
+                'SELECT rowid FROM coverage WHERE fetched < ?',
+                (now - self.ttl, )).fetchall()
+            for (rowid, ) in expired:
+                self._delete_range(rowid)
+            datapoint_count = self._connection.execute(
+                'SELECT COUNT(*) FROM datapoints').fetchone()[0]
+            if datapoint_count <= self.max_datapoints:
+                return
+            for (rowid, ) in self._connection.execute(
+                    'SELECT rowid FROM coverage ORDER BY fetched').fetchall():
+                datapoint_count -= self._delete_range(rowid)
+                if datapoint_count <= self.max_datapoints:
+                    break
+            logger.debug('Evicted datapoints down to %d' % datapoint_count)
+
+    def _delete_range(self, rowid):
+        row = self._connection.execute(
+            'SELECT stream_name, shard_id, metric_name, statistic, period, '
+            'range_start, range_end FROM coverage WHERE rowid = ?',
+            (rowid, )).fetchone()
+        self._connection.execute('DELETE FROM coverage WHERE rowid = ?',
+                                 (rowid, ))
+        return self._connection.execute(
+            'DELETE FROM datapoints WHERE ' + self.SERIES +
+            ' AND timestamp >= ? AND timestamp < ?', row).rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,118 @@
+import logging
+import random
+import sys
+import time
+from threading import Lock, Thread
+
+import six
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+
+class FetchScheduler(object):
+    '''
+    Runs API requests on a bounded number of threads and returns their
+    results in the order of the requests. An optional token bucket keeps
+    the requests within the API rate limits. Throttled requests are
+    retried with exponential backoff and full jitter. The first request
+    that fails for another reason, or runs out of retries, stops the
+    remaining requests and its exception is raised to the caller.
+
+    The clients of botocore retry throttled requests themselves, with
+    their own backoff. The retries of the scheduler only start
+    once botocore gave up, so they are the outer and slower layer: a
+    request is sent up to (max_retries + 1) times the attempts of botocore.
+    Clients that should only be retried here can be created with
+    Config(retries={'max_attempts': 0}).
+    '''
+
+    THROTTLING_ERRORS = ('Throttling', 'ThrottlingException',
+                         'RequestLimitExceeded', 'TooManyRequestsException')
+    INITIAL_RETRY_DELAY = 0.2
+    MAX_RETRY_DELAY = 10
+
+    def __init__(self, max_workers=10, max_retries=8):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.requests_retried = 0
+        self._lock = Lock()
+
+    def map(self, function, items, limiter=None):
+        items = list(items)
+        results = [None] * len(items)
+        if len(items) <= 1 or self.max_workers <= 1:
+            for index, item in enumerate(items):
+                results[index] = self.call(function, item, limiter)
+            return results
+        state = _MapState(len(items))
+        workers = [
+            Thread(target=self._work,
+                   args=(function, items, limiter, results, state))
+            for _ in range(min(self.max_workers, len(items)))
+        ]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if state.exc_info is not None:
+            six.reraise(*state.exc_info)
+        return results
+
+    def _work(self, function, items, limiter, results, state):
+        while True:
+            index = state.next_index()
+            if index is None:
+                return
+            try:
+                results[index] = self.call(function, items[index], limiter)
+            except Exception:
+                state.fail(sys.exc_info())
+                return
+
+    def call(self, function, item, limiter=None):
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                return function(item)
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in self.THROTTLING_ERRORS or \
+                        attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            with self._lock:
+                self.requests_retried += 1
+            delay = self.retry_delay(attempt)
+            logger.debug('Request was throttled, retrying in %.2f seconds' %
+                         delay)
+            time.sleep(delay)
+
+    def retry_delay(self, attempt):
+        delay = min(self.MAX_RETRY_DELAY,
+                    self.INITIAL_RETRY_DELAY * 2 ** (attempt - 1))
+        return random.uniform(0, delay)
+
+
+class _MapState(object):
+    def __init__(self, count):
+        self.count = count
+        self.exc_info = None
+        self._next = 0
+        self._lock = Lock()
+
+    def next_index(self):
+        with self._lock:
+            if self.exc_info is not None or self._next >= self.count:
+                return None
+            index = self._next
+            self._next += 1
+            return index
+
+    def fail(self, exc_info):
+        with self._lock:
+            if self.exc_info is None:
+                self.exc_info = exc_info
@@ -0,0 +1,146 @@
+from botocore.exceptions import ClientError
+
+from kinesis_awscli_plugin.lib.fetchscheduler import FetchScheduler
+from kinesis_awscli_plugin.lib.ratelimiter import TokenBucket
+
+
+class FleetMetricsGetter(object):
+    '''
+    Stream-level metrics of every stream of several regions. The regions
+    are queried concurrently, each with its own clients. The metrics of
+    all streams of a region are fetched with batched GetMetricData
+    requests. Every stream gets one row with the metrics aggregated over
+    the time range, its open shard count and its peak write utilization.
+
+    regions is a list of (region name, KinesisHelper, CloudWatchHelper).
+    '''
+
+    UTILIZATION = 'Utilization'
+
+    # write limits of a shard per second
+    SHARD_BYTES_PER_SECOND = 1024 * 1024
+    SHARD_RECORDS_PER_SECOND = 1000
+
+    # default quota of DescribeStreamSummary per account
+    DESCRIBE_STREAM_SUMMARY_TPS = 20
+
+    def __init__(
+            self,
+            regions,
+            start_time,
+            end_time,
+            metric_names,
+            statistic='Sum',
+            period=60, ):
+        self.regions = regions
+        self.start_time = start_time
+        self.end_time = end_time
+        self.metric_names = metric_names
+        self.statistic = statistic
+        self.period = period
+        self.namespace = 'AWS/Kinesis'
+
+    def get(self, sort_by=UTILIZATION):
+        scheduler = FetchScheduler(max(len(self.regions), 1))
+        rows = []
+        for region_rows in scheduler.map(self.get_region, self.regions):
+            rows.extend(region_rows)
+        return self.sort(rows, sort_by)
+
+    def get_region(self, region):
+        region_name, kinesis_helper, cloudwatch_helper = region
+        summaries = FetchScheduler().map(
+            lambda stream_name: self.get_stream_summary(kinesis_helper,
+                                                        stream_name),
+            kinesis_helper.list_streams(),
+            TokenBucket(self.DESCRIBE_STREAM_SUMMARY_TPS, 1))
+        # streams deleted since they were listed are skipped
+        summaries = [summary for summary in summaries if summary is not None]
+        stream_names = [summary['StreamName'] for summary in summaries]
+        queries = []
+        for stream_name in stream_names:
+            dimensions = cloudwatch_helper.get_stream_dimensions(stream_name)
+            for metric_name, statistic in self.stream_metrics():
+                queries.append({
+                    'Namespace': self.namespace,
+                    'MetricName': metric_name,
+                    'Statistic': statistic,
+                    'Period': self.period,
+                    'Dimensions': dimensions,
+                })
+        datapoints = cloudwatch_helper.get_metric_data(
+            queries, self.start_time, self.end_time)
+        rows = []
+        query_count = len(self.stream_metrics())
+        for index, summary in enumerate(summaries):
+            stream_datapoints = datapoints[index * query_count:(index + 1) *
+                                           query_count]
+            row = {
+                'Region': region_name,
+                'StreamName': summary['StreamName'],
+                'OpenShardCount': summary['OpenShardCount'],
+            }
+            for metric_name, metric_datapoints in zip(self.metric_names,
+                                                      stream_datapoints):
+                row[metric_name] = self.aggregate(metric_datapoints,
+                                                  self.statistic)
+            row[self.UTILIZATION] = self.utilization(
+                stream_datapoints[-2], stream_datapoints[-1],
+                summary['OpenShardCount'])
+            rows.append(row)
+        return rows
+
+    def get_stream_summary(self, kinesis_helper, stream_name):
+        try:
+            return kinesis_helper.stream_summary(stream_name)
+        except ClientError as e:
+            if e.response.get('Error', {}).get(
+                    'Code') != 'ResourceNotFoundException':
+                raise
+            return None
+
+    def stream_metrics(self):
+        # the sums of incoming bytes and records give the utilization
+        return [(metric_name, self.statistic)
+                for metric_name in self.metric_names] + [
+                    ('IncomingBytes', 'Sum'), ('IncomingRecords', 'Sum')
+                ]
+
+    @staticmethod
+    def aggregate(datapoints, statistic):
+        '''
+        Combines the datapoints of the time range into one value of the
+        statistic.
+        '''
+        values = [float(datapoint[statistic]) for datapoint in datapoints]
+        if len(values) == 0:
+            return 0.0
+        if statistic in ('Sum', 'SampleCount'):
+            return sum(values)
+        if statistic == 'Maximum':
+            return max(values)
+        if statistic == 'Minimum':
+            return min(values)
+        return sum(values) / len(values)
+
+    def utilization(self, bytes_datapoints, records_datapoints, shard_count):
+        '''
+        Highest percentage of the write limits of the open shards used in
+        any period, by bytes or by records.
+        '''
+        if shard_count == 0:
+            return 0.0
+        capacity = float(shard_count * self.period)
+        utilization = 0.0
+        for datapoint in bytes_datapoints:
+            utilization = max(utilization, datapoint['Sum'] / (
+                capacity * self.SHARD_BYTES_PER_SECOND))
+        for datapoint in records_datapoints:
+            utilization = max(utilization, datapoint['Sum'] / (
+                capacity * self.SHARD_RECORDS_PER_SECOND))
+        return round(100 * utilization, 2)
+
+    def sort(self, rows, sort_by):
+        return sorted(rows,
+                      key=lambda row: (-row[sort_by], row['Region'],
+                                       row['StreamName']))
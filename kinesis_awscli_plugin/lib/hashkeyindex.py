@@ -0,0 +1,59 @@
+import bisect
+import hashlib
+
+
+class HashKeyIndex(object):
+    '''
+    Maps partition keys to the shards whose hash key range contains the
+    MD5 hash of the key, the way Kinesis assigns records to shards. The
+    ranges of closed parent shards overlap those of their children, so
+    the hash key space is split at every range boundary into disjoint
+    intervals that each know all shards covering them. A lookup is a
+    binary search over the interval starts.
+    '''
+
+    def __init__(self, shard_descriptions):
+        boundaries = set()
+        ranges = []
+        for shard in shard_descriptions:
+            hash_key_range = shard['HashKeyRange']
+            start = int(hash_key_range['StartingHashKey'])
+            end = int(hash_key_range['EndingHashKey'])
+            ranges.append((start, end, shard['ShardId']))
+            boundaries.add(start)
+            boundaries.add(end + 1)
+        self._starts = sorted(boundaries)
+        self._shard_ids = []
+        for index, start in enumerate(self._starts):
+            self._shard_ids.append([
+                shard_id for range_start, range_end, shard_id in ranges
+                if range_start <= start <= range_end
+            ])
+
+    @staticmethod
+    def hash_key(partition_key):
+        '''
+        The 128 bit hash key of a partition key.
+        '''
+        return int(hashlib.md5(partition_key.encode('utf-8')).hexdigest(), 16)
+
+    def shards_for_hash_key(self, hash_key):
+        index = bisect.bisect_right(self._starts, hash_key) - 1
+        if index < 0:
+            return []
+        return self._shard_ids[index]
+
+    def shards_for_key(self, partition_key):
+        return self.shards_for_hash_key(self.hash_key(partition_key))
+
+    def shards_for_keys(self, partition_keys):
+        '''
+        Returns the ids of the shards that own any of the partition keys
+        without duplicates.
+        '''
+        shard_ids = []
+        for partition_key in partition_keys:
+            for shard_id in self.shards_for_key(partition_key):
+                if shard_id not in shard_ids:
+                    shard_ids.append(shard_id)
+        return shard_ids
@@ -0,0 +1,35 @@
+import logging
+
+from kinesis_awscli_plugin.lib.lagreporter import LagReporter
+
+logger = logging.getLogger(__name__)
+
+
+class KeyStatsReporter(LagReporter):
+    '''
+    Periodically renders the heaviest partition keys of a KeyStatsTracker
+    like the LagReporter renders the lag of the shards.
+    '''
+
+    TABLE_HEADER = ('Metric', 'PartitionKey', 'ShardId', 'RecordsPerSecond',
+                    'BytesPerSecond', 'Share')
+
+    def __init__(self, stop_flag, key_stats, interval, output,
+                 report_format='table'):
+        super(KeyStatsReporter, self).__init__(stop_flag, None, interval,
+                                               output, report_format)
+        self.key_stats = key_stats
+
+    def snapshot(self):
+        return self.key_stats.snapshot()
+
+    def table_lines(self, snapshot):
+        lines = ['%-8s %-36s %-28s %18s %18s %8s' % self.TABLE_HEADER]
+        for key in snapshot:
+            partition_key = key['PartitionKey']
+            if len(partition_key) > 36:
+                partition_key = partition_key[:33] + '...'
+            lines.append('%-8s %-36s %-28s %18.2f %18.2f %7.2f%%' % (
+                key['Metric'], partition_key, key['ShardId'] or '-',
+                key['RecordsPerSecond'], key['BytesPerSecond'], key['Share']))
+        return lines
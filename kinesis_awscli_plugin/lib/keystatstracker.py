@@ -0,0 +1,134 @@
+import time
+from collections import deque
+from threading import Lock
+
+from kinesis_awscli_plugin.lib.countminsketch import CountMinSketch
+from kinesis_awscli_plugin.lib.spacesaving import SpaceSaving
+
+
+class KeyStatsTracker(object):
+    '''
+    Finds the partition keys with the most records and bytes over a
+    sliding window in fixed memory, whatever the number of distinct keys.
+    The window is split into buckets. Every bucket keeps a count-min
+    sketch and a Space-Saving summary for records and for bytes. The
+    candidates of the summaries of all buckets are ranked by the sum of
+    their sketch estimates, and buckets older than the window are dropped.
+    '''
+
+    METRICS = ('Records', 'Bytes')
+
+    def __init__(self, window=60, buckets=6, top=10, width=2048, depth=4):
+        self.window = window
+        self.bucket_length = float(window) / buckets
+        self.bucket_count = buckets
+        self.top = top
+        self.width = width
+        self.depth = depth
+        # a summary much larger than top keeps the ranking accurate
+        self.capacity = max(10 * top, 100)
+        self._lock = Lock()
+        self._buckets = deque()
+        self._started = time.time()
+
+    def record(self, record_batch):
+        # aggregate the batch first, so the lock is taken once per batch
+        counts = {}
+        for index in range(len(record_batch)):
+            key = record_batch.partition_key(index) or ''
+            key_counts = counts.get(key)
+            if key_counts is None:
+                key_counts = counts[key] = [0, 0]
+            key_counts[0] += 1
+            key_counts[1] += record_batch.payload_size(index)
+        if len(counts) == 0:
+            return
+        with self._lock:
+            bucket = self._current_bucket(time.time())
+            for key, (records, byte_count) in counts.items():
+                bucket.add(key, records, byte_count, record_batch.shard_id)
+
+    def snapshot(self):
+        '''
+        Returns the heaviest keys by records and by bytes over the window,
+        with their rates, their share of all records or bytes and the
+        shard they were read from.
+        '''
+        with self._lock:
+            now = time.time()
+            self._current_bucket(now)
+            return self._snapshot(
+                list(self._buckets),
+                max(min(now - self._started, self.window), 0.001))
+
+    def _snapshot(self, buckets, elapsed):
+        snapshot = []
+        for metric in self.METRICS:
+            totals = [0.0, 0.0]
+            candidates = set()
+            for bucket in buckets:
+                totals[0] += bucket.sketches[0].total
+                totals[1] += bucket.sketches[1].total
+                candidates.update(bucket.summaries[metric].keys())
+            estimates = []
+            for key in candidates:
+                cells = buckets[0].sketches[0].cells(key)
+                estimate = [
+                    sum(bucket.sketches[i].estimate(key, cells)
+                        for bucket in buckets) for i in (0, 1)
+                ]
+                estimates.append((key, estimate))
+            metric_index = self.METRICS.index(metric)
+            estimates.sort(key=lambda item: (-item[1][metric_index], item[0]))
+            for key, estimate in estimates[:self.top]:
+                total = totals[metric_index]
+                snapshot.append({
+                    'Metric': metric,
+                    'PartitionKey': key,
+                    'ShardId': self._label(buckets, key),
+                    'RecordsPerSecond': round(estimate[0] / elapsed, 2),
+                    'BytesPerSecond': round(estimate[1] / elapsed, 2),
+                    'Share': round(100.0 * estimate[metric_index] / total, 2)
+                    if total > 0 else 0.0,
+                })
+        return snapshot
+
+    def _label(self, buckets, key):
+        # the shard of the most recent bucket that still knows the key
+        for bucket in reversed(buckets):
+            for summary in bucket.summaries.values():
+                label = summary.label(key)
+                if label is not None:
+                    return label
+        return None
+
+    def _current_bucket(self, now):
+        bucket_index = int(now / self.bucket_length)
+        while len(self._buckets) > 0 and \
+                self._buckets[0].index <= bucket_index - self.bucket_count:
+            self._buckets.popleft()
+        if len(self._buckets) == 0 or self._buckets[-1].index != bucket_index:
+            self._buckets.append(
+                _Bucket(bucket_index, self.width, self.depth, self.capacity))
+        return self._buckets[-1]
+
+
+class _Bucket(object):
+    __slots__ = ('index', 'sketches', 'summaries')
+
+    def __init__(self, index, width, depth, capacity):
+        self.index = index
+        # records and bytes
+        self.sketches = (CountMinSketch(width, depth),
+                         CountMinSketch(width, depth))
+        self.summaries = {
+            'Records': SpaceSaving(capacity),
+            'Bytes': SpaceSaving(capacity),
+        }
+
+    def add(self, key, records, byte_count, shard_id):
+        cells = self.sketches[0].cells(key)
+        self.sketches[0].add(key, records, cells)
+        self.sketches[1].add(key, byte_count, cells)
+        self.summaries['Records'].add(key, records, shard_id)
+        self.summaries['Bytes'].add(key, byte_count, shard_id)
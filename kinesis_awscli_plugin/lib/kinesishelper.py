@@ -1,7 +1,14 @@
+import time
+
+from botocore.exceptions import ClientError
+
 from kinesis_awscli_plugin.lib.awshelper import AWSHelper
 
 
 class KinesisHelper(AWSHelper):
+
+    CONSUMER_STATUS_POLL_INTERVAL = 2
+
     def __init__(self, session, args):
         super(KinesisHelper, self).__init__(session)
         self.client = self.get_generic_client('kinesis', args)
@@ -13,6 +20,12 @@ class KinesisHelper(AWSHelper):
             'ShardLevelMetrics']) > 0
 
     def stream_shards(self, stream_name):
+        return [
+            shard['ShardId']
+            for shard in self.stream_shard_descriptions(stream_name)
+        ]
+
+    def stream_shard_descriptions(self, stream_name):
         exclusive_start_shard_id = None
         shard_array = []
         while True:
@@ -21,10 +34,10 @@ class KinesisHelper(AWSHelper):
             stream_description = self.client.describe_stream(
                 **describe_stream_args)['StreamDescription']
             shards = stream_description['Shards']
-            shard_array.extend(map(lambda shard: shard['ShardId'], shards))
+            shard_array.extend(shards)
             more_shards = self.has_more_shards(stream_description)
             if more_shards == True:
-                exclusive_start_shard_id = shard_array[-1]
+                exclusive_start_shard_id = shard_array[-1]['ShardId']
                 continue
             else:
                 break
@@ -43,10 +56,23 @@ class KinesisHelper(AWSHelper):
             'HasMoreShards'] == True
 
     def get_shard_iterator_from_latest(self, stream_name, shard_id):
+        return self.get_shard_iterator(stream_name, shard_id, 'LATEST')
+
+    def get_shard_iterator(self,
+                           stream_name,
+                           shard_id,
+                           shard_iterator_type,
+                           timestamp=None,
+                           sequence_number=None):
         params = dict(
             StreamName=stream_name,
             ShardId=shard_id,
-            ShardIteratorType='LATEST')
+            ShardIteratorType=shard_iterator_type)
+        if shard_iterator_type == 'AT_TIMESTAMP':
+            params['Timestamp'] = timestamp
+        elif shard_iterator_type in ('AT_SEQUENCE_NUMBER',
+                                     'AFTER_SEQUENCE_NUMBER'):
+            params['StartingSequenceNumber'] = sequence_number
         gsi_response = self.client.get_shard_iterator(**params)
         if gsi_response and gsi_response['ShardIterator']:
             return gsi_response['ShardIterator']
@@ -55,8 +81,70 @@ class KinesisHelper(AWSHelper):
                 'GetShardIterator did not return a valid iterator for stream %s, shard %s'
                 % (stream_name, shard_id))
     
+    def stream_arn(self, stream_name):
+        return self.client.describe_stream(
+            StreamName=stream_name)['StreamDescription']['StreamARN']
+
+    def register_stream_consumer(self, stream_name, consumer_name):
+        """
+        Registers an enhanced fan-out consumer for the stream or reuses
+        the consumer if it already exists. Waits until the consumer is
+        active and returns its ARN.
+        """
+        stream_arn = self.stream_arn(stream_name)
+        try:
+            consumer = self.client.register_stream_consumer(
+                StreamARN=stream_arn, ConsumerName=consumer_name)['Consumer']
+        except ClientError as e:
+            if e.response.get('Error', {}).get(
+                    'Code') != 'ResourceInUseException':
+                raise
+            consumer = self.describe_stream_consumer(stream_arn,
+                                                     consumer_name)
+        while consumer['ConsumerStatus'] != 'ACTIVE':
+            if consumer['ConsumerStatus'] == 'DELETING':
+                raise Exception('Consumer %s of stream %s is being deleted' %
+                                (consumer_name, stream_name))
+            time.sleep(self.CONSUMER_STATUS_POLL_INTERVAL)
+            consumer = self.describe_stream_consumer(stream_arn,
+                                                     consumer_name)
+        return consumer['ConsumerARN']
+
+    def describe_stream_consumer(self, stream_arn, consumer_name):
+        return self.client.describe_stream_consumer(
+            StreamARN=stream_arn,
+            ConsumerName=consumer_name)['ConsumerDescription']
+
     def put_record(self, stream_name, partition_key, data):
         params = dict(
             StreamName=stream_name, PartitionKey=partition_key, Data=data)
         return self.client.put_record(**params)
- 
+
+    def put_records(self, stream_name, records):
+        return self.client.put_records(StreamName=stream_name, Records=records)
+
+    def open_shard_count(self, stream_name):
+        return len([
+            shard for shard in self.stream_shard_descriptions(stream_name)
+            if 'EndingSequenceNumber' not in shard['SequenceNumberRange']
+        ])
+
+    def list_streams(self):
+        stream_names = []
+        list_streams_args = {}
+        while True:
+            response = self.client.list_streams(**list_streams_args)
+            stream_names.extend(response['StreamNames'])
+            if not response.get('HasMoreStreams') or \
+                    len(response['StreamNames']) == 0:
+                break
+            list_streams_args['ExclusiveStartStreamName'] = stream_names[-1]
+        return stream_names
+
+    def stream_summary(self, stream_name):
+        """
+        DescribeStreamSummary returns the open shard count in a single
+        call, however many shards the stream has.
+        """
+        return self.client.describe_stream_summary(
+            StreamName=stream_name)['StreamDescriptionSummary']
@@ -10,9 +10,10 @@ class KinesisMetrics(object):
 
     @property
     def datapoint_average(self):
+        values = self.metric_values()
         # avoid division by zero
-        if len(self.metric_values()) > 0:
-            return sum(self.metric_values()) / len(self.metric_values())
+        if len(values) > 0:
+            return sum(values) / len(values)
         else:
             return 0
 
@@ -29,4 +30,5 @@ class KinesisMetrics(object):
         return self._has_data
 
     def metric_values(self):
-        return map(lambda x: float(x[self.statistic]), self.datapoints)
+        # a list, map() is lazy on Python 3
+        return [float(x[self.statistic]) for x in self.datapoints]
@@ -0,0 +1,75 @@
+import datetime
+import json
+import logging
+
+from kinesis_awscli_plugin.lib.threads import BaseThread
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+logger = logging.getLogger(__name__)
+
+
+class LagReporter(BaseThread):
+    '''
+    Periodically renders the snapshot of a LagTracker, either as a table
+    that is refreshed in place on terminals or as one JSON document per
+    shard and interval.
+    '''
+
+    REPORT_FORMATS = ['table', 'jsonl']
+
+    TABLE_HEADER = ('ShardId', 'MillisBehindLatest', 'RecordsPerSecond',
+                    'BytesPerSecond')
+
+    def __init__(self, stop_flag, lag_tracker, interval, output,
+                 report_format='table'):
+        super(LagReporter, self).__init__(stop_flag)
+        self.lag_tracker = lag_tracker
+        self.interval = interval
+        self.output = output
+        self.report_format = report_format
+        self._rendered_lines = 0
+
+    def _run(self):
+        while not self.stop_flag.is_set():
+            self.stop_flag.wait(self.interval)
+            self.report()
+
+    def report(self):
+        snapshot = self.snapshot()
+        if self.report_format == 'jsonl':
+            timestamp = TimeUtils.iso8601(datetime.datetime.utcnow())
+            for row in snapshot:
+                row['Timestamp'] = timestamp
+                self.output.write(json.dumps(row, sort_keys=True) + '\n')
+        else:
+            self.render_table(self.table_lines(snapshot))
+        self.output.flush()
+
+    def snapshot(self):
+        return self.lag_tracker.snapshot()
+
+    def table_lines(self, snapshot):
+        lines = ['%-28s %20s %18s %18s' % self.TABLE_HEADER]
+        for shard in snapshot:
+            lines.append('%-28s %20s %18s %18s' % (
+                shard['ShardId'], self.cell(shard['MillisBehindLatest']),
+                self.cell(shard['RecordsPerSecond'], '%.2f'),
+                self.cell(shard['BytesPerSecond'], '%.2f')))
+        return lines
+
+    def cell(self, value, value_format='%s'):
+        if value is None:
+            return '-'
+        return value_format % value
+
+    def render_table(self, lines):
+        if self._rendered_lines > 0 and self.is_terminal():
+            # move the cursor up and clear the previous table
+            self.output.write('\x1b[%dA\x1b[J' % self._rendered_lines)
+        elif self._rendered_lines > 0:
+            lines.insert(0, '')
+        self.output.write('\n'.join(lines) + '\n')
+        self._rendered_lines = len(lines)
+
+    def is_terminal(self):
+        return hasattr(self.output, 'isatty') and self.output.isatty()
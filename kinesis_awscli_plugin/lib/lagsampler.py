@@ -0,0 +1,87 @@
+import logging
+import time
+
+from botocore.exceptions import ClientError
+
+from kinesis_awscli_plugin.lib.checkpointer import Checkpointer
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+
+class LagSampler(BaseThread):
+    '''
+    Samples the lag of the consumer that writes a checkpoint file without
+    reading its records. Every interval the checkpoint file is read again
+    and one GetRecords call with Limit=1 after the checkpoint of every
+    shard records its MillisBehindLatest in a LagTracker. The returned
+    record is dropped, so a sample costs a single read per shard and the
+    read limits stay with the consumer. Shards without a checkpoint are
+    sampled at default_iterator_type.
+    '''
+
+    def __init__(self,
+                 stop_flag,
+                 kinesis_helper,
+                 stream_name,
+                 shard_ids,
+                 checkpoint_path,
+                 lag_tracker,
+                 interval,
+                 default_iterator_type='LATEST',
+                 duration=-1):
+        super(LagSampler, self).__init__(stop_flag)
+        self.kinesis_helper = kinesis_helper
+        self.stream_name = stream_name
+        self.shard_ids = shard_ids
+        self.checkpoint_path = checkpoint_path
+        self.lag_tracker = lag_tracker
+        self.interval = interval
+        self.default_iterator_type = default_iterator_type
+        self.duration = duration
+
+    def _run(self):
+        if self.duration == -1:
+            end_time = None
+        else:
+            end_time = time.time() + self.duration
+        while not self.stop_flag.is_set():
+            self.sample()
+            if end_time is not None and time.time() > end_time:
+                self.stop_flag.set()
+                break
+            self.stop_flag.wait(self.interval)
+
+    def sample(self):
+        # the consumer replaces the file atomically, it is read once per
+        # sample
+        checkpointer = Checkpointer(self.checkpoint_path)
+        for shard_id in self.shard_ids:
+            if self.stop_flag.is_set():
+                return
+            try:
+                millis_behind_latest = self.millis_behind_latest(
+                    shard_id, checkpointer.get(shard_id))
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != \
+                        'ProvisionedThroughputExceededException':
+                    raise
+                logger.debug('Sample of shard %s throttled' % shard_id)
+                continue
+            # records and bytes are the consumer's and not counted here
+            self.lag_tracker.record(shard_id, millis_behind_latest, None,
+                                    None)
+
+    def millis_behind_latest(self, shard_id, sequence_number):
+        if sequence_number is None:
+            shard_iterator = self.kinesis_helper.get_shard_iterator(
+                self.stream_name, shard_id, self.default_iterator_type)
+        else:
+            shard_iterator = self.kinesis_helper.get_shard_iterator(
+                self.stream_name,
+                shard_id,
+                'AFTER_SEQUENCE_NUMBER',
+                sequence_number=sequence_number)
+        gr_response = self.kinesis_helper.client.get_records(
+            ShardIterator=shard_iterator, Limit=1)
+        return gr_response.get('MillisBehindLatest')
@@ -0,0 +1,61 @@
+import time
+from threading import Lock
+
+
+class LagTracker(object):
+    '''
+    Collects the MillisBehindLatest of the latest GetRecords response and
+    the number of records and bytes read per shard. Rates are computed
+    over the time between two snapshots. Shards that are only sampled for
+    their lag, with None as counts, have rates of None.
+    '''
+
+    def __init__(self):
+        self._lock = Lock()
+        self._shards = {}
+        self._last_snapshot = time.time()
+
+    def record(self, shard_id, millis_behind_latest, record_count,
+               byte_count):
+        with self._lock:
+            shard = self._shards.setdefault(shard_id, {
+                'MillisBehindLatest': None,
+                'Records': None,
+                'Bytes': None
+            })
+            if millis_behind_latest is not None:
+                shard['MillisBehindLatest'] = millis_behind_latest
+            if record_count is not None:
+                shard['Records'] = (shard['Records'] or 0) + record_count
+                shard['Bytes'] = (shard['Bytes'] or 0) + byte_count
+
+    def snapshot(self):
+        '''
+        Returns the lag and rates per shard, the shards falling behind the
+        most first, and resets the counters.
+        '''
+        with self._lock:
+            now = time.time()
+            elapsed = max(now - self._last_snapshot, 0.001)
+            self._last_snapshot = now
+            snapshot = []
+            for shard_id, shard in self._shards.items():
+                snapshot.append({
+                    'ShardId': shard_id,
+                    'MillisBehindLatest': shard['MillisBehindLatest'],
+                    'RecordsPerSecond': self.rate(shard['Records'], elapsed),
+                    'BytesPerSecond': self.rate(shard['Bytes'], elapsed),
+                })
+                if shard['Records'] is not None:
+                    shard['Records'] = 0
+                    shard['Bytes'] = 0
+        return sorted(
+            snapshot,
+            key=lambda _shard: (-(_shard['MillisBehindLatest'] or 0),
+                                _shard['ShardId']))
+
+    @staticmethod
+    def rate(count, elapsed):
+        if count is None:
+            return None
+        return round(count / elapsed, 2)
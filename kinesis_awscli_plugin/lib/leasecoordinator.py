@@ -0,0 +1,115 @@
+import logging
+import time
+from threading import Event
+
+from kinesis_awscli_plugin.lib.shardlineage import ShardLineage
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseCoordinator(BaseThread):
+    '''
+    Runs a shard reader for every shard leased by this worker. The leases
+    are balanced every renew_interval seconds. Readers of lost leases are
+    stopped and readers that died are restarted once their lease was taken
+    again.
+
+    A shard that was read to its end keeps its lease until its last pulled
+    sequence number is checkpointed, which happens after the renderer wrote
+    the records. Only then it is marked SHARD_END. list_shards returns the
+    shard descriptions of the stream. They are listed again every
+    refresh_interval seconds and whenever a shard ended, and a shard is
+    only added to the lease store once its parents reached SHARD_END, so
+    the records of a key are read in order across splits and merges.
+
+    create_reader is called with a stop flag of its own and the shard id
+    and returns a reader thread that is not started yet. Readers start
+    whenever a lease is taken, so the coordinator sets the stop flag once
+    duration seconds passed instead of the readers.
+    '''
+
+    def __init__(self, stop_flag, lease_store, list_shards, create_reader,
+                 renew_interval, duration=-1, refresh_interval=60):
+        super(LeaseCoordinator, self).__init__(stop_flag)
+        self.lease_store = lease_store
+        self.list_shards = list_shards
+        self.create_reader = create_reader
+        self.renew_interval = renew_interval
+        self.duration = duration
+        self.refresh_interval = refresh_interval
+        self.readers = {}
+        # last pulled sequence number of the shards read to their end
+        self.ending = {}
+        self._next_refresh = 0
+
+    def _run(self):
+        if self.duration == -1:
+            end_time = None
+        else:
+            end_time = time.time() + self.duration
+        try:
+            while not self.stop_flag.is_set():
+                if end_time is not None and time.time() > end_time:
+                    self.stop_flag.set()
+                    break
+                self.reap_readers()
+                self.finish_ended_shards()
+                if time.time() >= self._next_refresh:
+                    self.refresh_shards()
+                self.assign(self.lease_store.balance())
+                self.stop_flag.wait(self.renew_interval)
+        finally:
+            for shard_id in list(self.readers.keys()):
+                self.stop_reader(shard_id)
+
+    def refresh_shards(self):
+        lineage = ShardLineage(self.list_shards())
+        self.lease_store.add_shards(
+            lineage.ready_shards(self.lease_store.finished_shards()))
+        self._next_refresh = time.time() + self.refresh_interval
+
+    def assign(self, owned_shard_ids):
+        for shard_id in list(self.readers.keys()):
+            if shard_id not in owned_shard_ids:
+                logger.debug('Lease of shard %s was lost' % shard_id)
+                self.stop_reader(shard_id)
+        for shard_id in list(self.ending.keys()):
+            if shard_id not in owned_shard_ids:
+                # the new owner reads the tail again from the checkpoint
+                del self.ending[shard_id]
+        for shard_id in owned_shard_ids:
+            if shard_id not in self.readers and shard_id not in self.ending:
+                logger.debug('Starting reader of leased shard %s' % shard_id)
+                reader = self.create_reader(Event(), shard_id)
+                reader.start()
+                self.readers[shard_id] = reader
+
+    def reap_readers(self):
+        for shard_id, reader in list(self.readers.items()):
+            if reader.is_alive():
+                continue
+            del self.readers[shard_id]
+            if getattr(reader, 'finished', False):
+                logger.debug('Shard %s was read to its end' % shard_id)
+                self.ending[shard_id] = getattr(reader,
+                                                'last_sequence_number', None)
+            else:
+                self.lease_store.release(shard_id)
+
+    def finish_ended_shards(self):
+        for shard_id, sequence_number in list(self.ending.items()):
+            if sequence_number is not None and \
+                    self.lease_store.get(shard_id) != sequence_number:
+                logger.debug('Waiting for the last checkpoint of shard %s' %
+                             shard_id)
+                continue
+            del self.ending[shard_id]
+            self.lease_store.finish_shard(shard_id)
+            # its children may be ready
+            self._next_refresh = 0
+
+    def stop_reader(self, shard_id):
+        reader = self.readers.pop(shard_id)
+        reader.stop_flag.set()
+        reader.join()
@@ -0,0 +1,214 @@
+import logging
+import math
+import os
+import socket
+import sqlite3
+import time
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseStore(object):
+    '''
+    SQLite table of shard leases shared by the pull processes of a consumer
+    group. A worker owns a shard as long as it renews the lease before it
+    expires. Every balance() call renews the leases of the worker, takes
+    over expired leases and steals a lease from the busiest worker until
+    every live worker owns about the same number of shards.
+
+    The checkpoint of a shard is kept in its lease row, so the store can be
+    used as checkpointer. A checkpoint is only written while the worker
+    owns the lease, and a shard that was read to its end is never leased
+    again.
+    '''
+
+    SHARD_END = 'SHARD_END'
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS leases ('
+        '  group_name TEXT NOT NULL,'
+        '  shard_id TEXT NOT NULL,'
+        '  owner TEXT,'
+        '  expires REAL NOT NULL DEFAULT 0,'
+        '  checkpoint TEXT,'
+        '  PRIMARY KEY (group_name, shard_id))',
+        'CREATE TABLE IF NOT EXISTS workers ('
+        '  group_name TEXT NOT NULL,'
+        '  worker_id TEXT NOT NULL,'
+        '  expires REAL NOT NULL,'
+        '  PRIMARY KEY (group_name, worker_id))',
+    ]
+
+    def __init__(self, path, group, lease_duration=30, worker_id=None):
+        self.path = path
+        self.group = group
+        self.lease_duration = lease_duration
+        if worker_id is None:
+            worker_id = '%s-%d' % (socket.gethostname(), os.getpid())
+        self.worker_id = worker_id
+        self._lock = Lock()
+        # autocommit, transactions are started explicitly
+        self._connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
+
+    def add_shards(self, shard_ids):
+        with self._transaction() as cursor:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO leases (group_name, shard_id) '
+                'VALUES (?, ?)', [(self.group, shard_id)
+                                  for shard_id in shard_ids])
+
+    def balance(self):
+        '''
+        Renews, takes and steals leases. Returns the ids of the shards the
+        worker owns afterwards.
+        '''
+        with self._transaction() as cursor:
+            now = time.time()
+            expires = now + self.lease_duration
+            cursor.execute(
+                'INSERT OR REPLACE INTO workers (group_name, worker_id, '
+                'expires) VALUES (?, ?, ?)',
+                (self.group, self.worker_id, expires))
+            cursor.execute(
+                'DELETE FROM workers WHERE group_name = ? AND expires < ?',
+                (self.group, now))
+            cursor.execute(
+                'SELECT COUNT(*) FROM workers WHERE group_name = ?',
+                (self.group, ))
+            worker_count = cursor.fetchone()[0]
+            cursor.execute(
+                'SELECT shard_id, owner, expires FROM leases '
+                'WHERE group_name = ? AND (checkpoint IS NULL OR '
+                'checkpoint != ?) ORDER BY shard_id',
+                (self.group, self.SHARD_END))
+            leases = cursor.fetchall()
+
+            target = int(math.ceil(len(leases) / float(worker_count)))
+            owned = []
+            free = []
+            owners = {}
+            for shard_id, owner, lease_expires in leases:
+                if owner is None or lease_expires < now:
+                    free.append(shard_id)
+                elif owner == self.worker_id:
+                    owned.append(shard_id)
+                else:
+                    owners.setdefault(owner, []).append(shard_id)
+            taken = free[:max(target - len(owned), 0)]
+            if len(owned) + len(taken) < target and len(owners) > 0:
+                # steal a single lease per round from the busiest worker
+                busiest = max(owners.values(), key=len)
+                if len(busiest) > target:
+                    logger.debug('Stealing lease of shard %s' % busiest[-1])
+                    taken.append(busiest[-1])
+            owned.extend(taken)
+            cursor.executemany(
+                'UPDATE leases SET owner = ?, expires = ? '
+                'WHERE group_name = ? AND shard_id = ?',
+                [(self.worker_id, expires, self.group, shard_id)
+                 for shard_id in owned])
+        return sorted(owned)
+
+    def finish_shard(self, shard_id):
+        '''
+        Marks a shard that was read to its end.
+        '''
+        self._update_owned(shard_id, 'checkpoint = ?', (self.SHARD_END, ))
+
+    def finished_shards(self):
+        '''
+        Ids of the shards of the group that were read to their end.
+        '''
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT shard_id FROM leases '
+                'WHERE group_name = ? AND checkpoint = ?',
+                (self.group, self.SHARD_END)).fetchall()
+        return set(row[0] for row in rows)
+
+    def release(self, shard_id):
+        self._update_owned(shard_id, 'owner = NULL, expires = 0', ())
+
+    def release_all(self):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'UPDATE leases SET owner = NULL, expires = 0 '
+                'WHERE group_name = ? AND owner = ?',
+                (self.group, self.worker_id))
+            cursor.execute(
+                'DELETE FROM workers WHERE group_name = ? AND worker_id = ?',
+                (self.group, self.worker_id))
+
+    def get(self, shard_id):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT checkpoint FROM leases '
+                'WHERE group_name = ? AND shard_id = ?',
+                (self.group, shard_id)).fetchone()
+        if row is None or row[0] == self.SHARD_END:
+            return None
+        return row[0]
+
+    def checkpoint(self, shard_id, sequence_number):
+        if not self._update_owned(shard_id, 'checkpoint = ?',
+                                  (sequence_number, )):
+            logger.debug('Not checkpointing shard %s. The lease was lost' %
+                         shard_id)
+
+    def flush(self):
+        # checkpoints are committed right away
+        pass
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _update_owned(self, shard_id, assignments, parameters):
+        with self._transaction() as cursor:
+            cursor.execute(
+                'UPDATE leases SET ' + assignments +
+                ' WHERE group_name = ? AND shard_id = ? AND owner = ? AND '
+                '(checkpoint IS NULL OR checkpoint != ?)',
+                parameters + (self.group, shard_id, self.worker_id,
+                              self.SHARD_END))
+            return cursor.rowcount > 0
+
+    def _transaction(self):
+        return _Transaction(self._connection, self._lock)
+
+
+class _Transaction(object):
+    '''
+    Serializes a transaction between the threads of this process and,
+    with BEGIN IMMEDIATE, between all processes of the group.
+    '''
+
+    def __init__(self, connection, lock):
+        self._connection = connection
+        self._lock = lock
+        self._cursor = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._cursor = self._connection.cursor()
+            self._cursor.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._lock.release()
+            raise
+        return self._cursor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._cursor.execute('COMMIT')
+            else:
+                self._cursor.execute('ROLLBACK')
+        finally:
+            self._lock.release()
@@ -0,0 +1,237 @@
+import datetime
+import logging
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from kinesis_awscli_plugin.lib.fetchscheduler import FetchScheduler
+from kinesis_awscli_plugin.lib.fleetmetricsgetter import FleetMetricsGetter
+from kinesis_awscli_plugin.lib.threads import BaseThread
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsExporter(BaseThread):
+    '''
+    Refreshes the stream and shard metrics of several streams in the
+    background and keeps the latest values as a snapshot in the Prometheus
+    text format, so scrapes never wait for CloudWatch. A failed refresh
+    keeps the previous snapshot.
+
+    Every metric exports the value of the latest complete period. Only the
+    max_shards shards with the highest values of a metric get their own
+    series, the others are combined into one series with the shard_id
+    "other", so the number of series does not grow with the shard count.
+
+    streams is a list of (StreamMetricsGetter, ShardMetricsGetter or None).
+    '''
+
+    PREFIX = 'aws_kinesis_'
+
+    OTHER_SHARDS = 'other'
+
+    # the latest periods are fetched again on every refresh
+    LOOKBACK = datetime.timedelta(minutes=10)
+
+    # shards are listed again after this many seconds
+    SHARD_LIST_TTL = 300
+
+    def __init__(self,
+                 stop_flag,
+                 streams,
+                 metric_names,
+                 shard_metric_names,
+                 statistic,
+                 interval,
+                 period=60,
+                 max_shards=20):
+        super(MetricsExporter, self).__init__(stop_flag)
+        self.streams = streams
+        self.metric_names = metric_names
+        self.shard_metric_names = shard_metric_names
+        self.statistic = statistic
+        self.interval = interval
+        self.period = period
+        self.max_shards = max_shards
+        self._lock = Lock()
+        self._snapshot = ''
+        self._series = 0
+        self._shard_ids = {}
+        self._refreshes = 0
+        self._refresh_errors = 0
+        self._refresh_duration = 0.0
+        self._last_refresh = 0.0
+        self._scrapes = 0
+        self._scrape_duration = 0.0
+
+    def _run(self):
+        while not self.stop_flag.is_set():
+            self.refresh()
+            self.stop_flag.wait(self.interval)
+
+    def refresh(self):
+        started = time.time()
+        try:
+            families = OrderedDict()
+            for stream_families in FetchScheduler().map(
+                    self.refresh_stream, self.streams):
+                for name, samples in stream_families:
+                    families.setdefault(name, []).extend(samples)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning('Refreshing metrics failed: %s' % e)
+            return self.refresh_failed()
+        except Exception:
+            # e.g. a response of an unexpected shape, the exporter keeps
+            # serving instead of stopping its thread
+            logger.exception('Refreshing metrics failed')
+            return self.refresh_failed()
+        snapshot = ''.join(
+            self.family_text(name, 'gauge', samples)
+            for name, samples in families.items())
+        with self._lock:
+            self._snapshot = snapshot
+            self._series = sum(len(samples) for samples in families.values())
+            self._refreshes += 1
+            self._refresh_duration = time.time() - started
+            self._last_refresh = time.time()
+        return True
+
+    def refresh_failed(self):
+        with self._lock:
+            self._refresh_errors += 1
+        return False
+
+    def refresh_stream(self, stream):
+        stream_metrics_getter, shard_metrics_getter = stream
+        stream_name = stream_metrics_getter.stream_name
+        end_time = datetime.datetime.utcnow()
+        start_time = end_time - self.LOOKBACK
+        families = []
+        for metrics in stream_metrics_getter.get(self.metric_names,
+                                                 start_time, end_time):
+            value = self.latest(metrics, end_time)
+            if value is not None:
+                families.append((self.metric_name(metrics.metric_id), [
+                    ({'stream_name': stream_name}, value)
+                ]))
+        if shard_metrics_getter is None:
+            return families
+        metrics_by_name = shard_metrics_getter.get_shard_metrics_by_name(
+            self.shard_ids(shard_metrics_getter), self.shard_metric_names,
+            start_time, end_time)
+        for metric_name in self.shard_metric_names:
+            values = []
+            for metrics in metrics_by_name[metric_name]:
+                value = self.latest(metrics, end_time)
+                if value is not None:
+                    values.append((metrics.metric_id, value))
+            families.append((self.metric_name(metric_name, 'shard'), [
+                ({'stream_name': stream_name, 'shard_id': shard_id}, value)
+                for shard_id, value in self.top_shards(values)
+            ]))
+        return families
+
+    def shard_ids(self, shard_metrics_getter):
+        stream_name = shard_metrics_getter.stream_name
+        listed, shard_ids = self._shard_ids.get(stream_name, (0, None))
+        if shard_ids is None or time.time() - listed > self.SHARD_LIST_TTL:
+            shard_ids = shard_metrics_getter.get_shard_ids_for_stream()
+            self._shard_ids[stream_name] = (time.time(), shard_ids)
+        return shard_ids
+
+    def latest(self, metrics, end_time):
+        '''
+        The value of the latest period that ended before end_time, None if
+        there is none.
+        '''
+        end = TimeUtils.to_epoch(end_time)
+        latest = None
+        for datapoint in metrics.datapoints:
+            timestamp = TimeUtils.to_epoch(datapoint['Timestamp'])
+            if timestamp + self.period > end:
+                continue
+            if latest is None or timestamp > latest[0]:
+                latest = (timestamp, float(datapoint[self.statistic]))
+        return None if latest is None else latest[1]
+
+    def top_shards(self, values):
+        '''
+        The max_shards highest (shard id, value) pairs and the aggregate of
+        the others.
+        '''
+        values = sorted(values, key=lambda value: (-value[1], value[0]))
+        top = values[:self.max_shards]
+        others = values[self.max_shards:]
+        if len(others) > 0:
+            top.append((self.OTHER_SHARDS, FleetMetricsGetter.aggregate(
+                [{self.statistic: value} for _, value in others],
+                self.statistic)))
+        return top
+
+    def metric_name(self, metric_name, level=None):
+        # IncomingBytes -> aws_kinesis_incoming_bytes_sum
+        name = re.sub('([a-z0-9])([A-Z])', r'\1_\2',
+                      metric_name.replace('.', '_')).lower()
+        if level is not None:
+            name = level + '_' + name
+        return self.PREFIX + name + '_' + self.statistic.lower()
+
+    def observe_scrape(self, duration):
+        with self._lock:
+            self._scrapes += 1
+            self._scrape_duration += duration
+
+    def render(self):
+        '''
+        The snapshot and the metrics of the exporter itself.
+        '''
+        with self._lock:
+            snapshot = self._snapshot
+            own = [
+                ('kinesis_exporter_scrape_duration_seconds', 'summary', [
+                    ('_count', {}, self._scrapes),
+                    ('_sum', {}, self._scrape_duration),
+                ]),
+                ('kinesis_exporter_refreshes_total', 'counter', [
+                    ('', {}, self._refreshes),
+                ]),
+                ('kinesis_exporter_refresh_errors_total', 'counter', [
+                    ('', {}, self._refresh_errors),
+                ]),
+                ('kinesis_exporter_refresh_duration_seconds', 'gauge', [
+                    ('', {}, self._refresh_duration),
+                ]),
+                ('kinesis_exporter_last_refresh_timestamp_seconds', 'gauge', [
+                    ('', {}, self._last_refresh),
+                ]),
+                ('kinesis_exporter_series', 'gauge', [
+                    ('', {}, self._series),
+                ]),
+            ]
+        lines = [snapshot]
+        for name, metric_type, samples in own:
+            lines.append('# TYPE %s %s\n' % (name, metric_type))
+            for suffix, labels, value in samples:
+                lines.append(self.sample_text(name + suffix, labels, value))
+        return ''.join(lines)
+
+    def family_text(self, name, metric_type, samples):
+        return '# TYPE %s %s\n' % (name, metric_type) + ''.join(
+            self.sample_text(name, labels, value) for labels, value in samples)
+
+    @staticmethod
+    def sample_text(name, labels, value):
+        if len(labels) == 0:
+            return '%s %s\n' % (name, repr(float(value)))
+        return '%s{%s} %s\n' % (name, ','.join(
+            '%s="%s"' % (label, MetricsExporter.escape(labels[label]))
+            for label in sorted(labels)), repr(float(value)))
+
+    @staticmethod
+    def escape(label_value):
+        return label_value.replace('\\', '\\\\').replace('"', '\\"').replace(
+            '\n', '\\n')
@@ -0,0 +1,156 @@
+import math
+import warnings
+from array import array
+
+
+class MetricsMatrix(object):
+    '''
+    The datapoints of several metrics, usually one per shard, as a matrix
+    with a row per metric and a column per timestamp. Missing datapoints
+    are NaN. The matrix is filled once and the statistics of all rows are
+    computed in one pass, vectorized with NumPy if it is installed and on
+    plain arrays otherwise.
+
+    Rows without datapoints have statistics of 0, like the average of an
+    empty KinesisMetrics.
+    '''
+
+    PERCENTILES = (50, 95, 99)
+
+    STATISTICS = ['Average', 'P50', 'P95', 'P99', 'Minimum', 'Maximum']
+
+    def __init__(self, metrics_array, statistic, use_numpy=None):
+        self.metrics_array = metrics_array
+        self.metric_ids = [metrics.metric_id for metrics in metrics_array]
+        self.statistic = statistic
+        if use_numpy is None:
+            use_numpy = MetricsMatrix.numpy_available()
+        self.use_numpy = use_numpy
+        timestamps = set()
+        rows = []
+        for metrics in metrics_array:
+            row = [(datapoint['Timestamp'], float(datapoint[statistic]))
+                   for datapoint in metrics.datapoints]
+            timestamps.update(timestamp for timestamp, _ in row)
+            rows.append(row)
+        self.timestamps = sorted(timestamps)
+        self.width = len(self.timestamps)
+        columns = dict((timestamp, column)
+                       for column, timestamp in enumerate(self.timestamps))
+        self.values = array('d', [float('nan')]) * (len(rows) * self.width)
+        for index, row in enumerate(rows):
+            offset = index * self.width
+            for timestamp, value in row:
+                self.values[offset + columns[timestamp]] = value
+        self._stats = None
+
+    @staticmethod
+    def numpy_available():
+        try:
+            import numpy
+            return True
+        except (ImportError, NameError):
+            return False
+
+    def __len__(self):
+        return len(self.metric_ids)
+
+    def row(self, index):
+        return self.values[index * self.width:(index + 1) * self.width]
+
+    def stats(self):
+        '''
+        Returns a dict of STATISTICS and Count to lists with a value per
+        row.
+        '''
+        if self._stats is None:
+            if self.use_numpy and len(self.values) > 0:
+                self._stats = self._numpy_stats()
+            else:
+                self._stats = self._array_stats()
+        return self._stats
+
+    def _numpy_stats(self):
+        import numpy
+        matrix = numpy.frombuffer(self.values, dtype=numpy.float64).reshape(
+            len(self), self.width)
+        counts = numpy.sum(~numpy.isnan(matrix), axis=1)
+        with warnings.catch_warnings():
+            # rows without datapoints are all NaN
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            columns = {
+                'Average': numpy.nanmean(matrix, axis=1),
+                'Minimum': numpy.nanmin(matrix, axis=1),
+                'Maximum': numpy.nanmax(matrix, axis=1),
+            }
+            percentiles = numpy.nanpercentile(matrix, self.PERCENTILES,
+                                              axis=1)
+        for percentile, values in zip(self.PERCENTILES, percentiles):
+            columns['P%d' % percentile] = values
+        stats = {'Count': [int(count) for count in counts]}
+        for name, values in columns.items():
+            stats[name] = [float(value) for value in numpy.nan_to_num(values)]
+        return stats
+
+    def _array_stats(self):
+        stats = dict((name, []) for name in self.STATISTICS + ['Count'])
+        for index in range(len(self)):
+            values = sorted(value for value in self.row(index)
+                            if value == value)
+            stats['Count'].append(len(values))
+            if len(values) == 0:
+                for name in self.STATISTICS:
+                    stats[name].append(0.0)
+                continue
+            stats['Average'].append(sum(values) / len(values))
+            stats['Minimum'].append(values[0])
+            stats['Maximum'].append(values[-1])
+            for percentile in self.PERCENTILES:
+                stats['P%d' % percentile].append(
+                    self.percentile(values, percentile))
+        return stats
+
+    @staticmethod
+    def percentile(sorted_values, percentile):
+        # linear interpolation between the closest ranks, like NumPy
+        rank = (len(sorted_values) - 1) * percentile / 100.0
+        lower = int(math.floor(rank))
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + \
+            (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+    def order(self, sort_by='Average', reverse=True):
+        '''
+        Row indices sorted by a statistic, descending by default. Rows with
+        the same value keep their order.
+        '''
+        values = self.stats()[sort_by]
+        if reverse:
+            return sorted(range(len(self)), key=lambda index: -values[index])
+        return sorted(range(len(self)), key=lambda index: values[index])
+
+    def skew(self, statistic='Average'):
+        '''
+        How unevenly a statistic is spread over the rows: the ratio of the
+        maximum to the mean, the Gini coefficient (0 when all rows are
+        equal, close to 1 when one row has everything) and the coefficient
+        of variation (standard deviation divided by the mean).
+        '''
+        values = sorted(self.stats()[statistic])
+        count = len(values)
+        total = sum(values)
+        if count == 0 or total == 0:
+            return {
+                'MaxMeanRatio': 0.0,
+                'Gini': 0.0,
+                'CoefficientOfVariation': 0.0
+            }
+        mean = total / count
+        variance = sum((value - mean) ** 2 for value in values) / count
+        weighted = sum((index + 1) * value
+                       for index, value in enumerate(values))
+        return {
+            'MaxMeanRatio': values[-1] / mean,
+            'Gini': 2.0 * weighted / (count * total) - (count + 1.0) / count,
+            'CoefficientOfVariation': math.sqrt(variance) / mean,
+        }
@@ -0,0 +1,60 @@
+import logging
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer(BaseThread):
+    '''
+    Serves the snapshot of a MetricsExporter over HTTP at /metrics for
+    Prometheus. Scrapes are answered from memory on their own threads.
+    '''
+
+    PATH = '/metrics'
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, stop_flag, exporter, address, port):
+        super(MetricsServer, self).__init__(stop_flag)
+        self.server = _ThreadingHTTPServer((address, port),
+                                           _MetricsRequestHandler)
+        self.server.exporter = exporter
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def _run(self):
+        self.server.serve_forever(poll_interval=0.5)
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != MetricsServer.PATH:
+            self.send_error(404)
+            return
+        started = time.time()
+        body = self.server.exporter.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', MetricsServer.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.exporter.observe_scrape(time.time() - started)
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s' % (self.address_string(), format % args))
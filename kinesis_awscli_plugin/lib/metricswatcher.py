@@ -0,0 +1,116 @@
+import datetime
+import logging
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from kinesis_awscli_plugin.lib.lagreporter import LagReporter
+from kinesis_awscli_plugin.lib.metricswindow import MetricsWindow
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsWatcher(LagReporter):
+    '''
+    Keeps the metrics of a rolling window up to date. Every refresh only
+    fetches the periods since the previous one, plus the most recent
+    minutes that CloudWatch may still have updated. The window is
+    rendered as a table that is refreshed in place, or the new and
+    changed datapoints are written as JSON lines. A failed refresh, for
+    example a throttled request, keeps the window and the next refresh
+    fetches the missed periods.
+
+    fetch(start_time, end_time) returns a list of KinesisMetrics.
+    '''
+
+    # CloudWatch keeps aggregating the last minutes for a while
+    REFETCH = datetime.timedelta(minutes=5)
+
+    TABLE_HEADER = ('Latest', 'Average', 'Minimum', 'Maximum', 'Datapoints')
+
+    def __init__(self,
+                 stop_flag,
+                 fetch,
+                 duration,
+                 statistic,
+                 interval,
+                 output,
+                 report_format='table',
+                 id_name='ShardId',
+                 sort=True):
+        super(MetricsWatcher, self).__init__(stop_flag, None, interval,
+                                             output, report_format)
+        self.fetch = fetch
+        self.duration = duration
+        self.statistic = statistic
+        self.id_name = id_name
+        self.sort = sort
+        self.window = MetricsWindow(duration.total_seconds(), statistic)
+        self._fetched_until = None
+
+    def _run(self):
+        while not self.stop_flag.is_set():
+            self.refresh()
+            self.stop_flag.wait(self.interval)
+
+    def refresh(self):
+        try:
+            self.report()
+        except (BotoCoreError, ClientError) as e:
+            logger.warning('Refreshing metrics failed: %s' % e)
+            return False
+        return True
+
+    def snapshot(self):
+        now = datetime.datetime.utcnow()
+        start_time = now - self.duration
+        if self._fetched_until is not None:
+            start_time = max(start_time, self._fetched_until - self.REFETCH)
+        changes = []
+        for metrics in self.fetch(start_time, now):
+            for datapoint in self.window.update(metrics.metric_id,
+                                                metrics.datapoints):
+                changes.append({
+                    self.id_name: metrics.metric_id,
+                    'DatapointTimestamp': TimeUtils.iso8601(
+                        TimeUtils.to_naive_utc(datapoint['Timestamp'])),
+                    self.statistic: datapoint[self.statistic],
+                    'Unit': datapoint.get('Unit'),
+                })
+        self.window.trim(now)
+        self._fetched_until = now
+        if self.report_format == 'jsonl':
+            return changes
+        return self.summary()
+
+    def summary(self):
+        metrics_array = self.window.metrics()
+        if self.sort:
+            metrics_array.sort(key=lambda metrics: metrics.datapoint_average,
+                               reverse=True)
+        summary = []
+        for metrics in metrics_array:
+            row = {self.id_name: metrics.metric_id, 'Datapoints': 0}
+            if metrics.has_data:
+                row.update({
+                    'Latest': metrics.datapoints[-1][self.statistic],
+                    'Average': metrics.datapoint_average,
+                    'Minimum': metrics.datapoint_min,
+                    'Maximum': metrics.datapoint_max,
+                    'Datapoints': len(metrics.datapoints),
+                })
+            summary.append(row)
+        return summary
+
+    def table_lines(self, snapshot):
+        lines = ['%-36s %14s %14s %14s %14s %10s' % (
+            (self.id_name, ) + self.TABLE_HEADER)]
+        for row in snapshot:
+            if row['Datapoints'] == 0:
+                lines.append('%-36s %14s %14s %14s %14s %10d' % (
+                    row[self.id_name], '-', '-', '-', '-', 0))
+                continue
+            lines.append('%-36s %14.2f %14.2f %14.2f %14.2f %10d' % (
+                row[self.id_name], row['Latest'], row['Average'],
+                row['Minimum'], row['Maximum'], row['Datapoints']))
+        return lines
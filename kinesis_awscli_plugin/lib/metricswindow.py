@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+
+class MetricsWindow(object):
+    '''
+    Rolling window of the datapoints of several metrics, e.g. one per
+    shard. Refreshed datapoints replace the ones with the same timestamp,
+    so overlapping fetches of the most recent periods are merged, and
+    datapoints older than the window are dropped.
+    '''
+
+    def __init__(self, duration, statistic):
+        self.duration = duration
+        self.statistic = statistic
+        # metric id -> {epoch seconds: datapoint}
+        self._datapoints = OrderedDict()
+
+    def update(self, metric_id, datapoints):
+        '''
+        Adds datapoints of a metric and returns the ones that are new or
+        have a different value than before.
+        '''
+        window = self._datapoints.setdefault(metric_id, {})
+        changed = []
+        for datapoint in datapoints:
+            timestamp = TimeUtils.to_epoch(datapoint['Timestamp'])
+            previous = window.get(timestamp)
+            if previous is None or \
+                    previous[self.statistic] != datapoint[self.statistic]:
+                changed.append(datapoint)
+            window[timestamp] = datapoint
+        return changed
+
+    def trim(self, now):
+        start = TimeUtils.to_epoch(now) - self.duration
+        for window in self._datapoints.values():
+            for timestamp in [t for t in window if t < start]:
+                del window[timestamp]
+
+    def metrics(self):
+        '''
+        KinesisMetrics of every metric with the datapoints in ascending
+        order, in the order the metrics were first updated.
+        '''
+        return [
+            KinesisMetrics(metric_id,
+                           [window[t] for t in sorted(window)],
+                           self.statistic)
+            for metric_id, window in self._datapoints.items()
+        ]
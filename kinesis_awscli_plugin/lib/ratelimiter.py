@@ -0,0 +1,59 @@
+import time
+from threading import Lock
+
+
+class TokenBucket(object):
+    '''
+    Thread safe token bucket. acquire() reserves tokens right away and
+    sleeps until the bucket has refilled the reserved amount, so amounts
+    larger than the capacity are allowed and paid back over time.
+    '''
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('rate must be larger than zero: %s' % rate)
+        self.rate = float(rate)
+        if capacity is None:
+            capacity = rate
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = Lock()
+
+    def acquire(self, amount=1, stop_flag=None):
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            if stop_flag is not None:
+                stop_flag.wait(wait)
+            else:
+                time.sleep(wait)
+        return wait
+
+
+class ShardReadLimiter(object):
+    '''
+    Keeps concurrent readers of one shard within the Kinesis read limits
+    of 5 GetRecords calls and 2 MB per second.
+    '''
+
+    CALLS_PER_SECOND = 5
+    BYTES_PER_SECOND = 2 * 1024 * 1024
+
+    def __init__(self,
+                 calls_per_second=CALLS_PER_SECOND,
+                 bytes_per_second=BYTES_PER_SECOND):
+        # a capacity of one call avoids bursts that get throttled
+        self.calls = TokenBucket(calls_per_second, 1)
+        self.bytes = TokenBucket(bytes_per_second)
+
+    def acquire_call(self, stop_flag=None):
+        self.calls.acquire(1, stop_flag)
+
+    def acquire_bytes(self, byte_count, stop_flag=None):
+        self.bytes.acquire(byte_count, stop_flag)
@@ -0,0 +1,222 @@
+import base64
+from array import array
+
+import six
+
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+
+class RecordBatch(object):
+    '''
+    Records of one GetRecords call or SubscribeToShard event in a compact
+    layout. All payloads are kept in one contiguous bytes buffer with an
+    array of offsets, arrival timestamps in an array of epoch seconds. This
+    keeps a queued batch at a handful of objects instead of a dict per
+    record. data(index) returns a zero-copy memoryview of a payload,
+    payload(index) a bytes copy.
+
+    The AWS CLI leaves the payloads base64 encoded. They are kept encoded
+    until a payload is first read and then decoded all at once, so the
+    decoding happens in whichever process reads the records, for example
+    in the workers of a BatchDecoder, rather than in the reader threads.
+    Sizes are those of the decoded payloads either way.
+    '''
+
+    __slots__ = ('shard_id', 'last_sequence_number', 'formatted', '_data',
+                 '_offsets', '_encoded', '_sequence_numbers',
+                 '_partition_keys', '_arrival_timestamps')
+
+    def __init__(self, records, shard_id=None, last_sequence_number=None):
+        '''
+        records are dicts as returned by GetRecords and SubscribeToShard.
+        The AWS CLI returns their arrival timestamps as epoch seconds and
+        their payloads as base64 text.
+        '''
+        payloads = [record['Data'] for record in records]
+        encoded = len(payloads) > 0 and all(
+            isinstance(payload, six.text_type) for payload in payloads)
+        if encoded:
+            payloads = [payload.encode('ascii') for payload in payloads]
+        else:
+            payloads = [self.decode(payload) for payload in payloads]
+        self._pack(
+            [record['SequenceNumber'] for record in records],
+            [record.get('PartitionKey') for record in records],
+            [TimeUtils.to_epoch(record.get('ApproximateArrivalTimestamp'))
+             for record in records],
+            payloads, encoded)
+        self.shard_id = shard_id
+        # a filtered batch may be empty but still advances the checkpoint
+        if last_sequence_number is None and len(self) > 0:
+            last_sequence_number = self._sequence_numbers[-1]
+        self.last_sequence_number = last_sequence_number
+        # output bytes if the batch was already formatted by a BatchDecoder
+        self.formatted = None
+
+    @staticmethod
+    def decode(data):
+        '''
+        The payload bytes of the Data of a record, which is base64 text in
+        responses of the AWS CLI and bytes with other response parsers.
+        '''
+        if isinstance(data, six.text_type):
+            return base64.b64decode(data)
+        return data
+
+    def derive(self, records):
+        '''
+        Returns a batch of the same shard and checkpoint with the given
+        Record views, for example the records that passed a filter.
+        '''
+        record_batch = RecordBatch.__new__(RecordBatch)
+        record_batch._pack(
+            [record.sequence_number for record in records],
+            [record.partition_key for record in records],
+            [record.arrival_timestamp for record in records],
+            [record.data for record in records])
+        record_batch.shard_id = self.shard_id
+        record_batch.last_sequence_number = self.last_sequence_number
+        record_batch.formatted = None
+        return record_batch
+
+    def head(self, count):
+        '''
+        Returns a batch of the first count records, checkpointed at the
+        last of them. Used to cut a batch at an end position, the payloads
+        stay as they are.
+        '''
+        if count >= len(self):
+            return self
+        record_batch = RecordBatch.__new__(RecordBatch)
+        record_batch._data = self._data[:self._offsets[count]]
+        record_batch._offsets = self._offsets[:count + 1]
+        record_batch._encoded = self._encoded
+        record_batch._sequence_numbers = self._sequence_numbers[:count]
+        record_batch._partition_keys = self._partition_keys[:count]
+        record_batch._arrival_timestamps = self._arrival_timestamps[:count]
+        record_batch.shard_id = self.shard_id
+        record_batch.last_sequence_number = \
+            self._sequence_numbers[count - 1] if count > 0 else None
+        record_batch.formatted = None
+        return record_batch
+
+    def _pack(self, sequence_numbers, partition_keys, arrival_timestamps,
+              payloads, encoded=False):
+        data = bytearray()
+        offsets = array('L', [0])
+        for payload in payloads:
+            data += payload
+            offsets.append(len(data))
+        self._data = bytes(data)
+        self._offsets = offsets
+        self._encoded = encoded
+        self._sequence_numbers = tuple(sequence_numbers)
+        self._partition_keys = tuple(partition_keys)
+        self._arrival_timestamps = array('d', arrival_timestamps)
+
+    def _decode(self):
+        if not self._encoded:
+            return
+        data = bytearray()
+        offsets = array('L', [0])
+        for index in range(len(self)):
+            data += base64.b64decode(
+                self._data[self._offsets[index]:self._offsets[index + 1]])
+            offsets.append(len(data))
+        self._data = bytes(data)
+        self._offsets = offsets
+        self._encoded = False
+
+    def __len__(self):
+        return len(self._sequence_numbers)
+
+    def __iter__(self):
+        self._decode()
+        for index in range(len(self)):
+            yield Record(
+                self.data(index), self._sequence_numbers[index],
+                self._partition_keys[index], self._arrival_timestamps[index])
+
+    @property
+    def size(self):
+        '''
+        Payload bytes of the batch, or output bytes once it is formatted.
+        '''
+        if self.formatted is not None:
+            return len(self.formatted)
+        if self._encoded:
+            return sum(self.payload_size(index) for index in range(len(self)))
+        return len(self._data)
+
+    def data(self, index):
+        self._decode()
+        return memoryview(self._data)[self._offsets[index]:
+                                      self._offsets[index + 1]]
+
+    def payload(self, index):
+        self._decode()
+        return self._data[self._offsets[index]:self._offsets[index + 1]]
+
+    def payload_size(self, index):
+        start = self._offsets[index]
+        end = self._offsets[index + 1]
+        if not self._encoded or end == start:
+            return end - start
+        # 3 bytes per 4 characters, less the padding
+        return (end - start) // 4 * 3 - \
+            self._data[end - 2:end].count(b'=')
+
+    def sequence_number(self, index):
+        return self._sequence_numbers[index]
+
+    def partition_key(self, index):
+        return self._partition_keys[index]
+
+    def arrival_timestamp(self, index):
+        '''
+        Naive UTC datetime or None.
+        '''
+        return TimeUtils.from_epoch(self._arrival_timestamps[index])
+
+    def release(self):
+        '''
+        Drops the records but keeps shard, checkpoint and formatted output.
+        '''
+        self._pack([], [], [], [])
+
+    def __getstate__(self):
+        return (self.shard_id, self.last_sequence_number, self.formatted,
+                self._data, self._offsets.tolist(), self._encoded,
+                self._sequence_numbers, self._partition_keys,
+                self._arrival_timestamps.tolist())
+
+    def __setstate__(self, state):
+        (self.shard_id, self.last_sequence_number, self.formatted,
+         self._data, offsets, self._encoded, self._sequence_numbers,
+         self._partition_keys, arrival_timestamps) = state
+        self._offsets = array('L', offsets)
+        self._arrival_timestamps = array('d', arrival_timestamps)
+
+
+class Record(object):
+    '''
+    View of a single record of a RecordBatch. data is a memoryview into the
+    buffer of the batch, arrival_timestamp are epoch seconds (NaN if
+    unknown).
+    '''
+
+    __slots__ = ('data', 'sequence_number', 'partition_key',
+                 'arrival_timestamp')
+
+    def __init__(self, data, sequence_number, partition_key,
+                 arrival_timestamp):
+        self.data = data
+        self.sequence_number = sequence_number
+        self.partition_key = partition_key
+        self.arrival_timestamp = arrival_timestamp
+
+    @property
+    def payload(self):
+        if isinstance(self.data, memoryview):
+            return self.data.tobytes()
+        return self.data
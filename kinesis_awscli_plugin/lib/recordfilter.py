@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import re
+
+from kinesis_awscli_plugin.lib.recordbatch import Record
+
+logger = logging.getLogger(__name__)
+
+
+class RecordFilter(object):
+    '''
+    Selects and projects the records of a batch before they get queued for
+    rendering. Expressions are compiled once and evaluated per record:
+
+     * filter_expression: "regex:PATTERN" (or just PATTERN) matches the
+       regular expression against the raw payload bytes (base64 decoded,
+       also for records of the AWS CLI),
+       "json:FIELD.PATH=VALUE" matches a field of JSON payloads
+     * projection: comma separated field paths. JSON payloads are replaced
+       by a JSON object with only these fields, other payloads are dropped
+     * sample_rate: fraction of partition keys to keep. The decision is
+       based on the MD5 hash of the partition key, so records with the same
+       key are always kept or dropped together
+     * partition_keys: only records with one of these partition keys are
+       kept
+    '''
+
+    # characters JSON encoders may escape, which makes the raw payload
+    # differ from the decoded field value
+    JSON_ESCAPED = re.compile(r'[^\x20-\x7e]|["\\/]')
+
+    def __init__(self, filter_expression=None, projection=None,
+                 sample_rate=None, partition_keys=None):
+        self._predicates = []
+        self._projection = None
+        if partition_keys is not None:
+            partition_keys = frozenset(partition_keys)
+            self._predicates.append(
+                lambda record, payload: record.partition_key in partition_keys)
+        if sample_rate is not None:
+            self._predicates.append(self._compile_sample(sample_rate))
+        if filter_expression is not None:
+            self._predicates.append(self._compile_filter(filter_expression))
+        if projection is not None:
+            self._projection = [
+                (path, path.split('.')) for path in projection.split(',')
+                if path != ''
+            ]
+
+    def filter_batch(self, record_batch):
+        return record_batch.derive(self.apply(record_batch))
+
+    def apply(self, records):
+        '''
+        Returns the selected Record views of records.
+        '''
+        selected = []
+        for record in records:
+            payload = _LazyPayload(record)
+            if not all(predicate(record, payload)
+                       for predicate in self._predicates):
+                continue
+            if self._projection is not None:
+                record = self._project(record, payload)
+                if record is None:
+                    continue
+            selected.append(record)
+        return selected
+
+    def _compile_sample(self, sample_rate):
+        if sample_rate <= 0 or sample_rate > 1:
+            raise ValueError('Sample rate must be larger than 0 and at most 1')
+        threshold = int(sample_rate * 0xffffffff)
+
+        def predicate(record, payload):
+            digest = hashlib.md5(
+                record.partition_key.encode('utf-8')).hexdigest()
+            return int(digest[:8], 16) <= threshold
+
+        return predicate
+
+    def _compile_filter(self, filter_expression):
+        if filter_expression.startswith('json:'):
+            return self._compile_json_filter(filter_expression[len('json:'):])
+        if filter_expression.startswith('regex:'):
+            filter_expression = filter_expression[len('regex:'):]
+        pattern = re.compile(filter_expression.encode('utf-8'))
+        return lambda record, payload: pattern.search(payload.data) is not None
+
+    def _compile_json_filter(self, expression):
+        if '=' not in expression:
+            raise ValueError(
+                'JSON filter must have the format "json:FIELD.PATH=VALUE"')
+        path, value = expression.split('=', 1)
+        path = path.split('.')
+        # only parse payloads that contain the value as is
+        if self.JSON_ESCAPED.search(value) is None:
+            needle = value.encode('utf-8')
+        else:
+            needle = None
+
+        def predicate(record, payload):
+            if needle is not None and needle not in payload.data:
+                return False
+            found, field = _extract(payload.json, path)
+            return found and _to_text(field) == value
+
+        return predicate
+
+    def _project(self, record, payload):
+        if payload.json is _LazyPayload.INVALID:
+            logger.debug('Dropping record %s. Payload is not JSON' %
+                         record.sequence_number)
+            return None
+        projected = {}
+        for name, path in self._projection:
+            found, field = _extract(payload.json, path)
+            if found:
+                projected[name] = field
+        return Record(
+            json.dumps(projected, sort_keys=True).encode('utf-8'),
+            record.sequence_number, record.partition_key,
+            record.arrival_timestamp)
+
+
+class _LazyPayload(object):
+    '''
+    Copies a payload out of the buffer of its batch and parses it on first
+    access, so payloads are only copied and parsed if an expression needs
+    them.
+    '''
+
+    INVALID = object()
+    UNSET = object()
+
+    __slots__ = ('_record', '_data', '_json')
+
+    def __init__(self, record):
+        self._record = record
+        self._data = self.UNSET
+        self._json = self.UNSET
+
+    @property
+    def data(self):
+        if self._data is self.UNSET:
+            self._data = self._record.payload
+        return self._data
+
+    @property
+    def json(self):
+        if self._json is self.UNSET:
+            try:
+                self._json = json.loads(self.data.decode('utf-8'))
+            except ValueError:
+                self._json = self.INVALID
+        return self._json
+
+
+def _extract(document, path):
+    for name in path:
+        if not isinstance(document, dict) or name not in document:
+            return False, None
+        document = document[name]
+    return True, document
+
+
+def _to_text(value):
+    if isinstance(value, (dict, list, bool, int, float)) or value is None:
+        return json.dumps(value)
+    return value
@@ -0,0 +1,90 @@
+import base64
+import json
+import struct
+
+
+class RecordFormatter(object):
+    '''
+    Turns a RecordBatch into the bytes written by the renderer. The
+    payloads of a batch are already base64 decoded, also those of records
+    of the AWS CLI, whose Data is base64 text.
+
+     * raw: the record payload followed by a newline
+     * jsonl: one JSON document per record including shard id, sequence
+       number, partition key, arrival timestamp in UTC and the base64
+       encoded payload (like the Data field of GetRecords in the AWS CLI)
+     * length-prefixed: a 4 byte big-endian payload length followed by
+       the payload. Safe for payloads that contain newlines.
+    '''
+
+    OUTPUT_FORMATS = ['raw', 'jsonl', 'length-prefixed']
+
+    # GetRecords and SubscribeToShard return at most 10 MB in 10000 records
+    MAX_BATCH_BYTES = 10 * 1024 * 1024
+    MAX_BATCH_RECORDS = 10000
+
+    # bytes a record adds to its payload at most. jsonl adds the metadata
+    # with a partition key of up to 256 characters, escaped as up to two
+    # \uXXXX each
+    RECORD_OVERHEAD = {'raw': 1, 'jsonl': 4096, 'length-prefixed': 4}
+
+    def __init__(self, output_format='raw'):
+        if output_format not in self.OUTPUT_FORMATS:
+            raise ValueError('Output format must be one of the following: {0}'.
+                             format(str(self.OUTPUT_FORMATS)))
+        self.output_format = output_format
+        self._format_batch = {
+            'raw': self._format_raw,
+            'jsonl': self._format_jsonl,
+            'length-prefixed': self._format_length_prefixed,
+        }[output_format]
+
+    @staticmethod
+    def max_batch_size(output_format):
+        '''
+        Upper bound of the formatted size of a batch of a single GetRecords
+        call or SubscribeToShard event. jsonl payloads grow by a third with
+        base64.
+        '''
+        payload_size = RecordFormatter.MAX_BATCH_BYTES
+        if output_format == 'jsonl':
+            payload_size = (payload_size + 2) // 3 * 4
+        return payload_size + RecordFormatter.MAX_BATCH_RECORDS * \
+            RecordFormatter.RECORD_OVERHEAD[output_format]
+
+    def format_batch(self, record_batch):
+        if record_batch.formatted is not None:
+            return record_batch.formatted
+        return self._format_batch(record_batch)
+
+    def _format_raw(self, record_batch):
+        # payloads are copied from the buffer of the batch only once
+        output = bytearray()
+        for index in range(len(record_batch)):
+            output += record_batch.data(index)
+            output += b'\n'
+        return bytes(output)
+
+    def _format_length_prefixed(self, record_batch):
+        output = bytearray()
+        for index in range(len(record_batch)):
+            output += struct.pack('>I', record_batch.payload_size(index))
+            output += record_batch.data(index)
+        return bytes(output)
+
+    def _format_jsonl(self, record_batch):
+        lines = []
+        for index in range(len(record_batch)):
+            arrival_timestamp = record_batch.arrival_timestamp(index)
+            if arrival_timestamp is not None:
+                arrival_timestamp = arrival_timestamp.isoformat()
+            lines.append(json.dumps({
+                'ShardId': record_batch.shard_id,
+                'SequenceNumber': record_batch.sequence_number(index),
+                'PartitionKey': record_batch.partition_key(index),
+                'ApproximateArrivalTimestamp': arrival_timestamp,
+                'Data': base64.b64encode(
+                    record_batch.payload(index)).decode('ascii'),
+            }, sort_keys=True))
+        lines.append('')
+        return '\n'.join(lines).encode('utf-8')
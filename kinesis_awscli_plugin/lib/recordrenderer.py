@@ -1,36 +1,90 @@
 import logging
-import base64
+import sys
+import time
 from six.moves import queue as Queue
-from sys import stdout
 
+from kinesis_awscli_plugin.lib.recordformatter import RecordFormatter
 from kinesis_awscli_plugin.lib.threads import BaseThread, ExitChecker
 
 logger = logging.getLogger(__name__)
 
 
 class RecordRenderer(BaseThread):
-    def __init__(self, stop_flag, queue, render_delay):
+    '''
+    Writes record batches to the binary standard output. Formatted batches
+    are buffered and written with a single write once no more batches are
+    queued, the buffer exceeds MAX_BUFFER_SIZE or the oldest buffered batch
+    is older than MAX_FLUSH_LATENCY seconds. Checkpoints are taken after
+    the data they cover has been written.
+    '''
+
+    MAX_BUFFER_SIZE = 1024 * 1024
+    MAX_FLUSH_LATENCY = 0.5
+
+    def __init__(self,
+                 stop_flag,
+                 queue,
+                 render_delay,
+                 checkpointer=None,
+                 output_format='raw',
+                 output=None):
         super(RecordRenderer, self).__init__(stop_flag)
         self.queue = queue
         self.render_delay = render_delay
+        self.checkpointer = checkpointer
+        self.formatter = RecordFormatter(output_format)
+        if output is None:
+            # sys.stdout only accepts text in Python 3
+            output = getattr(sys.stdout, 'buffer', sys.stdout)
+        self.output = output
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffered_since = None
+        self._checkpoints = {}
 
     def _run(self):
         while True:
             try:
                 record_batch = self.queue.get(False)
                 logger.debug(
-                    'Rendering record batch. %d batches are remaining.' %
+                    'Rendering record batch. Queue size is %d.' %
                     self.queue.qsize())
-                for record in record_batch.records:
-                    revised_record = record.copy()
-                    stdout.write(
-                        base64.b64decode(revised_record['Data']).decode('utf-8') + '\n')
-                    stdout.flush()
+                self.buffer(record_batch)
+                if self._buffer_size >= self.MAX_BUFFER_SIZE or \
+                        time.time() - self._buffered_since >= self.MAX_FLUSH_LATENCY:
+                    self.flush()
             except Queue.Empty:
+                self.flush()
                 if self.stop_flag.is_set():
                     logger.debug('Renderer is leaving...')
+                    if self.checkpointer is not None:
+                        self.checkpointer.flush()
                     break
                 else:
                     logger.debug('waiting for more data')
                     # wait expects time in seconds. Command-line passes it in milliseconds
                     self.stop_flag.wait(float(self.render_delay / 1000.0))
+
+    def buffer(self, record_batch):
+        if record_batch.last_sequence_number is None:
+            return
+        if self._buffered_since is None:
+            self._buffered_since = time.time()
+        data = self.formatter.format_batch(record_batch)
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        self._checkpoints[record_batch.shard_id] = \
+            record_batch.last_sequence_number
+
+    def flush(self):
+        if self._buffered_since is None:
+            return
+        self.output.write(b''.join(self._buffer))
+        self.output.flush()
+        if self.checkpointer is not None:
+            for shard_id, sequence_number in self._checkpoints.items():
+                self.checkpointer.checkpoint(shard_id, sequence_number)
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffered_since = None
+        self._checkpoints = {}
@@ -0,0 +1,141 @@
+import logging
+import random
+import time
+from six.moves import queue as Queue
+
+from botocore.exceptions import ClientError
+
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+
+class RecordsCopier(BaseThread):
+    '''
+    Writes queued record batches to a target stream with PutRecords. The
+    partition keys and payload bytes of the source records are kept. Each
+    batch is split into requests within the PutRecords limits, records
+    that failed are retried with exponential backoff and jitter, and the
+    source position of a batch is checkpointed once all its records were
+    written. Records that still fail after MAX_ATTEMPTS fail their batch:
+    the copier leaves without checkpointing it, so a restarted copy
+    resumes with it. Writes are throttled by optional token buckets for
+    records and bytes per second.
+
+    Retried records may be written after records that followed them, so
+    the order of records with the same partition key is only kept as long
+    as no record fails.
+    '''
+
+    MAX_RECORDS_PER_REQUEST = 500
+    MAX_BYTES_PER_REQUEST = 5 * 1024 * 1024
+    INITIAL_RETRY_DELAY = 0.1
+    MAX_RETRY_DELAY = 5
+    MAX_ATTEMPTS = 10
+
+    RETRYABLE_ERRORS = ('ProvisionedThroughputExceededException',
+                        'InternalFailure', 'ServiceUnavailable')
+
+    def __init__(self,
+                 stop_flag,
+                 queue,
+                 kinesis_helper,
+                 stream_name,
+                 copy_delay,
+                 checkpointer=None,
+                 records_limiter=None,
+                 bytes_limiter=None):
+        super(RecordsCopier, self).__init__(stop_flag)
+        self.queue = queue
+        self.kinesis_helper = kinesis_helper
+        self.stream_name = stream_name
+        self.copy_delay = copy_delay
+        self.checkpointer = checkpointer
+        self.records_limiter = records_limiter
+        self.bytes_limiter = bytes_limiter
+        self.records_copied = 0
+        self.records_retried = 0
+
+    def _run(self):
+        while True:
+            try:
+                record_batch = self.queue.get(False)
+            except Queue.Empty:
+                if self.stop_flag.is_set():
+                    logger.debug('Copier is leaving...')
+                    if self.checkpointer is not None:
+                        self.checkpointer.flush()
+                    break
+                self.stop_flag.wait(float(self.copy_delay / 1000.0))
+                continue
+            try:
+                self.copy_batch(record_batch)
+            except Exception:
+                # keeps the checkpoints of the batches that were copied
+                if self.checkpointer is not None:
+                    self.checkpointer.flush()
+                raise
+
+    def copy_batch(self, record_batch):
+        entries = []
+        request_size = 0
+        for index in range(len(record_batch)):
+            partition_key = record_batch.partition_key(index)
+            entry = {
+                'Data': record_batch.payload(index),
+                'PartitionKey': partition_key
+            }
+            entry_size = len(entry['Data']) + len(
+                partition_key.encode('utf-8'))
+            if len(entries) == self.MAX_RECORDS_PER_REQUEST or \
+                    request_size + entry_size > self.MAX_BYTES_PER_REQUEST:
+                self.put(entries, request_size)
+                entries = []
+                request_size = 0
+            entries.append(entry)
+            request_size += entry_size
+        if len(entries) > 0:
+            self.put(entries, request_size)
+        if self.checkpointer is not None and \
+                record_batch.last_sequence_number is not None:
+            self.checkpointer.checkpoint(record_batch.shard_id,
+                                         record_batch.last_sequence_number)
+
+    def put(self, entries, request_size):
+        if self.records_limiter is not None:
+            self.records_limiter.acquire(len(entries))
+        if self.bytes_limiter is not None:
+            self.bytes_limiter.acquire(request_size)
+        attempt = 0
+        while len(entries) > 0:
+            try:
+                response = self.kinesis_helper.put_records(
+                    self.stream_name, entries)
+                failed = [
+                    entry for entry, result in zip(entries, response[
+                        'Records']) if 'ErrorCode' in result
+                ]
+            except ClientError as e:
+                if e.response.get('Error', {}).get(
+                        'Code') not in self.RETRYABLE_ERRORS:
+                    raise
+                failed = entries
+            self.records_copied += len(entries) - len(failed)
+            if len(failed) == 0:
+                return
+            attempt += 1
+            if attempt == self.MAX_ATTEMPTS:
+                raise RuntimeError(
+                    '%d records could not be written to %s after %d '
+                    'attempts' % (len(failed), self.stream_name, attempt))
+            self.records_retried += len(failed)
+            logger.debug('Retrying %d records' % len(failed))
+            # records are still copied while the command is stopping
+            time.sleep(self.retry_delay(attempt))
+            entries = failed
+
+    def retry_delay(self, attempt):
+        delay = min(self.MAX_RETRY_DELAY,
+                    self.INITIAL_RETRY_DELAY * 2 ** (attempt - 1))
+        # full jitter keeps copiers from retrying in lockstep
+        return random.uniform(0, delay)
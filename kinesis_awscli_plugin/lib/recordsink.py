@@ -0,0 +1,180 @@
+import datetime
+import io
+import logging
+import os
+import time
+import zlib
+from six.moves import queue as Queue
+
+from kinesis_awscli_plugin.lib.recordformatter import RecordFormatter
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+
+class RecordSink(BaseThread):
+    '''
+    Archives record batches to compressed files, one file sequence per
+    shard in sink_dir/<shard id>/. A file is rotated once rotate_size bytes
+    were written to it or it is older than rotate_interval seconds. Files
+    are written under a .part name, synced to disk and renamed when they
+    are rotated. The checkpoint of a shard only advances after its file was
+    rotated, so checkpointed records are always durably archived.
+    '''
+
+    COMPRESSIONS = ['gzip', 'zstd', 'none']
+
+    def __init__(self,
+                 stop_flag,
+                 queue,
+                 render_delay,
+                 sink_dir,
+                 checkpointer=None,
+                 output_format='raw',
+                 compression='gzip',
+                 rotate_size=128 * 1024 * 1024,
+                 rotate_interval=300):
+        super(RecordSink, self).__init__(stop_flag)
+        self.queue = queue
+        self.render_delay = render_delay
+        self.sink_dir = sink_dir
+        self.checkpointer = checkpointer
+        self.output_format = output_format
+        self.formatter = RecordFormatter(output_format)
+        if compression not in self.COMPRESSIONS:
+            raise ValueError('Compression must be one of the following: {0}'.
+                             format(str(self.COMPRESSIONS)))
+        if compression == 'zstd' and not RecordSink.zstandard_available():
+            raise ValueError(
+                'zstd compression requires the Python module zstandard '
+                '(pip install zstandard)')
+        self.compression = compression
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.shard_files = {}
+
+    @staticmethod
+    def zstandard_available():
+        try:
+            import zstandard
+            return True
+        except (ImportError, NameError):
+            return False
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    record_batch = self.queue.get(False)
+                    logger.debug(
+                        'Archiving record batch. Queue size is %d.' %
+                        self.queue.qsize())
+                    self.write(record_batch)
+                    # a busy queue is never empty, files still have to
+                    # rotate on time
+                    self.rotate_expired()
+                except Queue.Empty:
+                    self.rotate_expired()
+                    if self.stop_flag.is_set():
+                        logger.debug('Sink is leaving...')
+                        break
+                    else:
+                        logger.debug('waiting for more data')
+                        # wait expects time in seconds. Command-line passes it in milliseconds
+                        self.stop_flag.wait(float(self.render_delay / 1000.0))
+        finally:
+            for shard_id in list(self.shard_files.keys()):
+                self.rotate(shard_id)
+
+    def write(self, record_batch):
+        if record_batch.last_sequence_number is None:
+            return
+        shard_file = self.shard_files.get(record_batch.shard_id)
+        if shard_file is None:
+            shard_file = ShardFile(
+                self.file_path(record_batch.shard_id,
+                               record_batch.last_sequence_number),
+                self.create_compressor())
+            self.shard_files[record_batch.shard_id] = shard_file
+        shard_file.write(self.formatter.format_batch(record_batch),
+                         record_batch.last_sequence_number)
+        if shard_file.size >= self.rotate_size:
+            self.rotate(record_batch.shard_id)
+
+    def rotate_expired(self):
+        for shard_id, shard_file in list(self.shard_files.items()):
+            if time.time() - shard_file.created >= self.rotate_interval:
+                self.rotate(shard_id)
+
+    def rotate(self, shard_id):
+        shard_file = self.shard_files.pop(shard_id)
+        shard_file.close()
+        logger.debug('Rotated %s' % shard_file.path)
+        if self.checkpointer is not None:
+            self.checkpointer.checkpoint(shard_id,
+                                         shard_file.last_sequence_number)
+            self.checkpointer.flush()
+
+    def file_path(self, shard_id, sequence_number):
+        directory = os.path.join(self.sink_dir, shard_id)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        extension = self.output_format
+        if self.compression == 'gzip':
+            extension += '.gz'
+        elif self.compression == 'zstd':
+            extension += '.zst'
+        return os.path.join(directory, '%s-%s-%s.%s' % (
+            shard_id,
+            datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ'),
+            sequence_number,
+            extension, ))
+
+    def create_compressor(self):
+        if self.compression == 'gzip':
+            # wbits of 16 + MAX_WBITS writes a gzip header and trailer
+            return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        if self.compression == 'zstd':
+            import zstandard
+            return zstandard.ZstdCompressor().compressobj()
+        return None
+
+
+class ShardFile(object):
+
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, path, compressor):
+        self.path = path
+        self.part_path = path + '.part'
+        self.compressor = compressor
+        self.file = io.open(self.part_path, 'wb', buffering=self.BUFFER_SIZE)
+        self.created = time.time()
+        self.size = 0
+        self.last_sequence_number = None
+
+    def write(self, data, last_sequence_number):
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self.file.write(data)
+        self.size += len(data)
+        self.last_sequence_number = last_sequence_number
+
+    def close(self):
+        if self.compressor is not None:
+            self.file.write(self.compressor.flush())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.rename(self.part_path, self.path)
+        self.sync_directory()
+
+    def sync_directory(self):
+        # makes the rename durable. Directories can't be opened on Windows
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(self.path), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -2,7 +2,9 @@ import logging
 import datetime
 
 from awscli.errorhandler import ServerError
+from botocore.exceptions import ClientError
 
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
 from kinesis_awscli_plugin.lib.retry import ExponentialBackoff
 from kinesis_awscli_plugin.lib.threads import BaseThread
 
@@ -10,6 +12,9 @@ logger = logging.getLogger(__name__)
 
 
 class RecordsPuller(BaseThread):
+
+    THROTTLE_DELAY = 1
+
     def __init__(
             self,
             stop_flag,
@@ -17,13 +22,43 @@ class RecordsPuller(BaseThread):
             kinesis_service,
             shard_iterator,
             pull_delay,
-            duration, ):
+            duration,
+            shard_id=None,
+            iterator_factory=None,
+            record_filter=None,
+            end_timestamp=None,
+            lag_tracker=None,
+            end_sequence_number=None,
+            read_limiter=None,
+            key_stats=None, ):
         super(RecordsPuller, self).__init__(stop_flag)
         self.queue = queue
         self.kinesis_service = kinesis_service
         self.next_shard_iterator = shard_iterator
         self.pull_delay = pull_delay
         self.duration = duration
+        self.shard_id = shard_id
+        # iterator_factory(sequence_number) returns a new shard iterator
+        # positioned after sequence_number. It is used to recover from
+        # expired shard iterators.
+        self.iterator_factory = iterator_factory
+        self.record_filter = record_filter
+        # records that arrived after end_timestamp (naive UTC) are not
+        # pulled. The puller finishes without stopping other threads.
+        self.end_timestamp = end_timestamp
+        self.lag_tracker = lag_tracker
+        # records from end_sequence_number on are not pulled
+        self.end_sequence_number = end_sequence_number
+        # shared by readers of the same shard to stay within its limits
+        self.read_limiter = read_limiter
+        self.key_stats = key_stats
+        self.last_sequence_number = None
+        self.finished = False
+        # set once the end timestamp or end sequence number was reached
+        self.end_reached = False
+        # set if the shard was closed before the end was reached, its child
+        # shards hold the following records
+        self.reached_shard_end = False
 
     @ExponentialBackoff(stderr=True, logger=logger, exception=(ServerError))
     def _run(self):
@@ -35,7 +70,7 @@ class RecordsPuller(BaseThread):
 
         logger.debug('pulling from stream ends at %s' % self.end_time)
 
-        while True:
+        while not self.finished:
             if datetime.datetime.now() > self.end_time:
                 self.stop_flag.set()
             if self.stop_flag.is_set():
@@ -49,20 +84,96 @@ class RecordsPuller(BaseThread):
                          (self.next_shard_iterator))
 
             params = dict(ShardIterator=self.next_shard_iterator)
-            gr_response = self.kinesis_service.get_records(**params)
+            if self.read_limiter is not None:
+                self.read_limiter.acquire_call(self.stop_flag)
+            try:
+                gr_response = self.kinesis_service.get_records(**params)
+            except ClientError as e:
+                if self.is_throttled(e):
+                    logger.debug('GetRecords throttled. Backing off')
+                    self.stop_flag.wait(self.THROTTLE_DELAY)
+                    continue
+                if self.iterator_factory is None or not self.is_expired_iterator(e):
+                    raise
+                logger.debug('Shard iterator expired. Resuming after %s' %
+                             self.last_sequence_number)
+                self.next_shard_iterator = self.iterator_factory(
+                    self.last_sequence_number)
+                continue
             if gr_response:
-                records = gr_response['Records']
-                if len(records) == 0:
-                    logger.debug('No records read')
-                else:
-                    logger.debug('Adding records to the queue')
-                    self.queue.put(RecordBatch(records))
-
-                self.next_shard_iterator = gr_response['NextShardIterator']
+                self.process_response(gr_response)
             else:
                 logger.debug('empty response')
 
+    def process_response(self, gr_response):
+        # read limits count the decoded payload bytes
+        record_batch = RecordBatch(gr_response['Records'], self.shard_id)
+        if self.read_limiter is not None:
+            self.read_limiter.acquire_bytes(record_batch.size, self.stop_flag)
+        if self.end_sequence_number is not None:
+            record_batch = self.records_until_end_sequence_number(
+                record_batch)
+        if self.end_timestamp is not None:
+            record_batch = self.records_until_end_timestamp(record_batch)
+            if len(record_batch) == 0 and \
+                    gr_response.get('MillisBehindLatest') == 0 and \
+                    datetime.datetime.utcnow() > self.end_timestamp:
+                logger.debug('Shard %s caught up after end timestamp' %
+                             self.shard_id)
+                self.end_reached = True
+                self.finished = True
+        if self.lag_tracker is not None:
+            self.lag_tracker.record(self.shard_id,
+                                    gr_response.get('MillisBehindLatest'),
+                                    len(record_batch), record_batch.size)
+        if len(record_batch) == 0:
+            logger.debug('No records read')
+        else:
+            last_sequence_number = record_batch.last_sequence_number
+            if self.key_stats is not None:
+                self.key_stats.record(record_batch)
+            if self.record_filter is not None:
+                record_batch = self.record_filter.filter_batch(record_batch)
+            # without a queue records are only counted
+            if self.queue is not None:
+                logger.debug('Adding records to the queue')
+                self.queue.put(record_batch)
+            self.last_sequence_number = last_sequence_number
+
+        self.next_shard_iterator = gr_response.get('NextShardIterator')
+        if self.next_shard_iterator is None:
+            logger.debug('Shard %s is closed' % self.shard_id)
+            self.reached_shard_end = not self.end_reached
+            self.finished = True
+
+    def records_until_end_timestamp(self, record_batch):
+        for index in range(len(record_batch)):
+            arrival_timestamp = record_batch.arrival_timestamp(index)
+            if arrival_timestamp is not None and \
+                    arrival_timestamp > self.end_timestamp:
+                logger.debug('Shard %s reached end timestamp' % self.shard_id)
+                self.end_reached = True
+                self.finished = True
+                return record_batch.head(index)
+        return record_batch
+
+    def records_until_end_sequence_number(self, record_batch):
+        end_sequence_number = int(self.end_sequence_number)
+        for index in range(len(record_batch)):
+            if int(record_batch.sequence_number(index)) >= \
+                    end_sequence_number:
+                logger.debug('Shard %s reached end sequence number' %
+                             self.shard_id)
+                self.end_reached = True
+                self.finished = True
+                return record_batch.head(index)
+        return record_batch
+
+    def is_throttled(self, error):
+        return error.response.get('Error', {}).get(
+            'Code') == 'ProvisionedThroughputExceededException'
+
+    def is_expired_iterator(self, error):
+        return error.response.get('Error', {}).get(
+            'Code') == 'ExpiredIteratorException'
 
-class RecordBatch:
-    def __init__(self, records):
-        self.records = records
@@ -0,0 +1,207 @@
+import logging
+import tempfile
+from threading import Condition
+from six.moves import cPickle as pickle
+
+from kinesis_awscli_plugin.lib.ratelimiter import ShardReadLimiter
+from kinesis_awscli_plugin.lib.recordspuller import RecordsPuller
+from kinesis_awscli_plugin.lib.threads import BaseThread
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentedShardReader(BaseThread):
+    '''
+    Reads the time range of a single shard with several concurrent
+    iterator chains. The range is split into equally long segments. Every
+    segment starts at an AT_TIMESTAMP iterator and stops at the sequence
+    number of the first record of the next segment. Segments are spooled
+    to temporary files and forwarded to the queue in sequence order, the
+    first unfinished segment while it is being read. All segments share a
+    ShardReadLimiter to stay within the read limits of the shard.
+
+    start_time and end_time may be offset-aware, they are compared with
+    the arrival timestamps of the records in naive UTC.
+    '''
+
+    BOUNDARY_LOOKUP_CALLS = 10
+
+    def __init__(self,
+                 stop_flag,
+                 queue,
+                 kinesis_helper,
+                 stream_name,
+                 shard_id,
+                 start_time,
+                 end_time,
+                 segments,
+                 spool_dir=None):
+        super(SegmentedShardReader, self).__init__(stop_flag)
+        self.queue = queue
+        self.kinesis_helper = kinesis_helper
+        self.stream_name = stream_name
+        self.shard_id = shard_id
+        self.start_time = TimeUtils.to_naive_utc(start_time)
+        self.end_time = TimeUtils.to_naive_utc(end_time)
+        self.segments = segments
+        self.spool_dir = spool_dir
+        self.read_limiter = ShardReadLimiter()
+        # set like RecordsPuller.reached_shard_end by the last segment
+        self.reached_shard_end = False
+
+    def _run(self):
+        start_times = self.segment_start_times()
+        # the first segment starts at the start time, the others at their
+        # first record
+        boundaries = [None] + [
+            self.first_sequence_number_at(start_time)
+            for start_time in start_times[1:]
+        ]
+        pullers = []
+        spools = []
+        try:
+            for index, start_time in enumerate(start_times):
+                end_sequence_number = self.next_boundary(boundaries, index)
+                spool = SegmentSpool(self.spool_dir)
+                spools.append(spool)
+                if index > 0 and (boundaries[index] is None or
+                                  boundaries[index] == end_sequence_number):
+                    logger.debug('Segment %d of shard %s is empty' %
+                                 (index, self.shard_id))
+                    spool.close()
+                    continue
+                puller = SegmentPuller(
+                    spool,
+                    self.stop_flag,
+                    spool,
+                    self.kinesis_helper.client,
+                    self.kinesis_helper.get_shard_iterator(
+                        self.stream_name,
+                        self.shard_id,
+                        'AT_TIMESTAMP',
+                        timestamp=start_time),
+                    0,
+                    -1,
+                    shard_id=self.shard_id,
+                    end_timestamp=self.end_time,
+                    end_sequence_number=end_sequence_number,
+                    read_limiter=self.read_limiter, )
+                puller.start()
+                pullers.append(puller)
+
+            for index, spool in enumerate(spools):
+                logger.debug('Forwarding segment %d of shard %s' %
+                             (index, self.shard_id))
+                for record_batch in spool.replay(self.stop_flag):
+                    self.queue.put(record_batch)
+        except Exception:
+            # stop the segment pullers
+            self.stop_flag.set()
+            raise
+        finally:
+            for puller in pullers:
+                puller.join()
+            if len(pullers) > 0:
+                self.reached_shard_end = pullers[-1].reached_shard_end
+            for spool in spools:
+                spool.close()
+
+    def segment_start_times(self):
+        segment_length = (self.end_time - self.start_time) / self.segments
+        return [
+            self.start_time + segment_length * index
+            for index in range(self.segments)
+        ]
+
+    def next_boundary(self, boundaries, index):
+        for boundary in boundaries[index + 1:]:
+            if boundary is not None:
+                return boundary
+        return None
+
+    def first_sequence_number_at(self, timestamp):
+        '''
+        Returns the sequence number of the first record that arrived at or
+        after timestamp and not after the end time. None if there is no
+        such record.
+        '''
+        shard_iterator = self.kinesis_helper.get_shard_iterator(
+            self.stream_name, self.shard_id, 'AT_TIMESTAMP', timestamp=timestamp)
+        for call in range(self.BOUNDARY_LOOKUP_CALLS):
+            self.read_limiter.acquire_call(self.stop_flag)
+            gr_response = self.kinesis_helper.client.get_records(
+                ShardIterator=shard_iterator, Limit=1)
+            records = gr_response['Records']
+            if len(records) > 0:
+                # epoch seconds in responses of the AWS CLI
+                arrival_timestamp = TimeUtils.parse_timestamp(
+                    records[0]['ApproximateArrivalTimestamp'])
+                if arrival_timestamp > self.end_time:
+                    return None
+                return records[0]['SequenceNumber']
+            shard_iterator = gr_response.get('NextShardIterator')
+            if shard_iterator is None or gr_response.get(
+                    'MillisBehindLatest') == 0:
+                return None
+        # the segment start is in a long gap, the previous segment reads it
+        return None
+
+
+class SegmentPuller(RecordsPuller):
+    '''
+    RecordsPuller that marks its spool finished when it leaves.
+    '''
+
+    def __init__(self, spool, *args, **kwargs):
+        super(SegmentPuller, self).__init__(*args, **kwargs)
+        self.spool = spool
+
+    def run(self):
+        try:
+            super(SegmentPuller, self).run()
+        finally:
+            self.spool.finish()
+
+
+class SegmentSpool(object):
+    '''
+    Append-only temporary file of pickled record batches. replay() yields
+    the batches while they are being appended until the spool is finished.
+    '''
+
+    def __init__(self, spool_dir=None):
+        self._file = tempfile.TemporaryFile(dir=spool_dir)
+        self._condition = Condition()
+        self._write_position = 0
+        self._finished = False
+
+    def put(self, record_batch):
+        with self._condition:
+            self._file.seek(self._write_position)
+            pickle.dump(record_batch, self._file, pickle.HIGHEST_PROTOCOL)
+            self._write_position = self._file.tell()
+            self._condition.notify_all()
+
+    def finish(self):
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    def replay(self, stop_flag):
+        read_position = 0
+        while not stop_flag.is_set():
+            with self._condition:
+                if read_position == self._write_position:
+                    if self._finished:
+                        return
+                    self._condition.wait(1)
+                    continue
+                self._file.seek(read_position)
+                record_batch = pickle.load(self._file)
+                read_position = self._file.tell()
+            yield record_batch
+
+    def close(self):
+        self.finish()
+        self._file.close()
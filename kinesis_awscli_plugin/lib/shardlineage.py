@@ -0,0 +1,50 @@
+class ShardLineage(object):
+    '''
+    Parent and child relations of the shards of a stream, built from the
+    shard descriptions of DescribeStream. The records of a child shard
+    follow the records of its parents, so a child is only read once all of
+    its parents were read to their end. Parents that are not described any
+    more were trimmed, shards without described parents are roots.
+    '''
+
+    def __init__(self, shard_descriptions):
+        self.shard_ids = [shard['ShardId'] for shard in shard_descriptions]
+        described = set(self.shard_ids)
+        self.parents = {}
+        self.children = dict((shard_id, []) for shard_id in self.shard_ids)
+        for shard in shard_descriptions:
+            parents = [
+                parent
+                for parent in (shard.get('ParentShardId'),
+                               shard.get('AdjacentParentShardId'))
+                if parent in described
+            ]
+            self.parents[shard['ShardId']] = parents
+            for parent in parents:
+                self.children[parent].append(shard['ShardId'])
+
+    def roots(self):
+        return [
+            shard_id for shard_id in self.shard_ids
+            if len(self.parents[shard_id]) == 0
+        ]
+
+    def ready_children(self, shard_id, ended_shard_ids):
+        '''
+        Children of shard_id whose parents are all in ended_shard_ids.
+        '''
+        return [
+            child for child in self.children.get(shard_id, [])
+            if all(parent in ended_shard_ids
+                   for parent in self.parents[child])
+        ]
+
+    def ready_shards(self, ended_shard_ids):
+        '''
+        Shards that did not end yet and whose parents all ended.
+        '''
+        return [
+            shard_id for shard_id in self.shard_ids
+            if shard_id not in ended_shard_ids and
+            all(parent in ended_shard_ids for parent in self.parents[shard_id])
+        ]
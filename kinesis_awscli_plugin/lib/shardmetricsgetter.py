@@ -1,4 +1,6 @@
+from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
 from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+from kinesis_awscli_plugin.lib.metricsmatrix import MetricsMatrix
 
 
 class ShardMetricsGetter(object):
@@ -22,37 +24,84 @@ class ShardMetricsGetter(object):
         self.period = period
         self.namespace = 'AWS/Kinesis'
 
-    def get(self):
+    def get(self, sort_by='Average'):
+        return self.sort(self.get_matrix(), sort_by)
+
+    def get_matrix(self):
+        '''
+        A MetricsMatrix with a row per shard in the order of the shards.
+        '''
+        shard_ids = self.get_shard_ids_for_stream()
+        return MetricsMatrix(self.get_shard_metrics(shard_ids),
+                             self.statistic)
+
+    def get_matrices(self, batch_size=CloudWatchHelper.MAX_QUERIES_PER_REQUEST):
+        '''
+        Yields a MetricsMatrix per batch of shards, so only the datapoints
+        of one batch are held in memory.
+        '''
         shard_ids = self.get_shard_ids_for_stream()
-        shard_metrics_array = self.get_shard_metrics(shard_ids)
-        return self.sort(shard_metrics_array)
+        for first in range(0, len(shard_ids), batch_size):
+            yield MetricsMatrix(
+                self.get_shard_metrics(shard_ids[first:first + batch_size]),
+                self.statistic)
 
     def get_shard_datapoints(self, shard_id):
-        return self.cloudwatch_helper.get_metric_datapoints(
-            Namespace=self.namespace,
-            MetricName=self.metric_name,
-            StartTime=self.start_time,
-            EndTime=self.end_time,
-            Statistics=[self.statistic],
-            Period=self.period,
-            Dimensions=self.cloudwatch_helper.get_shard_dimensions(
-                self.stream_name,
-                shard_id, ))
+        return self.cloudwatch_helper.get_metric_data(
+            [self.get_shard_query(shard_id)], self.start_time,
+            self.end_time)[0]
+
+    def get_shard_query(self, shard_id, metric_name=None):
+        return {
+            'Namespace': self.namespace,
+            'MetricName': metric_name or self.metric_name,
+            'Statistic': self.statistic,
+            'Period': self.period,
+            'Dimensions': self.cloudwatch_helper.get_shard_dimensions(
+                self.stream_name, shard_id),
+        }
 
     def get_shard_ids_for_stream(self):
         return self.kinesis_helper.stream_shards(self.stream_name)
 
-    def get_shard_metrics(self, shard_ids):
+    def get_shard_metrics(self, shard_ids, start_time=None, end_time=None):
+        # one GetMetricData request covers up to 500 shards
+        datapoints = self.cloudwatch_helper.get_metric_data(
+            [self.get_shard_query(shard_id) for shard_id in shard_ids],
+            start_time or self.start_time, end_time or self.end_time)
         shard_metrics_array = []
-        for shard_id in shard_ids:
+        for shard_id, shard_datapoints in zip(shard_ids, datapoints):
             shard_metrics_array.append(
-                KinesisMetrics(shard_id,
-                               self.get_shard_datapoints(shard_id),
-                               self.statistic))
+                KinesisMetrics(shard_id, shard_datapoints, self.statistic))
         return shard_metrics_array
 
-    def sort(self, shard_metrics_array):
-        return sorted(
-            shard_metrics_array,
-            key=lambda _shard_metrics_array: _shard_metrics_array.datapoint_average,
-            reverse=True)
+    def get_shard_metrics_by_name(self,
+                                  shard_ids,
+                                  metric_names,
+                                  start_time=None,
+                                  end_time=None):
+        '''
+        Fetches several metrics of the shards with batched requests and
+        returns a dict of metric name to KinesisMetrics per shard.
+        '''
+        queries = [
+            self.get_shard_query(shard_id, metric_name)
+            for metric_name in metric_names for shard_id in shard_ids
+        ]
+        datapoints = self.cloudwatch_helper.get_metric_data(
+            queries, start_time or self.start_time, end_time or
+            self.end_time)
+        metrics_by_name = {}
+        for index, metric_name in enumerate(metric_names):
+            offset = index * len(shard_ids)
+            metrics_by_name[metric_name] = [
+                KinesisMetrics(shard_id, datapoints[offset + shard_index],
+                               self.statistic)
+                for shard_index, shard_id in enumerate(shard_ids)
+            ]
+        return metrics_by_name
+
+    def sort(self, matrix, sort_by='Average'):
+        return [
+            matrix.metrics_array[index] for index in matrix.order(sort_by)
+        ]
@@ -0,0 +1,71 @@
+import csv
+import json
+
+from kinesis_awscli_plugin.lib.metricsmatrix import MetricsMatrix
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+
+class ShardRowWriter(object):
+    '''
+    Writes a summary row per shard as soon as the statistics of its batch
+    of shards are computed, instead of building the whole output first.
+
+     * jsonl: one JSON document per shard, with the raw datapoints unless
+       include_datapoints is False
+     * csv: a header line and one line per shard with the statistics only
+    '''
+
+    OUTPUT_FORMATS = ['jsonl', 'csv']
+
+    def __init__(self,
+                 output,
+                 output_format='jsonl',
+                 statistic='Average',
+                 include_datapoints=True):
+        if output_format not in self.OUTPUT_FORMATS:
+            raise ValueError('Output format must be one of the following: {0}'.
+                             format(str(self.OUTPUT_FORMATS)))
+        self.output = output
+        self.output_format = output_format
+        self.statistic = statistic
+        self.include_datapoints = include_datapoints and \
+            output_format == 'jsonl'
+        self.fields = ['ShardId'] + [
+            'Datapoint' + name for name in MetricsMatrix.STATISTICS
+        ] + ['DatapointCount']
+        self._csv_writer = None
+        if output_format == 'csv':
+            self._csv_writer = csv.DictWriter(
+                output, self.fields, lineterminator='\n')
+            self._csv_writer.writeheader()
+
+    def write_matrix(self, matrix):
+        '''
+        Writes the rows of all shards of the matrix in their order and
+        returns the number of rows.
+        '''
+        stats = matrix.stats()
+        for index in range(len(matrix)):
+            self.write_row(self.row(matrix, stats, index))
+        self.output.flush()
+        return len(matrix)
+
+    def row(self, matrix, stats, index):
+        row = {'ShardId': matrix.metric_ids[index]}
+        for name in MetricsMatrix.STATISTICS:
+            row['Datapoint' + name] = round(stats[name][index], 2)
+        row['DatapointCount'] = stats['Count'][index]
+        if self.include_datapoints:
+            row['Datapoints'] = [{
+                'Timestamp': TimeUtils.iso8601(
+                    TimeUtils.to_naive_utc(datapoint['Timestamp'])),
+                self.statistic: datapoint[self.statistic],
+                'Unit': datapoint.get('Unit'),
+            } for datapoint in matrix.metrics_array[index].datapoints]
+        return row
+
+    def write_row(self, row):
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(row)
+        else:
+            self.output.write(json.dumps(row, sort_keys=True) + '\n')
@@ -0,0 +1,160 @@
+import logging
+import datetime
+import time
+
+from botocore.exceptions import ClientError
+
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from kinesis_awscli_plugin.lib.threads import BaseThread
+
+logger = logging.getLogger(__name__)
+
+
+class ShardSubscriber(BaseThread):
+    '''
+    Reads a shard through an enhanced fan-out consumer. SubscribeToShard
+    pushes records over an event stream for up to five minutes, so the
+    subscription is renewed after SUBSCRIPTION_DURATION seconds, continuing
+    after the last sequence number of the previous subscription.
+
+    Errors of the service arrive as exception events while the event
+    stream is read and are raised by botocore as ClientError. Transient
+    ones end the subscription and the shard is subscribed to again.
+    '''
+
+    SUBSCRIPTION_DURATION = 300
+    RESUBSCRIBE_DELAY = 1
+
+    # errors after which the shard is subscribed to again
+    RESUBSCRIBE_ERRORS = ('ResourceInUseException', 'InternalFailureException',
+                          'KMSThrottlingException')
+
+    def __init__(
+            self,
+            stop_flag,
+            queue,
+            kinesis_service,
+            consumer_arn,
+            shard_id,
+            starting_position,
+            duration,
+            record_filter=None,
+            lag_tracker=None,
+            key_stats=None, ):
+        super(ShardSubscriber, self).__init__(stop_flag)
+        self.queue = queue
+        self.kinesis_service = kinesis_service
+        self.consumer_arn = consumer_arn
+        self.shard_id = shard_id
+        self.starting_position = starting_position
+        self.duration = duration
+        self.record_filter = record_filter
+        self.lag_tracker = lag_tracker
+        self.key_stats = key_stats
+        self.continuation_sequence_number = None
+        # the checkpoint of the last queued batch
+        self.last_sequence_number = None
+        self.subscription_count = 0
+        # set once the shard is closed and all its records were read
+        self.finished = False
+
+    def _run(self):
+        if self.duration == -1:
+            self.end_time = datetime.datetime(datetime.MAXYEAR, 1, 1)
+        else:
+            self.end_time = datetime.datetime.now() + datetime.timedelta(
+                seconds=self.duration)
+
+        logger.debug('subscription to shard %s ends at %s' %
+                     (self.shard_id, self.end_time))
+
+        while not self.finished:
+            if datetime.datetime.now() > self.end_time:
+                self.stop_flag.set()
+            if self.stop_flag.is_set():
+                logger.debug('Subscriber is leaving...')
+                break
+            event_stream = self.subscribe()
+            if event_stream is None:
+                continue
+            try:
+                self.finished = not self.read_events(event_stream)
+            except ClientError as e:
+                if not self.is_resubscribe_error(e):
+                    raise
+                logger.debug('Subscription to shard %s failed with %s. '
+                             'Subscribing again' % (self.shard_id, e))
+                self.stop_flag.wait(self.RESUBSCRIBE_DELAY)
+            finally:
+                self.close(event_stream)
+
+    def subscribe(self):
+        starting_position = self.next_starting_position()
+        logger.debug('Subscribing to shard %s at %s' %
+                     (self.shard_id, starting_position))
+        try:
+            response = self.kinesis_service.subscribe_to_shard(
+                ConsumerARN=self.consumer_arn,
+                ShardId=self.shard_id,
+                StartingPosition=starting_position)
+        except ClientError as e:
+            # the previous subscription of this consumer may still be
+            # shutting down on the service side
+            if not self.is_resubscribe_error(e):
+                raise
+            self.stop_flag.wait(self.RESUBSCRIBE_DELAY)
+            return None
+        self.subscription_count += 1
+        return response['EventStream']
+
+    def read_events(self, event_stream):
+        '''
+        Forwards events to the queue until the subscription is due for
+        renewal. Returns False once the shard is closed.
+        '''
+        renew_at = time.time() + self.SUBSCRIPTION_DURATION
+        for event in event_stream:
+            shard_event = event.get('SubscribeToShardEvent')
+            if shard_event is not None:
+                record_batch = RecordBatch(shard_event['Records'],
+                                           self.shard_id)
+                if self.lag_tracker is not None:
+                    self.lag_tracker.record(
+                        self.shard_id,
+                        shard_event.get('MillisBehindLatest'),
+                        len(record_batch), record_batch.size)
+                if len(record_batch) > 0:
+                    logger.debug('Adding records to the queue')
+                    if self.key_stats is not None:
+                        self.key_stats.record(record_batch)
+                    if self.record_filter is not None:
+                        record_batch = self.record_filter.filter_batch(
+                            record_batch)
+                    self.queue.put(record_batch)
+                    self.last_sequence_number = \
+                        record_batch.last_sequence_number
+                self.continuation_sequence_number = shard_event.get(
+                    'ContinuationSequenceNumber')
+                if self.continuation_sequence_number is None:
+                    logger.debug('Shard %s is closed' % self.shard_id)
+                    return False
+            if self.stop_flag.is_set() or time.time() >= renew_at or \
+                    datetime.datetime.now() > self.end_time:
+                break
+        return True
+
+    def is_resubscribe_error(self, error):
+        return error.response.get('Error', {}).get(
+            'Code') in self.RESUBSCRIBE_ERRORS
+
+    def next_starting_position(self):
+        if self.continuation_sequence_number is None:
+            return self.starting_position
+        return {
+            'Type': 'AFTER_SEQUENCE_NUMBER',
+            'SequenceNumber': self.continuation_sequence_number
+        }
+
+    def close(self, event_stream):
+        if hasattr(event_stream, 'close'):
+            event_stream.close()
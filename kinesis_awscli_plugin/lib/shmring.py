@@ -0,0 +1,250 @@
+import collections
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def shm_path(name):
+    '''
+    Path of the ring buffer file of name. Names without a slash are placed
+    in /dev/shm, so the buffer never touches a disk, or in the temporary
+    directory if there is no /dev/shm.
+    '''
+    if os.sep in name:
+        return name
+    directory = '/dev/shm'
+    if not os.path.isdir(directory):
+        directory = tempfile.gettempdir()
+    return os.path.join(directory, 'kinesis-cli-' + name)
+
+
+class ShmRing(object):
+    '''
+    Layout of a memory-mapped ring buffer with a single writer and any
+    number of readers. Positions are absolute byte counts since the
+    buffer was created; the offset in the data area is position modulo
+    capacity. Every message is a 4 byte big-endian length followed by the
+    payload. A message never wraps around, the rest of the data area is
+    skipped instead and marked with WRAP if there is room for a length.
+
+    The header holds:
+     * write_position: end of the last complete message
+     * reserve_position: end of the message being written. Data before
+       reserve_position - capacity may be overwritten at any time
+     * oldest_position: start of the oldest message that is still intact
+    '''
+
+    MAGIC = b'KSHM'
+    VERSION = 1
+    HEADER = struct.Struct('>4sIQQQQ')
+    HEADER_SIZE = 64
+    LENGTH = struct.Struct('>I')
+    WRAP = 0xffffffff
+
+    # offsets of the header fields
+    WRITE_POSITION = 16
+    RESERVE_POSITION = 24
+    OLDEST_POSITION = 32
+
+    def _position(self, field):
+        return struct.unpack_from('>Q', self._map, field)[0]
+
+
+class ShmRingWriter(ShmRing):
+    '''
+    Writes messages to a new ring buffer file. The writer never waits for
+    readers. Readers that fall behind by more than the capacity lose the
+    overwritten messages. Can be used as output of a RecordRenderer.
+    '''
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        # readers of a previous buffer keep their mapping of the old file
+        # and reopen once they notice the new one
+        if os.path.exists(path):
+            os.remove(path)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(
+            os.path.abspath(path)), prefix='.kinesis-cli-shm')
+        self._file = os.fdopen(fd, 'r+b')
+        self._file.truncate(self.HEADER_SIZE + capacity)
+        self._map = mmap.mmap(self._file.fileno(),
+                              self.HEADER_SIZE + capacity)
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self.VERSION,
+                              capacity, 0, 0, 0)
+        os.rename(temp_path, path)
+        self._write_position = 0
+        # starts of the messages that are still intact
+        self._message_starts = collections.deque()
+
+    def write(self, payload):
+        if len(payload) == 0:
+            return
+        size = self.LENGTH.size + len(payload)
+        if size > self.capacity // 2:
+            raise ValueError('Message of %d bytes does not fit into a ring '
+                             'buffer of %d bytes' % (size, self.capacity))
+        position = self._write_position
+        offset = position % self.capacity
+        wrap = self.capacity - offset < size
+        if wrap:
+            # skip to the start of the data area
+            position += self.capacity - offset
+        end = position + size
+        self._reserve(position, end)
+        if wrap:
+            if self.capacity - offset >= self.LENGTH.size:
+                self.LENGTH.pack_into(self._map, self.HEADER_SIZE + offset,
+                                      self.WRAP)
+            offset = 0
+        start = self.HEADER_SIZE + offset
+        self.LENGTH.pack_into(self._map, start, len(payload))
+        self._map[start + self.LENGTH.size:start + size] = payload
+        self._write_position = end
+        struct.pack_into('>Q', self._map, self.WRITE_POSITION, end)
+
+    def _reserve(self, position, end):
+        # invalidate the messages that are about to be overwritten before
+        # touching them
+        struct.pack_into('>Q', self._map, self.RESERVE_POSITION, end)
+        self._message_starts.append(position)
+        while self._message_starts[0] < end - self.capacity:
+            self._message_starts.popleft()
+        struct.pack_into('>Q', self._map, self.OLDEST_POSITION,
+                         self._message_starts[0])
+
+    def flush(self):
+        # readers see writes to the mapping right away
+        pass
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class ShmRingReader(ShmRing):
+    '''
+    Reads messages from a ring buffer with a cursor of its own. On Python
+    3 read() returns a zero-copy memoryview of the mapping that is only
+    valid until the writer wraps around to it. Call valid() after
+    processing a message to detect that it was overwritten meanwhile.
+    Python 2 cannot map memoryviews, messages are copied there.
+    '''
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, path, start='latest'):
+        self.path = path
+        self.start = start
+        self.lost_bytes = 0
+        self._map = None
+        self._view = None
+        self._open()
+
+    def _open(self):
+        self._close_map()
+        with open(self.path, 'rb') as ring_file:
+            self._inode = os.fstat(ring_file.fileno()).st_ino
+            self._map = mmap.mmap(ring_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        magic, version, self.capacity = self.HEADER.unpack_from(
+            self._map, 0)[:3]
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('%s is not a ring buffer' % self.path)
+        try:
+            self._view = memoryview(self._map)
+        except TypeError:
+            self._view = None
+        if self.start == 'oldest':
+            self._cursor = self._position(self.OLDEST_POSITION)
+        else:
+            self._cursor = self._position(self.WRITE_POSITION)
+        self._message = None
+
+    def read(self, timeout=None, stop_flag=None):
+        '''
+        Returns the next message or None if there was none within timeout
+        seconds or the stop flag was set.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            # the cursor is ahead of the write position while it points to
+            # the oldest message that is still being written
+            if self._cursor >= self._position(self.WRITE_POSITION):
+                if self._reopen_if_replaced():
+                    continue
+                if stop_flag is not None and stop_flag.is_set():
+                    return None
+                if deadline is not None and time.time() >= deadline:
+                    return None
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            if self._lapped(self._cursor):
+                oldest = self._position(self.OLDEST_POSITION)
+                logger.debug('Reader lost %d bytes' % (oldest - self._cursor))
+                self.lost_bytes += oldest - self._cursor
+                self._cursor = oldest
+                continue
+            offset = self._cursor % self.capacity
+            if self.capacity - offset < self.LENGTH.size:
+                self._cursor += self.capacity - offset
+                continue
+            start = self.HEADER_SIZE + offset
+            length = self.LENGTH.unpack_from(self._map, start)[0]
+            if length == self.WRAP:
+                self._cursor += self.capacity - offset
+                continue
+            start += self.LENGTH.size
+            if self._view is not None:
+                message = self._view[start:start + length]
+            else:
+                message = self._map[start:start + length]
+            if self._lapped(self._cursor):
+                # the length may have been overwritten while reading it
+                continue
+            self._message = self._cursor
+            self._cursor += self.LENGTH.size + length
+            return message
+
+    def valid(self):
+        '''
+        True if the last returned message was not overwritten yet.
+        '''
+        return self._message is not None and not self._lapped(self._message)
+
+    def _lapped(self, position):
+        return position < \
+            self._position(self.RESERVE_POSITION) - self.capacity
+
+    def _reopen_if_replaced(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return False
+        if inode == self._inode:
+            return False
+        logger.debug('Ring buffer %s was replaced' % self.path)
+        self.start = 'oldest'
+        self._open()
+        return True
+
+    def close(self):
+        self._close_map()
+
+    def _close_map(self):
+        if self._map is None:
+            return
+        if self._view is not None:
+            self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # messages returned by read() still refer to the mapping, it
+            # is unmapped once they are garbage collected
+            pass
+        self._map = None
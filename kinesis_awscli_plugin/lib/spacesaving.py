@@ -0,0 +1,61 @@
+import heapq
+
+
+class SpaceSaving(object):
+    '''
+    Space-Saving summary of the heaviest keys of a stream in at most
+    capacity entries. A new key replaces the entry with the smallest count
+    and inherits that count as error, so every key with a count larger
+    than total / capacity is guaranteed to be in the summary. Counts may
+    be weights, for example payload bytes.
+
+    Every entry can carry a label, e.g. the shard a partition key was read
+    from.
+    '''
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.total = 0
+        # key -> [count, error, label]
+        self._entries = {}
+        # (count, key) with stale entries that are skipped lazily
+        self._heap = []
+
+    def add(self, key, count=1, label=None):
+        self.total += count
+        entry = self._entries.get(key)
+        if entry is None:
+            error = 0
+            if len(self._entries) >= self.capacity:
+                error = self._evict_minimum()
+            entry = self._entries[key] = [error, error, label]
+        entry[0] += count
+        entry[2] = label
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(entry[0], key)
+                          for key, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _evict_minimum(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == count:
+                del self._entries[key]
+                return count
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def label(self, key):
+        entry = self._entries.get(key)
+        return entry[2] if entry is not None else None
+
+    def top(self, count):
+        '''
+        Returns (key, count, error, label) of the heaviest keys.
+        '''
+        entries = sorted(self._entries.items(), key=lambda item: -item[1][0])
+        return [(key, entry[0], entry[1], entry[2])
+                for key, entry in entries[:count]]
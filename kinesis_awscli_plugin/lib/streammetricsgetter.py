@@ -18,23 +18,31 @@ class StreamMetricsGetter(object):
         self.period = period
         self.namespace = 'AWS/Kinesis'
 
-    def get(self, metric_list):
+    def get(self, metric_list, start_time=None, end_time=None):
+        # all metrics are fetched with a single GetMetricData request
+        datapoints = self.cloudwatch_helper.get_metric_data(
+            [self.get_metric_query(metric_name) for metric_name in metric_list],
+            start_time or self.start_time, end_time or self.end_time)
         metrics_array = []
-        for metric_name in metric_list:
+        for metric_name, metric_datapoints in zip(metric_list, datapoints):
             metrics_array.append(
                 KinesisMetrics(
                     metric_name,
-                    self.get_metric_datapoints(metric_name),
+                    metric_datapoints,
                     self.statistic, ))
         return metrics_array
 
     def get_metric_datapoints(self, metric_name):
-        return self.cloudwatch_helper.get_metric_datapoints(
-            Namespace=self.namespace,
-            MetricName=metric_name,
-            StartTime=self.start_time,
-            EndTime=self.end_time,
-            Statistics=[self.statistic],
-            Period=self.period,
-            Dimensions=self.cloudwatch_helper.get_stream_dimensions(
-                self.stream_name))
+        return self.cloudwatch_helper.get_metric_data(
+            [self.get_metric_query(metric_name)], self.start_time,
+            self.end_time)[0]
+
+    def get_metric_query(self, metric_name):
+        return {
+            'Namespace': self.namespace,
+            'MetricName': metric_name,
+            'Statistic': self.statistic,
+            'Period': self.period,
+            'Dimensions': self.cloudwatch_helper.get_stream_dimensions(
+                self.stream_name),
+        }
@@ -1,7 +1,12 @@
 import datetime
+import numbers
+
+import dateutil.parser
 
 
 class TimeUtils:
+    EPOCH = datetime.datetime(1970, 1, 1)
+
     @staticmethod
     def iso8601(time_to_convert):
         return time_to_convert.replace(second=0, microsecond=0).isoformat()
@@ -22,3 +27,58 @@ class TimeUtils:
         else:
             return datetime.datetime.strptime(time_string,
                                               "%Y-%m-%dT%H:%M:%SZ")
+
+    @staticmethod
+    def parse_timestamp(timestamp):
+        '''
+        Naive UTC datetime of a timestamp of an AWS response, None for None.
+        The AWS CLI does not parse timestamps: JSON protocols like Kinesis
+        return epoch seconds, query protocols like CloudWatch ISO8601
+        strings. Other response parsers return datetimes.
+        '''
+        if timestamp is None:
+            return None
+        if isinstance(timestamp, datetime.datetime):
+            return TimeUtils.to_naive_utc(timestamp)
+        if isinstance(timestamp, numbers.Number):
+            return TimeUtils.from_epoch(float(timestamp))
+        try:
+            return TimeUtils.from_epoch(float(timestamp))
+        except ValueError:
+            pass
+        try:
+            # the format of CloudWatch, much faster than dateutil
+            return datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')
+        except ValueError:
+            return TimeUtils.to_naive_utc(dateutil.parser.parse(timestamp))
+
+    @staticmethod
+    def to_naive_utc(time_to_convert):
+        if not isinstance(time_to_convert, datetime.datetime):
+            return TimeUtils.parse_timestamp(time_to_convert)
+        if time_to_convert.tzinfo is None:
+            return time_to_convert
+        return (time_to_convert - time_to_convert.utcoffset()).replace(
+            tzinfo=None)
+
+    @staticmethod
+    def to_epoch(time_to_convert):
+        '''
+        Seconds since the epoch as float, NaN for None. Accepts the
+        timestamps of parse_timestamp.
+        '''
+        if time_to_convert is None:
+            return float('nan')
+        if isinstance(time_to_convert, numbers.Number):
+            return float(time_to_convert)
+        delta = TimeUtils.to_naive_utc(time_to_convert) - TimeUtils.EPOCH
+        return delta.days * 86400 + delta.seconds + delta.microseconds / 1e6
+
+    @staticmethod
+    def from_epoch(seconds):
+        '''
+        Naive UTC datetime, None for NaN.
+        '''
+        if seconds != seconds:
+            return None
+        return TimeUtils.EPOCH + datetime.timedelta(seconds=seconds)
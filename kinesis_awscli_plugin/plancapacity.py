@@ -0,0 +1,144 @@
+import datetime
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.lib.capacityplanner import CapacityPlanner
+from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
+from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.shardmetricsgetter import ShardMetricsGetter
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+from kinesis_awscli_plugin.lib.utils import Utils
+
+
+class PlanCapacityCommand(BasicCommand):
+
+    NAME = 'plan-capacity'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('Recommends the shard count of a stream from the peak '
+                   'utilization of its open shards, the largest share of '
+                   'the shard limits (1 MB or 1000 records per second '
+                   'written, 2 MB per second read) used in any period. Lists '
+                   'the shards to split, with the new starting hash keys, and '
+                   'the adjacent shards to merge to reach the target '
+                   'utilization. Requires shard-level metrics.')
+
+    DEFAULT_DURATION = 24 * 60
+
+    DEFAULT_TARGET_UTILIZATION = 70
+
+    ARG_TABLE = [
+        {
+            'name': 'stream-name',
+            'required': True,
+            'help_text': 'The name of the stream.'
+        },
+        {
+            'name': 'target-utilization',
+            'cli_type_name': 'integer',
+            'default': DEFAULT_TARGET_UTILIZATION,
+            'help_text':
+            'The peak utilization in percent a shard should stay below. '
+            'Defaults to {0}.'.format(DEFAULT_TARGET_UTILIZATION)
+        },
+        {
+            'name': 'period',
+            'cli_type_name': 'integer',
+            'required': False,
+            'help_text':
+            'The period of the datapoints in seconds. Defaults to the '
+            'smallest period CloudWatch keeps for the start time.'
+        },
+        {
+            'name': 'start-time',
+            'required': False,
+            'help_text':
+            'The start time of the metrics in UTC. Time format is ISO8601. '
+            'Defaults to now minus {0} minutes. Relative times like "7 days '
+            'ago" can be used if the Python module dateparser is '
+            'installed.'.format(DEFAULT_DURATION)
+        },
+        {
+            'name': 'end-time',
+            'required': False,
+            'help_text':
+            'The end time of the metrics in UTC. Time format is ISO8601. '
+            'Defaults to now.'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        args = self.collect_args(args)
+        self.validate_args(args)
+        args.period = CloudWatchHelper.choose_period(
+            args.start_time, args.end_time,
+            None if args.period is None else int(args.period))
+        kinesis_helper = KinesisHelper(self._session, parsed_globals)
+        if kinesis_helper.shard_metrics_enabled(args.stream_name) == False:
+            raise ValueError(
+                "Shard Metrics are not enabled for this stream. Use the command enable-enhanced-monitoring to enable them."
+            )
+        shard_metrics_getter = ShardMetricsGetter(
+            cloudwatch_helper=CloudWatchHelper(self._session, parsed_globals),
+            kinesis_helper=kinesis_helper,
+            stream_name=args.stream_name,
+            start_time=args.start_time,
+            end_time=args.end_time,
+            statistic='Sum',
+            period=args.period, )
+        shard_descriptions = kinesis_helper.stream_shard_descriptions(
+            args.stream_name)
+        open_shard_ids = [
+            shard['ShardId']
+            for shard in CapacityPlanner.open_shards(shard_descriptions)
+        ]
+        planner = CapacityPlanner(
+            shard_descriptions,
+            shard_metrics_getter.get_shard_metrics_by_name(
+                open_shard_ids, CapacityPlanner.METRIC_NAMES),
+            args.period,
+            float(args.target_utilization))
+        output = self.create_capacity_plan_output(planner.plan(), args)
+        Utils.display_response(self._session, self.NAME, output,
+                               parsed_globals)
+        return 0
+
+    def collect_args(self, args):
+        if args.start_time is None:
+            args.start_time = datetime.datetime.utcnow() - datetime.timedelta(
+                minutes=self.DEFAULT_DURATION)
+        else:
+            args.start_time = TimeUtils.to_datetime(args.start_time)
+
+        if args.end_time is None:
+            args.end_time = datetime.datetime.utcnow()
+        else:
+            args.end_time = TimeUtils.to_datetime(args.end_time)
+        return args
+
+    def validate_args(self, args):
+        if not 0 < int(args.target_utilization) <= 100:
+            raise ValueError(
+                'Parameter --target-utilization must be between 1 and 100')
+
+        if args.period is not None and int(args.period) < 1:
+            raise ValueError('Parameter --period must be at least 1 second')
+
+        if args.start_time > args.end_time:
+            raise ValueError("Parameter start-time is newer than end-time")
+
+    def create_capacity_plan_output(self, plan, args):
+        output = {}
+        output['Description'] = "Capacity plan of '{0}' for a peak utilization of {1}% per {2} seconds between {3} and {4}".format(
+            args.stream_name,
+            args.target_utilization,
+            args.period,
+            TimeUtils.iso8601(args.start_time),
+            TimeUtils.iso8601(args.end_time), )
+        output['StreamName'] = args.stream_name
+        output['StartTime'] = TimeUtils.iso8601(args.start_time)
+        output['EndTime'] = TimeUtils.iso8601(args.end_time)
+        output['Period'] = args.period
+        output.update(plan)
+        return output
@@ -1,13 +1,30 @@
 import logging
+import math
+import sys
 from threading import Thread, Event
-from six.moves import queue as Queue
 
 from awscli.customizations.commands import BasicCommand
 
 from kinesis_awscli_plugin.lib.threads import ExitChecker
+from kinesis_awscli_plugin.lib.batchdecoder import BatchDecoder
+from kinesis_awscli_plugin.lib.batchqueue import BatchQueue
+from kinesis_awscli_plugin.lib.checkpointer import Checkpointer
+from kinesis_awscli_plugin.lib.hashkeyindex import HashKeyIndex
+from kinesis_awscli_plugin.lib.recordfilter import RecordFilter
+from kinesis_awscli_plugin.lib.recordformatter import RecordFormatter
 from kinesis_awscli_plugin.lib.recordrenderer import RecordRenderer
+from kinesis_awscli_plugin.lib.recordsink import RecordSink
 from kinesis_awscli_plugin.lib.recordspuller import RecordsPuller
+from kinesis_awscli_plugin.lib.shardsubscriber import ShardSubscriber
+from kinesis_awscli_plugin.lib.shmring import ShmRingWriter, shm_path
 from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.keystatsreporter import KeyStatsReporter
+from kinesis_awscli_plugin.lib.keystatstracker import KeyStatsTracker
+from kinesis_awscli_plugin.lib.lagreporter import LagReporter
+from kinesis_awscli_plugin.lib.lagtracker import LagTracker
+from kinesis_awscli_plugin.lib.leasecoordinator import LeaseCoordinator
+from kinesis_awscli_plugin.lib.leasestore import LeaseStore
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
 from kinesis_awscli_plugin.lib.utils import Utils
 
 logger = logging.getLogger(__name__)
@@ -21,7 +38,21 @@ class PullCommand(BasicCommand):
 
     DESCRIPTION = ('This command pulls records from a Kinesis stream. ')
 
-    QUEUE_SIZE = 1000
+    # payload bytes that may be queued for rendering
+    QUEUE_BYTES = 64 * 1024 * 1024
+
+    DEFAULT_SHM_SIZE = 128
+
+    # records are pushed with enhanced fan-out, so the renderer should not
+    # wait a full pull delay for them
+    EFO_RENDER_DELAY = 50
+
+    SHARD_ITERATOR_TYPES = {
+        'latest': 'LATEST',
+        'trim-horizon': 'TRIM_HORIZON',
+        'at-timestamp': 'AT_TIMESTAMP',
+        'after-sequence': 'AFTER_SEQUENCE_NUMBER',
+    }
 
     ARG_TABLE = [
         {
@@ -31,9 +62,27 @@ class PullCommand(BasicCommand):
         },
         {
             'name': 'shard-id',
-            'required': True,
+            'required': False,
             'help_text': 'Specifies the shard id that should be pulled.'
-            'Can be retrieved via describe-stream'
+            'Can be retrieved via describe-stream. If not specified all '
+            'shards of the stream are pulled.'
+        },
+        {
+            'name': 'partition-key',
+            'nargs': '+',
+            'required': False,
+            'help_text':
+            'Only pulls the shards that own these partition keys and only '
+            'renders records with these keys. Shards are found by the MD5 '
+            'hash of the key like Kinesis does, records written with an '
+            'explicit hash key may be missed.'
+        },
+        {
+            'name': 'partition-key-file',
+            'required': False,
+            'help_text':
+            'Reads more partition keys for --partition-key from a file with '
+            'one key per line.'
         },
         {
             'name': 'pull-delay',
@@ -51,37 +100,508 @@ class PullCommand(BasicCommand):
             'Specifies how many seconds the command should pull from the stream. '
             'Defaults to -1 (infinite).'
         },
+        {
+            'name': 'start',
+            'default': 'latest',
+            'choices': sorted(SHARD_ITERATOR_TYPES.keys()),
+            'help_text':
+            'Specifies where pulling starts if there is no checkpoint for '
+            'the shard. "at-timestamp" requires --timestamp, '
+            '"after-sequence" requires --sequence-number. Defaults to "latest".'
+        },
+        {
+            'name': 'timestamp',
+            'required': False,
+            'help_text':
+            'The time in UTC pulling starts at if --start is "at-timestamp". '
+            'Time format is ISO8601. Relative times like "30 minutes ago" can '
+            'be used if the Python module dateparser is installed.'
+        },
+        {
+            'name': 'sequence-number',
+            'required': False,
+            'help_text':
+            'The sequence number pulling starts after if --start is '
+            '"after-sequence".'
+        },
+        {
+            'name': 'checkpoint-file',
+            'required': False,
+            'help_text':
+            'Specifies a file that stores the sequence number of the last '
+            'processed record per shard. Pulling resumes after the '
+            'checkpointed record and the file is updated while pulling.'
+        },
+        {
+            'name': 'group',
+            'required': False,
+            'help_text':
+            'Name of a consumer group. All pull processes of a group share '
+            'the shards of the stream. Every shard is leased to one process '
+            'and leases are rebalanced when processes join or leave. '
+            'Requires --lease-store.'
+        },
+        {
+            'name': 'lease-store',
+            'required': False,
+            'help_text':
+            'SQLite file that holds the leases and checkpoints of --group. '
+            'All processes of the group must use the same file, so they must '
+            'run on the same machine or share a file system that supports '
+            'file locking.'
+        },
+        {
+            'name': 'lease-duration',
+            'cli_type_name': 'integer',
+            'default': '30',
+            'help_text':
+            'Seconds after which the lease of a shard expires if it is not '
+            'renewed, for example because its process died. Leases are '
+            'renewed three times per lease duration. Defaults to 30.'
+        },
+        {
+            'name': 'efo-consumer',
+            'required': False,
+            'help_text':
+            'Specifies the name of an enhanced fan-out consumer. Records are '
+            'pushed to the consumer through SubscribeToShard instead of '
+            'being polled with GetRecords. The consumer is registered if it '
+            'does not exist yet and stays registered after pulling.'
+        },
+        {
+            'name': 'output-format',
+            'default': 'raw',
+            'choices': RecordFormatter.OUTPUT_FORMATS,
+            'help_text':
+            'Specifies how records are written to standard output. "raw" '
+            'writes the payload followed by a newline, "jsonl" writes a JSON '
+            'document per record with shard id, sequence number, partition '
+            'key, arrival timestamp and base64 encoded payload, '
+            '"length-prefixed" writes a 4 byte big-endian length followed by '
+            'the payload. Defaults to "raw".'
+        },
+        {
+            'name': 'filter',
+            'required': False,
+            'help_text':
+            'Only records matching the filter are rendered. '
+            '"regex:PATTERN" (or just PATTERN) matches a regular expression '
+            'against the payload, "json:FIELD.PATH=VALUE" matches a field of '
+            'JSON payloads, e.g. "json:request.status=500".'
+        },
+        {
+            'name': 'project',
+            'required': False,
+            'help_text':
+            'Comma separated list of JSON field paths, e.g. "level,request.id". '
+            'JSON payloads are replaced by an object with only these fields. '
+            'Records that are not JSON are dropped.'
+        },
+        {
+            'name': 'sample',
+            'cli_type_name': 'float',
+            'required': False,
+            'help_text':
+            'Renders only the given fraction (0 < RATE <= 1) of partition '
+            'keys. Sampling is deterministic: all records of a sampled '
+            'partition key are rendered.'
+        },
+        {
+            'name': 'sink-dir',
+            'required': False,
+            'help_text':
+            'Writes records to compressed files in this directory instead '
+            'of standard output. Every shard gets its own subdirectory. With '
+            '--checkpoint-file, checkpoints only advance after the records '
+            'were durably written.'
+        },
+        {
+            'name': 'publish-shm',
+            'required': False,
+            'help_text':
+            'Writes the formatted records to a shared memory ring buffer with '
+            'this name instead of standard output. Any number of local '
+            'processes can read the records with "aws kinesis read-shm" or '
+            'the ShmRingReader class without calling GetRecords themselves. '
+            'The ring buffer never waits for readers, readers that fall '
+            'behind by more than --shm-size lose records.'
+        },
+        {
+            'name': 'shm-size',
+            'cli_type_name': 'integer',
+            'default': str(DEFAULT_SHM_SIZE),
+            'help_text':
+            'Size of the --publish-shm ring buffer in MB. It must hold two '
+            'of the largest renderer writes, at least 23 MB for raw and '
+            '107 MB for jsonl records. Defaults to {0} MB.'.format(
+                DEFAULT_SHM_SIZE)
+        },
+        {
+            'name': 'compression',
+            'default': 'gzip',
+            'choices': RecordSink.COMPRESSIONS,
+            'help_text':
+            'Compression of the files written to --sink-dir. zstd requires '
+            'the Python module zstandard. Defaults to "gzip".'
+        },
+        {
+            'name': 'rotate-size',
+            'cli_type_name': 'integer',
+            'default': '128',
+            'help_text':
+            'Size in megabytes after which a file in --sink-dir is closed and '
+            'a new one is started. Defaults to 128.'
+        },
+        {
+            'name': 'rotate-interval',
+            'cli_type_name': 'integer',
+            'default': '300',
+            'help_text':
+            'Number of seconds after which a file in --sink-dir is closed and '
+            'a new one is started. Defaults to 300.'
+        },
+        {
+            'name': 'decode-workers',
+            'cli_type_name': 'integer',
+            'default': '0',
+            'help_text':
+            'Number of worker processes that filter and format record '
+            'batches. Useful when pulling all shards of a busy stream. '
+            'Defaults to 0 (records are processed by the rendering thread).'
+        },
+        {
+            'name': 'lag-report',
+            'action': 'store_true',
+            'help_text':
+            'Periodically writes how many milliseconds every shard is behind '
+            'the tip of the stream and the records and bytes pulled per second '
+            'to standard error.'
+        },
+        {
+            'name': 'lag-report-interval',
+            'cli_type_name': 'integer',
+            'default': '5',
+            'help_text':
+            'Seconds between two lag reports. Defaults to 5 seconds.'
+        },
+        {
+            'name': 'lag-report-format',
+            'default': 'table',
+            'choices': LagReporter.REPORT_FORMATS,
+            'help_text':
+            'Writes the lag report as table that is refreshed in place or as '
+            'one JSON document per shard and report. Defaults to "table".'
+        },
+        {
+            'name': 'key-stats',
+            'action': 'store_true',
+            'help_text':
+            'Periodically writes the partition keys with the most records '
+            'and bytes over a sliding window and the shard each key maps to '
+            'to standard error. Memory use is fixed, whatever the number of '
+            'distinct keys, and counts are estimates.'
+        },
+        {
+            'name': 'key-stats-window',
+            'cli_type_name': 'integer',
+            'default': '60',
+            'help_text':
+            'Length in seconds of the sliding window of --key-stats. '
+            'Defaults to 60 seconds.'
+        },
+        {
+            'name': 'key-stats-top',
+            'cli_type_name': 'integer',
+            'default': '10',
+            'help_text':
+            'Number of partition keys reported by records and by bytes. '
+            'Defaults to 10.'
+        },
+        {
+            'name': 'key-stats-interval',
+            'cli_type_name': 'integer',
+            'default': '10',
+            'help_text':
+            'Seconds between two key reports. Defaults to 10 seconds.'
+        },
+        {
+            'name': 'key-stats-format',
+            'default': 'table',
+            'choices': KeyStatsReporter.REPORT_FORMATS,
+            'help_text':
+            'Writes the key report as table that is refreshed in place or as '
+            'one JSON document per key and report. Defaults to "table".'
+        },
     ]
 
     def _run_main(self, args, parsed_globals):
+        args.partition_keys = self.collect_partition_keys(args)
+        self.validate_args(args)
         # Initialize services
         self.kinesis_helper = KinesisHelper(self._session, parsed_globals)
+        self.record_filter = None
+        self.filter_arguments = None
+        if args.filter is not None or args.project is not None or \
+                args.sample is not None or args.partition_keys is not None:
+            self.filter_arguments = (args.filter, args.project, args.sample,
+                                     args.partition_keys)
+            # with decode workers the records are filtered by the workers
+            if int(args.decode_workers) == 0:
+                self.record_filter = RecordFilter(*self.filter_arguments)
+        self.checkpointer = None
+        self.lease_store = None
+        if args.checkpoint_file is not None:
+            self.checkpointer = Checkpointer(args.checkpoint_file)
+        if args.group is not None:
+            # checkpoints are kept with the leases
+            self.lease_store = LeaseStore(args.lease_store, args.group,
+                                          int(args.lease_duration))
+            self.checkpointer = self.lease_store
+        self.lag_tracker = None
+        if args.lag_report:
+            self.lag_tracker = LagTracker()
+        self.key_stats = None
+        if args.key_stats:
+            self.key_stats = KeyStatsTracker(int(args.key_stats_window),
+                                             top=int(args.key_stats_top))
         # Run the command and report success
         self._call(args, parsed_globals)
         return 0
 
+    def validate_args(self, args):
+        if args.partition_keys is not None and args.shard_id is not None:
+            raise ValueError(
+                'Parameter --partition-key cannot be combined with --shard-id')
+        if args.start == 'at-timestamp':
+            if args.timestamp is None:
+                raise ValueError(
+                    'Parameter --timestamp is required for --start at-timestamp')
+            args.timestamp = TimeUtils.to_datetime(args.timestamp)
+        if args.start == 'after-sequence' and args.sequence_number is None:
+            raise ValueError(
+                'Parameter --sequence-number is required for --start after-sequence')
+        if args.publish_shm is not None:
+            if args.sink_dir is not None:
+                raise ValueError(
+                    'Parameters --publish-shm and --sink-dir cannot be combined')
+            min_shm_size = self.min_shm_size(args.output_format)
+            if int(args.shm_size) < min_shm_size:
+                raise ValueError(
+                    'Parameter --shm-size must be at least %d MB for '
+                    '--output-format %s' % (min_shm_size, args.output_format))
+        if args.key_stats and int(args.key_stats_window) < 1:
+            raise ValueError(
+                'Parameter --key-stats-window must be at least 1 second')
+        if (args.group is None) != (args.lease_store is None):
+            raise ValueError(
+                'Parameters --group and --lease-store must be used together')
+        if args.group is not None:
+            if args.shard_id is not None or args.checkpoint_file is not None:
+                raise ValueError(
+                    'Parameter --group cannot be combined with --shard-id '
+                    'or --checkpoint-file')
+            if int(args.lease_duration) < 3:
+                raise ValueError(
+                    'Parameter --lease-duration must be at least 3 seconds')
+
+    @staticmethod
+    def min_shm_size(output_format):
+        '''
+        A ring buffer message holds at most half of the ring. It must take a
+        full renderer write, the buffer plus the largest formatted batch.
+        '''
+        size = 2 * (RecordRenderer.MAX_BUFFER_SIZE +
+                    RecordFormatter.max_batch_size(output_format))
+        return int(math.ceil(size / (1024.0 * 1024.0)))
+
+    def collect_partition_keys(self, args):
+        if args.partition_key is None and args.partition_key_file is None:
+            return None
+        partition_keys = list(args.partition_key or [])
+        if args.partition_key_file is not None:
+            with open(args.partition_key_file, 'r') as key_file:
+                partition_keys.extend(
+                    line.strip() for line in key_file if line.strip() != '')
+        if len(partition_keys) == 0:
+            raise ValueError('No partition keys in %s' %
+                             args.partition_key_file)
+        return partition_keys
+
     def _call(self, options, parsed_globals):
 
         threads = []
         stop_flag = Event()
-        shard_iterator = self.kinesis_helper.get_shard_iterator_from_latest(
-            options.stream_name, options.shard_id)
+        if options.shard_id is not None:
+            shard_ids = [options.shard_id]
+        elif options.partition_keys is not None:
+            hash_key_index = HashKeyIndex(
+                self.kinesis_helper.stream_shard_descriptions(
+                    options.stream_name))
+            shard_ids = hash_key_index.shards_for_keys(options.partition_keys)
+            logger.debug('Partition keys map to shards %s' % shard_ids)
+        else:
+            shard_ids = self.kinesis_helper.stream_shards(options.stream_name)
 
-        queue = Queue.Queue(self.QUEUE_SIZE)
-        renderer = RecordRenderer(stop_flag, queue, options.pull_delay)
+        queue = BatchQueue(self.QUEUE_BYTES)
+        render_queue = queue
+        render_stop_flag = stop_flag
+        if int(options.decode_workers) > 0:
+            render_queue = BatchQueue(self.QUEUE_BYTES)
+            render_stop_flag = Event()
+            decoder = BatchDecoder(stop_flag, queue, render_queue,
+                                   render_stop_flag,
+                                   int(options.decode_workers),
+                                   self.filter_arguments,
+                                   options.output_format)
+            decoder.start()
+            threads.append(decoder)
+        renderer = self.create_renderer(render_stop_flag, render_queue,
+                                        options)
         renderer.start()
         threads.append(renderer)
 
-        puller = RecordsPuller(
+        if self.lag_tracker is not None:
+            reporter = LagReporter(stop_flag, self.lag_tracker,
+                                   int(options.lag_report_interval),
+                                   sys.stderr, options.lag_report_format)
+            reporter.start()
+            threads.append(reporter)
+        if self.key_stats is not None:
+            reporter = KeyStatsReporter(stop_flag, self.key_stats,
+                                        int(options.key_stats_interval),
+                                        sys.stderr, options.key_stats_format)
+            reporter.start()
+            threads.append(reporter)
+
+        consumer_arn = None
+        if options.efo_consumer is not None:
+            consumer_arn = self.kinesis_helper.register_stream_consumer(
+                options.stream_name, options.efo_consumer)
+        if self.lease_store is not None:
+            coordinator = LeaseCoordinator(
+                stop_flag, self.lease_store,
+                lambda: self.shard_descriptions(options),
+                lambda shard_stop_flag, shard_id: self.create_shard_reader(
+                    shard_stop_flag, queue, options, shard_id, consumer_arn),
+                int(options.lease_duration) / 3.0,
+                int(options.duration))
+            coordinator.start()
+            threads.append(coordinator)
+        else:
+            for shard_id in shard_ids:
+                reader = self.create_shard_reader(stop_flag, queue, options,
+                                                  shard_id, consumer_arn)
+                reader.start()
+                threads.append(reader)
+
+        ExitChecker.wait_on_exit(stop_flag)
+        for thread in threads:
+            thread.join()
+        if self.lease_store is not None:
+            # after the renderer wrote the last checkpoints
+            self.lease_store.release_all()
+
+    def shard_descriptions(self, options):
+        '''
+        The current shards of the stream, for partition keys only the
+        shards that own them.
+        '''
+        shard_descriptions = self.kinesis_helper.stream_shard_descriptions(
+            options.stream_name)
+        if options.partition_keys is None:
+            return shard_descriptions
+        shard_ids = HashKeyIndex(shard_descriptions).shards_for_keys(
+            options.partition_keys)
+        return [
+            shard for shard in shard_descriptions
+            if shard['ShardId'] in shard_ids
+        ]
+
+    def create_renderer(self, stop_flag, queue, options):
+        render_delay = options.pull_delay
+        if options.efo_consumer is not None:
+            render_delay = self.EFO_RENDER_DELAY
+        if options.sink_dir is not None:
+            return RecordSink(
+                stop_flag,
+                queue,
+                render_delay,
+                options.sink_dir,
+                self.checkpointer,
+                options.output_format,
+                options.compression,
+                int(options.rotate_size) * 1024 * 1024,
+                int(options.rotate_interval), )
+        output = None
+        if options.publish_shm is not None:
+            output = ShmRingWriter(
+                shm_path(options.publish_shm),
+                int(options.shm_size) * 1024 * 1024)
+        return RecordRenderer(stop_flag, queue, render_delay,
+                              self.checkpointer, options.output_format,
+                              output)
+
+    def create_shard_reader(self, stop_flag, queue, options, shard_id,
+                            consumer_arn):
+        if consumer_arn is not None:
+            return ShardSubscriber(
+                stop_flag,
+                queue,
+                self.kinesis_helper.client,
+                consumer_arn,
+                shard_id,
+                self.create_starting_position(options, shard_id),
+                int(options.duration),
+                record_filter=self.record_filter,
+                lag_tracker=self.lag_tracker,
+                key_stats=self.key_stats, )
+        return RecordsPuller(
             stop_flag,
             queue,
             self.kinesis_helper.client,
-            shard_iterator,
+            self.create_shard_iterator(options, shard_id),
             int(options.pull_delay),
-            int(options.duration), )
-        puller.start()
+            int(options.duration),
+            shard_id=shard_id,
+            iterator_factory=self.shard_iterator_factory(options, shard_id),
+            record_filter=self.record_filter,
+            lag_tracker=self.lag_tracker,
+            key_stats=self.key_stats, )
 
-        threads.append(puller)
-        ExitChecker.wait_on_exit(stop_flag)
-        for thread in threads:
-            thread.join()
+    def shard_iterator_factory(self, options, shard_id):
+        return lambda sequence_number: self.create_shard_iterator(
+            options, shard_id, sequence_number)
+
+    def create_starting_position(self, options, shard_id):
+        sequence_number = None
+        if self.checkpointer is not None:
+            sequence_number = self.checkpointer.get(shard_id)
+        if sequence_number is not None:
+            return {
+                'Type': 'AFTER_SEQUENCE_NUMBER',
+                'SequenceNumber': sequence_number
+            }
+        starting_position = {'Type': self.SHARD_ITERATOR_TYPES[options.start]}
+        if options.start == 'at-timestamp':
+            starting_position['Timestamp'] = options.timestamp
+        elif options.start == 'after-sequence':
+            starting_position['SequenceNumber'] = options.sequence_number
+        return starting_position
+
+    def create_shard_iterator(self, options, shard_id, sequence_number=None):
+        # resume after the last pulled record, then after the last
+        # checkpoint and only then from the requested start position
+        if sequence_number is None and self.checkpointer is not None:
+            sequence_number = self.checkpointer.get(shard_id)
+        if sequence_number is not None:
+            return self.kinesis_helper.get_shard_iterator(
+                options.stream_name,
+                shard_id,
+                'AFTER_SEQUENCE_NUMBER',
+                sequence_number=sequence_number)
+        return self.kinesis_helper.get_shard_iterator(
+            options.stream_name,
+            shard_id,
+            self.SHARD_ITERATOR_TYPES[options.start],
+            timestamp=options.timestamp,
+            sequence_number=options.sequence_number)
@@ -0,0 +1,81 @@
+import logging
+import sys
+import time
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.lib.shmring import ShmRingReader, shm_path
+from kinesis_awscli_plugin.lib.utils import Utils
+
+logger = logging.getLogger(__name__)
+
+
+class ReadShmCommand(BasicCommand):
+
+    NAME = 'read-shm'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('This command reads the records that a local '
+                   '"aws kinesis pull --publish-shm" process writes to a '
+                   'shared memory ring buffer and writes them to standard '
+                   'output in the output format of the pull command. Every '
+                   'reader has its own position in the buffer. No Kinesis '
+                   'API is called.')
+
+    ARG_TABLE = [
+        {
+            'name': 'name',
+            'required': True,
+            'help_text': 'Name of the ring buffer given to --publish-shm.'
+        },
+        {
+            'name': 'start',
+            'default': 'latest',
+            'choices': ['latest', 'oldest'],
+            'help_text':
+            'Starts with the records published after the reader started or '
+            'with the oldest records still in the buffer. Defaults to '
+            '"latest".'
+        },
+        {
+            'name': 'duration',
+            'cli_type_name': 'integer',
+            'default': '-1',
+            'help_text':
+            'Specifies how many seconds the command should read. '
+            'Defaults to -1 (infinite).'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        reader = ShmRingReader(shm_path(args.name), args.start)
+        try:
+            self._call(reader, int(args.duration))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            reader.close()
+        return 0
+
+    def _call(self, reader, duration):
+        # sys.stdout only accepts text in Python 3
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+        end_time = None if duration == -1 else time.time() + duration
+        lost_bytes = 0
+        while end_time is None or time.time() < end_time:
+            message = reader.read(timeout=1)
+            if message is None:
+                continue
+            # the copy is only written if the writer did not overwrite the
+            # message while it was copied
+            data = bytes(message)
+            if not reader.valid():
+                continue
+            output.write(data)
+            output.flush()
+            if reader.lost_bytes != lost_bytes:
+                sys.stderr.write(
+                    'Reader fell behind the writer and skipped %d bytes\n' %
+                    (reader.lost_bytes - lost_bytes))
+                lost_bytes = reader.lost_bytes
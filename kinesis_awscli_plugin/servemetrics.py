@@ -0,0 +1,182 @@
+import datetime
+import sys
+from threading import Event
+
+from awscli.customizations.commands import BasicCommand
+
+from kinesis_awscli_plugin.getfleetmetrics import GetFleetMetricsCommand
+from kinesis_awscli_plugin.getshardmetrics import GetShardMetricsCommand
+from kinesis_awscli_plugin.getstreammetrics import GetStreamMetricsCommand
+from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
+from kinesis_awscli_plugin.lib.kinesishelper import KinesisHelper
+from kinesis_awscli_plugin.lib.metricsexporter import MetricsExporter
+from kinesis_awscli_plugin.lib.metricsserver import MetricsServer
+from kinesis_awscli_plugin.lib.shardmetricsgetter import ShardMetricsGetter
+from kinesis_awscli_plugin.lib.streammetricsgetter import StreamMetricsGetter
+from kinesis_awscli_plugin.lib.threads import ExitChecker
+from kinesis_awscli_plugin.lib.utils import Utils
+
+
+class ServeMetricsCommand(BasicCommand):
+
+    NAME = 'serve-metrics'
+
+    EXAMPLES = Utils.example_text(__file__, NAME + '.rst')
+
+    DESCRIPTION = ('Runs an HTTP exporter that serves stream and shard '
+                   'metrics of one or more streams at /metrics in the '
+                   'Prometheus text format. The metrics are refreshed from '
+                   'CloudWatch in the background and scrapes are answered '
+                   'from memory. Shard metrics are exported for streams with '
+                   'shard-level metrics enabled, with their own series for '
+                   'the shards with the highest values only.')
+
+    DEFAULT_METRIC_NAMES = GetFleetMetricsCommand.DEFAULT_METRIC_NAMES
+
+    DEFAULT_SHARD_METRIC_NAMES = [
+        'IncomingBytes', 'IncomingRecords',
+        'WriteProvisionedThroughputExceeded'
+    ]
+
+    DEFAULT_PORT = 9779
+
+    ARG_TABLE = [
+        {
+            'name': 'stream-names',
+            'required': True,
+            'help_text': 'Comma separated list of streams to export.'
+        },
+        {
+            'name': 'port',
+            'cli_type_name': 'integer',
+            'default': DEFAULT_PORT,
+            'help_text':
+            'The port to listen on. Defaults to {0}.'.format(DEFAULT_PORT)
+        },
+        {
+            'name': 'address',
+            'default': '127.0.0.1',
+            'help_text':
+            'The address to listen on. Defaults to "127.0.0.1", use '
+            '"0.0.0.0" to accept scrapes from other hosts.'
+        },
+        {
+            'name': 'metric-names',
+            'required': False,
+            'help_text':
+            'Comma separated list of stream-level metrics. Defaults to '
+            '"{0}".'.format(','.join(DEFAULT_METRIC_NAMES))
+        },
+        {
+            'name': 'shard-metric-names',
+            'required': False,
+            'help_text':
+            'Comma separated list of shard-level metrics. Defaults to '
+            '"{0}".'.format(','.join(DEFAULT_SHARD_METRIC_NAMES))
+        },
+        {
+            'name': 'statistic',
+            'default': 'Sum',
+            'choices': GetStreamMetricsCommand.ALLOWED_STATISTICS,
+            'help_text':
+            'The statistic of the metrics per minute. Defaults to "Sum".'
+        },
+        {
+            'name': 'interval',
+            'cli_type_name': 'integer',
+            'default': 60,
+            'help_text':
+            'Seconds between two refreshes of the metrics. Defaults to 60.'
+        },
+        {
+            'name': 'max-shards',
+            'cli_type_name': 'integer',
+            'default': 20,
+            'help_text':
+            'Only the shards with the highest values of a metric get their '
+            'own series, the others are combined into the shard_id "other". '
+            'Defaults to 20.'
+        },
+    ]
+
+    def _run_main(self, args, parsed_globals):
+        args = self.collect_args(args)
+        self.validate_args(args)
+        cloudwatch_helper = CloudWatchHelper(self._session, parsed_globals)
+        kinesis_helper = KinesisHelper(self._session, parsed_globals)
+        now = datetime.datetime.utcnow()
+        streams = []
+        for stream_name in args.stream_names:
+            stream_metrics_getter = StreamMetricsGetter(
+                cloudwatch_helper=cloudwatch_helper,
+                stream_name=stream_name,
+                start_time=now,
+                end_time=now,
+                statistic=args.statistic, )
+            shard_metrics_getter = None
+            if len(args.shard_metric_names) > 0 and \
+                    kinesis_helper.shard_metrics_enabled(stream_name):
+                shard_metrics_getter = ShardMetricsGetter(
+                    cloudwatch_helper=cloudwatch_helper,
+                    kinesis_helper=kinesis_helper,
+                    stream_name=stream_name,
+                    start_time=now,
+                    end_time=now,
+                    statistic=args.statistic, )
+            streams.append((stream_metrics_getter, shard_metrics_getter))
+        stop_flag = Event()
+        exporter = MetricsExporter(
+            stop_flag,
+            streams,
+            args.metric_names,
+            args.shard_metric_names,
+            args.statistic,
+            int(args.interval),
+            max_shards=int(args.max_shards), )
+        server = MetricsServer(stop_flag, exporter, args.address,
+                               int(args.port))
+        sys.stderr.write('Serving metrics at http://%s:%d%s\n' %
+                         (args.address, server.port, MetricsServer.PATH))
+        exporter.start()
+        server.start()
+        ExitChecker.wait_on_exit(stop_flag)
+        server.shutdown()
+        server.join()
+        return 0
+
+    def collect_args(self, args):
+        args.stream_names = args.stream_names.split(',')
+
+        if args.metric_names is None:
+            args.metric_names = self.DEFAULT_METRIC_NAMES
+        else:
+            args.metric_names = args.metric_names.split(',')
+
+        if args.shard_metric_names is None:
+            args.shard_metric_names = self.DEFAULT_SHARD_METRIC_NAMES
+        elif args.shard_metric_names == '':
+            args.shard_metric_names = []
+        else:
+            args.shard_metric_names = args.shard_metric_names.split(',')
+        return args
+
+    def validate_args(self, args):
+        for _metric in args.metric_names:
+            if _metric not in GetStreamMetricsCommand.STREAM_METRIC_NAMES:
+                raise ValueError(
+                    "{0} not found. Metric name must be one of the following: {1}".
+                    format(_metric,
+                           str(GetStreamMetricsCommand.STREAM_METRIC_NAMES)))
+
+        for _metric in args.shard_metric_names:
+            if _metric not in GetShardMetricsCommand.ALLOWED_METRIC_NAMES:
+                raise ValueError(
+                    "{0} not found. Shard metric name must be one of the following: {1}".
+                    format(_metric,
+                           str(GetShardMetricsCommand.ALLOWED_METRIC_NAMES)))
+
+        if int(args.interval) < 1:
+            raise ValueError('Parameter --interval must be at least 1 second')
+
+        if int(args.max_shards) < 0:
+            raise ValueError('Parameter --max-shards must not be negative')
@@ -10,7 +10,7 @@ setup(
     description = 'An AWS Command-line Interface plugin for AWS Kinesis',
     keywords = 'AWS Kinesis CLI',
     install_requires = [
-      'awscli',
+      'awscli>=1.15.70',
       'dateparser',
     ],
 )
@@ -0,0 +1,54 @@
+import pickle
+
+from kinesis_awscli_plugin.lib.batchdecoder import BatchDecoder
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from six.moves import queue as Queue
+from threading import Event
+
+class TestBatchDecoder:
+
+  def setUp(self):
+    self.stop_flag = Event()
+    self.output_stop_flag = Event()
+    self.input_queue = Queue.Queue()
+    self.output_queue = Queue.Queue()
+
+  def test_batches_are_decoded_in_order(self):
+    for i in range(0, 50):
+      records = [{'SequenceNumber': '%d-%d' % (i, j), 'PartitionKey': 'key', 'Data': b'%d' % j} for j in range(0, 10)]
+      self.input_queue.put(RecordBatch(records, 'shard%d' % (i % 3)))
+    decoder = BatchDecoder(
+      self.stop_flag,
+      self.input_queue,
+      self.output_queue,
+      self.output_stop_flag,
+      3,
+      ('regex:^[0-4]$', None, None),
+      'raw')
+    decoder.start()
+    self.stop_flag.set()
+    decoder.join(30)
+    assert self.output_stop_flag.is_set()
+    assert self.output_queue.qsize() == 50
+    for i in range(0, 50):
+      batch = self.output_queue.get()
+      assert batch.shard_id == 'shard%d' % (i % 3)
+      assert batch.last_sequence_number == '%d-9' % i
+      assert len(batch) == 0
+      assert batch.formatted == b'0\n1\n2\n3\n4\n'
+
+  def test_cli_records_are_decoded_by_the_workers(self):
+    batch = RecordBatch([{'SequenceNumber': '1', 'Data': u'aGVsbG8='}], 'shard0')
+    # the batch is sent to a worker with the base64 text of the AWS CLI
+    assert b'aGVsbG8=' in pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+    self.input_queue.put(batch)
+    decoder = BatchDecoder(
+      self.stop_flag,
+      self.input_queue,
+      self.output_queue,
+      self.output_stop_flag,
+      1)
+    decoder.start()
+    self.stop_flag.set()
+    decoder.join(30)
+    assert self.output_queue.get().formatted == b'hello\n'
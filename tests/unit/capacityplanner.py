@@ -0,0 +1,121 @@
+import datetime
+
+from kinesis_awscli_plugin.lib.capacityplanner import CapacityPlanner
+from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+
+MB = 1024 * 1024
+MAX_HASH_KEY = 2 ** 128 - 1
+
+
+class TestCapacityPlanner:
+  def setUp(self):
+    quarter = (MAX_HASH_KEY + 1) // 4
+    self.shards = [
+      self.shard('shardId-000000000000', 0, MAX_HASH_KEY, closed=True),
+    ] + [
+      self.shard('shardId-00000000000%d' % (index + 1), index * quarter,
+                 (index + 1) * quarter - 1)
+      for index in range(4)
+    ]
+    self.minutes = [datetime.datetime(2026, 10, 1, 12, minute)
+                    for minute in range(3)]
+
+  def shard(self, shard_id, start, end, closed=False):
+    sequence_number_range = {'StartingSequenceNumber': '1'}
+    if closed:
+      sequence_number_range['EndingSequenceNumber'] = '2'
+    return {'ShardId': shard_id,
+            'HashKeyRange': {'StartingHashKey': str(start),
+                             'EndingHashKey': str(end)},
+            'SequenceNumberRange': sequence_number_range}
+
+  def metrics(self, values_by_shard):
+    return [
+      KinesisMetrics(shard_id, [
+        {'Timestamp': minute, 'Sum': value, 'Unit': 'Count'}
+        for minute, value in zip(self.minutes, values)
+      ], 'Sum')
+      for shard_id, values in values_by_shard.items()
+    ]
+
+  def planner(self, incoming_bytes, write_throttles=None):
+    metrics_by_name = {
+      'IncomingBytes': self.metrics(incoming_bytes),
+      'IncomingRecords': self.metrics(dict(
+        (shard_id, [1000] * 3) for shard_id in incoming_bytes)),
+    }
+    if write_throttles is not None:
+      metrics_by_name['WriteProvisionedThroughputExceeded'] = \
+        self.metrics(write_throttles)
+    return CapacityPlanner(self.shards, metrics_by_name, 60, 70.0)
+
+  def test_open_shards_in_hash_key_order(self):
+    shards = CapacityPlanner.open_shards(list(reversed(self.shards)))
+    assert [shard['ShardId'] for shard in shards] == [
+      'shardId-000000000001', 'shardId-000000000002',
+      'shardId-000000000003', 'shardId-000000000004']
+
+  def test_plan_splits_hot_shard_and_merges_cold_neighbours(self):
+    plan = self.planner({
+      # 90 MB in a minute is 150% of 1 MB/s
+      'shardId-000000000001': [30 * MB, 90 * MB, 30 * MB],
+      'shardId-000000000002': [6 * MB, 6 * MB, 6 * MB],
+      'shardId-000000000003': [6 * MB, 12 * MB, 6 * MB],
+      'shardId-000000000004': [12 * MB, 6 * MB, 6 * MB],
+    }).plan()
+    assert plan['OpenShardCount'] == 4
+    assert plan['Shards'][0]['ShardId'] == 'shardId-000000000001'
+    assert plan['Shards'][0]['PeakUtilization'] == 150.0
+    assert plan['Shards'][0]['LimitingMetric'] == 'IncomingBytes'
+    split = plan['Splits'][0]
+    assert split['ShardId'] == 'shardId-000000000001'
+    # 150% / 70% needs 3 shards of 50%
+    assert split['NewShardCount'] == 3
+    assert split['ProjectedUtilization'] == 50.0
+    quarter = (MAX_HASH_KEY + 1) // 4
+    assert split['NewStartingHashKeys'] == [str(quarter // 3),
+                                            str(quarter * 2 // 3)]
+    # 3 and 4 peak in different minutes, so together they need 30%
+    assert plan['Merges'] == [{
+      'ShardIds': ['shardId-000000000002', 'shardId-000000000003'],
+      'PeakUtilizations': [10.0, 20.0],
+      'ProjectedUtilization': 30.0,
+    }]
+    assert plan['ProjectedShardCount'] == 4 + 2 - 1
+    # 114 MB in the second minute are 190% of one shard
+    assert plan['PeakStreamUtilization'] == 190.0
+    assert plan['RecommendedShardCount'] == 3
+
+  def test_plan_splits_throttled_shard(self):
+    plan = self.planner({
+      'shardId-000000000001': [6 * MB] * 3,
+      'shardId-000000000002': [6 * MB] * 3,
+    }, {'shardId-000000000002': [0, 4, 0]}).plan()
+    assert [split['ShardId'] for split in plan['Splits']] == [
+      'shardId-000000000002']
+    assert plan['Splits'][0]['NewShardCount'] == 2
+    # shards without datapoints had nothing to do
+    assert [merge['ShardIds'] for merge in plan['Merges']] == [
+      ['shardId-000000000003', 'shardId-000000000004']]
+    shards = dict((shard['ShardId'], shard) for shard in plan['Shards'])
+    assert shards['shardId-000000000002']['WriteThrottles'] == 4.0
+
+  def test_cli_timestamps(self):
+    incoming_bytes = {
+      'shardId-000000000001': [30 * MB, 90 * MB, 30 * MB],
+      'shardId-000000000002': [6 * MB, 6 * MB, 6 * MB],
+      'shardId-000000000003': [6 * MB, 12 * MB, 6 * MB],
+    }
+    expected = self.planner(incoming_bytes).plan()
+    # the AWS CLI returns the timestamps of CloudWatch as ISO8601 strings
+    self.minutes = [minute.isoformat() + 'Z' for minute in self.minutes]
+    plan = self.planner(incoming_bytes).plan()
+    assert plan == expected
+    assert plan['PeakStreamUtilization'] == 180.0
+
+  def test_plan_without_datapoints(self):
+    plan = CapacityPlanner(self.shards, {}, 60).plan()
+    assert plan['Splits'] == []
+    assert len(plan['Merges']) == 2
+    assert plan['RecommendedShardCount'] == 1
+    assert plan['ProjectedShardCount'] == 2
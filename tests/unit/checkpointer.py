@@ -0,0 +1,36 @@
+import json
+import os
+import shutil
+import tempfile
+
+from kinesis_awscli_plugin.lib.checkpointer import Checkpointer
+
+class TestCheckpointer:
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'checkpoints.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_checkpoints_are_batched(self):
+    checkpointer = Checkpointer(self.path, flush_interval=60)
+    checkpointer.checkpoint('shard1', '100')
+    checkpointer.checkpoint('shard1', '101')
+    # flush interval not reached yet, nothing written
+    assert not os.path.exists(self.path)
+    assert checkpointer.get('shard1') == '101'
+    checkpointer.flush()
+    assert json.load(open(self.path)) == {'shard1': '101'}
+
+  def test_checkpoints_are_resumed(self):
+    checkpointer = Checkpointer(self.path, flush_interval=0)
+    checkpointer.checkpoint('shard1', '100')
+    checkpointer.checkpoint('shard2', '200')
+    resumed = Checkpointer(self.path)
+    assert resumed.get('shard1') == '100'
+    assert resumed.get('shard2') == '200'
+    assert resumed.get('shard3') is None
+    # no temporary files are left behind
+    assert os.listdir(self.directory) == ['checkpoints.json']
@@ -0,0 +1,198 @@
+import datetime
+import os
+import shutil
+import tempfile
+import time
+from dateutil.tz import tzutc
+from mock import MagicMock
+from kinesis_awscli_plugin.lib.cloudwatchhelper import CloudWatchHelper
+from kinesis_awscli_plugin.lib.datapointcache import DatapointCache
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+
+class TestCloudWatchHelper:
+  def setUp(self):
+    self.helper = CloudWatchHelper(MagicMock(), MagicMock())
+
+  def query(self, shard_id):
+    return {
+      'Namespace': 'AWS/Kinesis',
+      'MetricName': 'IncomingBytes',
+      'Statistic': 'Sum',
+      'Period': 60,
+      'Dimensions': self.helper.get_shard_dimensions('test', shard_id),
+    }
+
+  def fake_get_metric_data(self, **request):
+    return {
+      'MetricDataResults': [
+        {'Id': query['Id'],
+         'Timestamps': ['2016-10-20T11:17:00Z', '2016-10-20T11:18:00Z'],
+         'Values': [1.0, 2.0]}
+        for query in request['MetricDataQueries']
+      ]
+    }
+
+  def test_get_metric_data_batches_queries(self):
+    self.helper.client.get_metric_data.side_effect = self.fake_get_metric_data
+    queries = [self.query('shard-%d' % i) for i in range(1200)]
+    datapoints = self.helper.get_metric_data(queries, 'start', 'end')
+    # the requests run concurrently and may be sent in any order
+    calls = sorted(self.helper.client.get_metric_data.call_args_list,
+                   key=lambda c: int(c[1]['MetricDataQueries'][0]['Id'][1:]))
+    assert [len(c[1]['MetricDataQueries']) for c in calls] == [500, 500, 200]
+    assert len(datapoints) == 1200
+    assert datapoints[1199] == [
+      {'Timestamp': datetime.datetime(2016, 10, 20, 11, 17, tzinfo=tzutc()),
+       'Sum': 1.0, 'Unit': 'Bytes'},
+      {'Timestamp': datetime.datetime(2016, 10, 20, 11, 18, tzinfo=tzutc()),
+       'Sum': 2.0, 'Unit': 'Bytes'},
+    ]
+    metric_stat = calls[2][1]['MetricDataQueries'][0]['MetricStat']
+    assert calls[2][1]['MetricDataQueries'][0]['Id'] == 'm1000'
+    assert metric_stat['Metric']['Dimensions'][1]['Value'] == 'shard-1000'
+    assert metric_stat['Stat'] == 'Sum'
+
+  def test_get_metric_data_follows_next_token(self):
+    self.helper.client.get_metric_data.side_effect = [
+      {
+        'MetricDataResults': [
+          {'Id': 'm0', 'Timestamps': ['2016-10-20T11:17:00Z'], 'Values': [1.0]},
+          {'Id': 'm1', 'Timestamps': [], 'Values': []},
+        ],
+        'NextToken': 'token'
+      },
+      {
+        'MetricDataResults': [
+          {'Id': 'm0', 'Timestamps': ['2016-10-20T11:18:00Z'], 'Values': [2.0]},
+        ]
+      },
+    ]
+    datapoints = self.helper.get_metric_data(
+      [self.query('a'), self.query('b')], 'start', 'end')
+    calls = self.helper.client.get_metric_data.call_args_list
+    assert len(calls) == 2
+    assert calls[1][1]['NextToken'] == 'token'
+    assert [d['Sum'] for d in datapoints[0]] == [1.0, 2.0]
+    assert datapoints[1] == []
+
+  def test_get_metric_data_fetches_missing_ranges_only(self):
+    directory = tempfile.mkdtemp()
+    try:
+      cache = DatapointCache(os.path.join(directory, 'cache.db'))
+      self.helper.cache = cache
+      now = time.time() // 60 * 60
+      start = TimeUtils.from_epoch(now - 3600)
+      end = TimeUtils.from_epoch(now)
+      def fake_get_metric_data(**request):
+        range_start = TimeUtils.to_epoch(request['StartTime'])
+        range_end = TimeUtils.to_epoch(request['EndTime'])
+        timestamps = [t for t in range(int(range_start), int(range_end), 60)]
+        return {
+          'MetricDataResults': [
+            {
+              'Id': query['Id'],
+              'Timestamps': [TimeUtils.from_epoch(t) for t in timestamps],
+              'Values': [1.0] * len(timestamps)
+            }
+            for query in request['MetricDataQueries']
+          ]
+        }
+      self.helper.client.get_metric_data.side_effect = fake_get_metric_data
+      queries = [self.query('a'), self.query('b')]
+      first = self.helper.get_metric_data(queries, start, end)
+      second = self.helper.get_metric_data(queries, start, end)
+      assert len(first[0]) == 60
+      assert [d['Sum'] for d in second[1]] == [d['Sum'] for d in first[1]]
+      assert [TimeUtils.to_epoch(d['Timestamp']) for d in second[0]] == \
+        [TimeUtils.to_epoch(d['Timestamp']) for d in first[0]]
+      # the second call only fetches the unsettled minutes of both shards
+      calls = self.helper.client.get_metric_data.call_args_list
+      assert len(calls) == 2
+      assert len(calls[1][1]['MetricDataQueries']) == 2
+      assert TimeUtils.to_epoch(calls[1][1]['StartTime']) == \
+        cache.settled_until(60, time.time())
+      cache.close()
+    finally:
+      shutil.rmtree(directory)
+
+  def test_cached_cli_timestamps(self):
+    # the AWS CLI returns the timestamps of CloudWatch as ISO8601 strings
+    directory = tempfile.mkdtemp()
+    try:
+      self.helper.cache = DatapointCache(os.path.join(directory, 'cache.db'))
+      now = time.time() // 60 * 60
+      start = TimeUtils.from_epoch(now - 3600)
+      end = TimeUtils.from_epoch(now)
+      def fake_get_metric_data(**request):
+        range_start = int(TimeUtils.to_epoch(request['StartTime']))
+        range_end = int(TimeUtils.to_epoch(request['EndTime']))
+        timestamps = [TimeUtils.iso8601(TimeUtils.from_epoch(t)) + 'Z'
+                      for t in range(range_start, range_end, 60)]
+        return {
+          'MetricDataResults': [
+            {'Id': query['Id'], 'Timestamps': timestamps,
+             'Values': [1.0] * len(timestamps)}
+            for query in request['MetricDataQueries']
+          ]
+        }
+      self.helper.client.get_metric_data.side_effect = fake_get_metric_data
+      first = self.helper.get_metric_data([self.query('a')], start, end)
+      second = self.helper.get_metric_data([self.query('a')], start, end)
+      expected = [TimeUtils.from_epoch(t).replace(tzinfo=tzutc())
+                  for t in range(int(now) - 3600, int(now), 60)]
+      # cached and fetched datapoints have the same timestamps
+      assert [d['Timestamp'] for d in first[0]] == expected
+      assert [d['Timestamp'] for d in second[0]] == expected
+      self.helper.cache.close()
+    finally:
+      shutil.rmtree(directory)
+
+  def test_long_ranges_are_split_into_windows(self):
+    self.helper.client.get_metric_data.side_effect = self.fake_window_metric_data
+    start = datetime.datetime(2016, 10, 1)
+    end = start + datetime.timedelta(days=7)
+    queries = [self.query('shard-%d' % i) for i in range(100)]
+    datapoints = self.helper.get_metric_data(queries, start, end)
+    calls = self.helper.client.get_metric_data.call_args_list
+    # 100 queries of 10080 minutes are 1008000 datapoints, 10 windows
+    assert len(calls) == 10
+    # every minute once, plus the end of the range
+    assert len(datapoints[0]) == 7 * 24 * 60 + 1
+    timestamps = [d['Timestamp'] for d in datapoints[99]]
+    assert timestamps == sorted(set(timestamps))
+
+  def fake_window_metric_data(self, **request):
+    start = int(TimeUtils.to_epoch(request['StartTime']))
+    end = int(TimeUtils.to_epoch(request['EndTime']))
+    # the end of the window is included, like the start of the next one
+    timestamps = [TimeUtils.from_epoch(t) for t in range(start, end + 1, 60)]
+    return {
+      'MetricDataResults': [
+        {'Id': query['Id'], 'Timestamps': timestamps, 'Values': [1.0] * len(timestamps)}
+        for query in request['MetricDataQueries']
+      ]
+    }
+
+  def test_split_time_range(self):
+    start = datetime.datetime(2016, 10, 1, 0, 0, 30)
+    end = start + datetime.timedelta(days=1)
+    windows = self.helper.split_time_range([self.query('a')] * 500, start, end)
+    # 201 datapoints per query and window
+    assert windows[0][0] == start
+    assert windows[1][0] == datetime.datetime(2016, 10, 1, 3, 21)
+    assert windows[-1][1] == end
+    for previous, window in zip(windows, windows[1:]):
+      assert previous[1] == window[0]
+    assert self.helper.split_time_range([self.query('a')], start, end) == [(start, end)]
+
+  def test_choose_period(self):
+    now = datetime.datetime(2016, 10, 30)
+    start = now - datetime.timedelta(days=7)
+    assert CloudWatchHelper.choose_period(start, now, now=now) == 60
+    assert CloudWatchHelper.choose_period(start, now, period=90, now=now) == 120
+    assert CloudWatchHelper.choose_period(start, now, max_points=168, now=now) == 3600
+    old = now - datetime.timedelta(days=20)
+    assert CloudWatchHelper.choose_period(old, now, now=now) == 300
+    older = now - datetime.timedelta(days=100)
+    assert CloudWatchHelper.choose_period(older, now, now=now) == 3600
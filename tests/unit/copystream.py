@@ -0,0 +1,68 @@
+import argparse
+
+from mock import MagicMock
+from kinesis_awscli_plugin.copystream import CopyCommand
+
+
+class FakeSource:
+  '''
+  A stream whose parent shard was split into two children. Shard
+  iterators are "<shard id>:<record index>".
+  '''
+  def __init__(self):
+    self.records = {
+      'parent': ['p%d' % i for i in range(0, 6)],
+      'child1': ['c1-%d' % i for i in range(0, 3)],
+      'child2': ['c2-%d' % i for i in range(0, 3)],
+    }
+    self.iterators = []
+
+  def describe_stream(self, StreamName, ExclusiveStartShardId=None):
+    return {'StreamDescription': {'HasMoreShards': False, 'Shards': [
+      {'ShardId': 'parent'},
+      {'ShardId': 'child1', 'ParentShardId': 'parent'},
+      {'ShardId': 'child2', 'ParentShardId': 'parent'},
+    ]}}
+
+  def get_shard_iterator(self, StreamName, ShardId, ShardIteratorType, **kwargs):
+    self.iterators.append(ShardId)
+    return {'ShardIterator': '%s:0' % ShardId}
+
+  def get_records(self, ShardIterator):
+    shard_id, index = ShardIterator.split(':')
+    keys = self.records[shard_id][int(index):int(index) + 2]
+    next_index = int(index) + len(keys)
+    next_iterator = '%s:%d' % (shard_id, next_index)
+    if shard_id == 'parent' and next_index == len(self.records[shard_id]):
+      # the parent was closed, the children stay open
+      next_iterator = None
+    return {'Records': [{'SequenceNumber': str(next_index), 'PartitionKey': key,
+                         'ApproximateArrivalTimestamp': 1476962220.5,
+                         # base64 text like in responses of the AWS CLI
+                         'Data': u'eA=='} for key in keys],
+            'NextShardIterator': next_iterator,
+            'MillisBehindLatest': 0}
+
+
+class TestCopyCommand:
+  def setUp(self):
+    self.source = FakeSource()
+    self.target = MagicMock()
+    self.target.put_records.side_effect = lambda StreamName, Records: {
+      'FailedRecordCount': 0, 'Records': [{'SequenceNumber': '1'} for _ in Records]}
+    self.session = MagicMock()
+    self.session.create_client.side_effect = [self.source, self.target]
+
+  def test_children_are_copied_after_their_parent(self):
+    args = argparse.Namespace(
+      source_stream='Source', target_stream='Target', target_region=None,
+      shard_id=None, start='trim-horizon', timestamp=None,
+      checkpoint_file=None, pull_delay=10, duration=2,
+      max_records_per_second=10000, max_bytes_per_second=1024 * 1024)
+    CopyCommand(self.session)._run_main(args, MagicMock())
+    keys = [record['PartitionKey']
+            for call in self.target.put_records.call_args_list
+            for record in call[1]['Records']]
+    assert keys[:6] == self.source.records['parent']
+    assert sorted(keys[6:]) == sorted(self.source.records['child1'] + self.source.records['child2'])
+    assert self.source.iterators[0] == 'parent'
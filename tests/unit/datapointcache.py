@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+from kinesis_awscli_plugin.lib.datapointcache import DatapointCache
+
+
+class TestDatapointCache:
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache = DatapointCache(os.path.join(self.directory, 'cache.db'))
+    self.query = {
+      'MetricName': 'IncomingBytes',
+      'Statistic': 'Sum',
+      'Period': 60,
+      'Dimensions': [
+        {'Name': 'StreamName', 'Value': 'test'},
+        {'Name': 'ShardId', 'Value': 'shard-1'},
+      ],
+    }
+
+  def tearDown(self):
+    self.cache.close()
+    shutil.rmtree(self.directory)
+
+  def test_empty_cache_misses_everything(self):
+    assert self.cache.missing_ranges(self.query, 0, 600, 480) == [(0, 600)]
+
+  def test_covered_ranges_are_not_fetched(self):
+    self.cache.store(self.query, 60, 180, [(60, 1.0), (120, 2.0)])
+    self.cache.store(self.query, 300, 420, [])
+    assert self.cache.missing_ranges(self.query, 0, 600, 480) == \
+      [(0, 60), (180, 300), (420, 600)]
+    assert self.cache.get(self.query, 0, 600) == [(60, 1.0), (120, 2.0)]
+
+  def test_unsettled_range_is_always_missing(self):
+    self.cache.store(self.query, 0, 600, [])
+    assert self.cache.missing_ranges(self.query, 0, 600, 480) == []
+    assert self.cache.missing_ranges(self.query, 0, 900, 480) == [(600, 900)]
+
+  def test_adjacent_ranges_are_merged(self):
+    self.cache.store(self.query, 0, 60, [(0, 1.0)])
+    self.cache.store(self.query, 60, 120, [(60, 2.0)])
+    assert self.cache.missing_ranges(self.query, 0, 120, 120) == []
+    count = self.cache._connection.execute(
+      'SELECT COUNT(*) FROM coverage').fetchone()[0]
+    assert count == 1
+
+  def test_series_are_separate(self):
+    self.cache.store(self.query, 0, 120, [(0, 1.0), (60, 2.0)])
+    other = dict(self.query, Statistic='Average')
+    assert self.cache.missing_ranges(other, 0, 120, 120) == [(0, 120)]
+    assert self.cache.get(other, 0, 120) == []
+
+  def test_settled_until(self):
+    self.cache.settle_time = 300
+    assert self.cache.settled_until(60, 1000) == 660
+
+  def test_evict_expired(self):
+    self.cache.store(self.query, 0, 120, [(0, 1.0), (60, 2.0)])
+    self.cache.ttl = -1
+    self.cache.evict()
+    assert self.cache.get(self.query, 0, 120) == []
+    assert self.cache.missing_ranges(self.query, 0, 120, 120) == [(0, 120)]
+
+  def test_merged_ranges_expire_with_their_oldest_part(self):
+    self.cache.store(self.query, 0, 60, [(0, 1.0)])
+    time.sleep(0.1)
+    self.cache.store(self.query, 60, 120, [(60, 2.0)])
+    self.cache.ttl = 0.05
+    self.cache.evict()
+    assert self.cache.get(self.query, 0, 120) == []
+    assert self.cache.missing_ranges(self.query, 0, 120, 120) == [(0, 120)]
+
+  def test_evict_least_recently_fetched_when_full(self):
+    self.cache.store(self.query, 0, 120, [(0, 1.0), (60, 2.0)])
+    time.sleep(0.01)
+    self.cache.store(self.query, 600, 720, [(600, 3.0), (660, 4.0)])
+    self.cache.max_datapoints = 3
+    self.cache.evict()
+    assert self.cache.get(self.query, 0, 720) == [(600, 3.0), (660, 4.0)]
@@ -0,0 +1,65 @@
+import argparse
+import gzip
+import os
+import shutil
+import tempfile
+
+import dateutil.parser
+from mock import MagicMock, patch
+from kinesis_awscli_plugin.export import ExportCommand
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+
+
+class TestExportCommand:
+  def setUp(self):
+    self.sink_dir = tempfile.mkdtemp()
+    self.session = MagicMock()
+    self.client = self.session.create_client.return_value
+    self.client.describe_stream.return_value = {
+      'StreamDescription': {'Shards': [{'ShardId': 'shardId-000000000000'}],
+                            'HasMoreShards': False}}
+    self.client.get_shard_iterator.return_value = {'ShardIterator': 'iterator'}
+    # records of the AWS CLI, one every 20 minutes from 09:00 UTC
+    start = 1476090000
+    records = [{'SequenceNumber': str(i), 'PartitionKey': 'key',
+                'ApproximateArrivalTimestamp': start + 1200 * i,
+                'Data': u'cmVjb3Jk'} for i in range(0, 6)]
+    self.client.get_records.side_effect = [
+      {'Records': records[0:3], 'NextShardIterator': 'second', 'MillisBehindLatest': 0},
+      {'Records': records[3:6], 'NextShardIterator': 'third', 'MillisBehindLatest': 0},
+    ]
+
+  def tearDown(self):
+    shutil.rmtree(self.sink_dir)
+
+  def args(self, **kwargs):
+    args = dict(stream_name='Test', start_time=None, end_time=None,
+                shard_id=None, pull_delay=0, output_format='raw',
+                sink_dir=self.sink_dir, segments=1, spool_dir=None)
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+  def exported(self):
+    directory = os.path.join(self.sink_dir, 'shardId-000000000000')
+    records = b''
+    for name in sorted(os.listdir(directory)):
+      with gzip.open(os.path.join(directory, name)) as shard_file:
+        records += shard_file.read()
+    return records
+
+  def test_utc_example(self):
+    # Example 1, dateparser returns offset-aware times for "Z"
+    with patch.object(TimeUtils, 'to_datetime', MagicMock(side_effect=dateutil.parser.parse)):
+      ExportCommand(self.session)._run_main(
+        self.args(start_time='2016-10-10T09:00:00Z', end_time='2016-10-10T10:00:00Z'),
+        MagicMock())
+    assert self.client.get_shard_iterator.call_args[1]['Timestamp'].tzinfo is None
+    # 09:00 to 10:00 inclusive
+    assert self.exported() == b'record\n' * 4
+
+  def test_start_time_only(self):
+    with patch.object(TimeUtils, 'to_datetime', MagicMock(side_effect=dateutil.parser.parse)):
+      args = ExportCommand(self.session).collect_args(
+        self.args(start_time='2016-10-10T11:00:00+02:00'))
+    ExportCommand(self.session).validate_args(args)
+    assert args.start_time == TimeUtils.parse_timestamp('2016-10-10T09:00:00Z')
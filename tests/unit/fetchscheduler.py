@@ -0,0 +1,54 @@
+import time
+from botocore.exceptions import ClientError
+from mock import MagicMock
+from kinesis_awscli_plugin.lib.fetchscheduler import FetchScheduler
+
+
+def client_error(code):
+  return ClientError({'Error': {'Code': code, 'Message': code}}, 'GetMetricData')
+
+
+class TestFetchScheduler:
+  def setUp(self):
+    self.scheduler = FetchScheduler(max_workers=4, max_retries=3)
+    self.scheduler.INITIAL_RETRY_DELAY = 0.001
+
+  def test_map_keeps_order(self):
+    def slow_square(item):
+      # later items finish first
+      time.sleep(0.001 * (20 - item))
+      return item * item
+    results = self.scheduler.map(slow_square, range(20))
+    assert results == [item * item for item in range(20)]
+
+  def test_map_acquires_limiter_per_request(self):
+    limiter = MagicMock()
+    self.scheduler.map(lambda item: item, range(5), limiter)
+    assert limiter.acquire.call_count == 5
+
+  def test_throttled_requests_are_retried(self):
+    function = MagicMock(side_effect=[client_error('Throttling'),
+                                      client_error('Throttling'), 'result'])
+    assert self.scheduler.call(function, 'item') == 'result'
+    assert function.call_count == 3
+    assert self.scheduler.requests_retried == 2
+
+  def test_retries_are_limited(self):
+    function = MagicMock(side_effect=client_error('Throttling'))
+    try:
+      self.scheduler.call(function, 'item')
+      assert False
+    except ClientError:
+      pass
+    assert function.call_count == 4
+
+  def test_other_errors_are_raised(self):
+    def fail(item):
+      if item == 3:
+        raise client_error('InvalidParameterValue')
+      return item
+    try:
+      self.scheduler.map(fail, range(10))
+      assert False
+    except ClientError as e:
+      assert e.response['Error']['Code'] == 'InvalidParameterValue'
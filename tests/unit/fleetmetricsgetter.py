@@ -0,0 +1,75 @@
+from botocore.exceptions import ClientError
+from mock import MagicMock
+from kinesis_awscli_plugin.lib.fleetmetricsgetter import FleetMetricsGetter
+
+
+class TestFleetMetricsGetter:
+  def setUp(self):
+    self.shard_counts = {'orders': 2, 'clicks': 10, 'logs': 1}
+
+  def mock_region(self, region, stream_names):
+    kinesis_helper = MagicMock()
+    kinesis_helper.list_streams = MagicMock(return_value=stream_names)
+    def stream_summary(stream_name):
+      if stream_name not in self.shard_counts:
+        raise ClientError({'Error': {'Code': 'ResourceNotFoundException'}},
+                          'DescribeStreamSummary')
+      return {'StreamName': stream_name,
+              'OpenShardCount': self.shard_counts[stream_name]}
+    kinesis_helper.stream_summary = MagicMock(side_effect=stream_summary)
+    cloudwatch_helper = MagicMock()
+    cloudwatch_helper.get_stream_dimensions = lambda stream_name: [
+      {'Name': 'StreamName', 'Value': stream_name}]
+    cloudwatch_helper.get_metric_data = MagicMock(side_effect=self.fake_get_metric_data)
+    return (region, kinesis_helper, cloudwatch_helper)
+
+  def fake_get_metric_data(self, queries, start_time, end_time):
+    datapoints = []
+    for query in queries:
+      stream_name = query['Dimensions'][0]['Value']
+      # orders writes 90 MB per minute into 2 shards, the others 6 MB
+      value = 90 * 1024 * 1024 if stream_name == 'orders' else 6 * 1024 * 1024
+      if query['MetricName'] == 'IncomingRecords':
+        value = 1000
+      if query['MetricName'] == 'WriteProvisionedThroughputExceeded':
+        value = {'orders': 5, 'clicks': 0, 'logs': 1}[stream_name]
+      datapoints.append([
+        {'Timestamp': minute, query['Statistic']: value, 'Unit': 'Count'}
+        for minute in ('t1', 't2')
+      ])
+    return datapoints
+
+  def mock_getter(self):
+    return FleetMetricsGetter(
+      [self.mock_region('us-east-1', ['orders', 'gone', 'logs']),
+       self.mock_region('eu-west-1', ['clicks'])],
+      'start', 'end',
+      ['WriteProvisionedThroughputExceeded', 'IncomingBytes'])
+
+  def test_get_ranks_streams_of_all_regions(self):
+    streams = self.mock_getter().get()
+    assert [s['StreamName'] for s in streams] == ['orders', 'logs', 'clicks']
+    assert streams[0]['Region'] == 'us-east-1'
+    assert streams[2]['Region'] == 'eu-west-1'
+    assert streams[0]['OpenShardCount'] == 2
+    # 90 MB per minute into 2 shards is 75% of 1 MB/s per shard
+    assert streams[0]['Utilization'] == 75.0
+    assert streams[0]['WriteProvisionedThroughputExceeded'] == 10.0
+
+  def test_get_sorts_by_metric(self):
+    streams = self.mock_getter().get('WriteProvisionedThroughputExceeded')
+    assert [s['WriteProvisionedThroughputExceeded'] for s in streams] == [10.0, 2.0, 0.0]
+
+  def test_one_request_per_region(self):
+    getter = self.mock_getter()
+    getter.get()
+    cloudwatch_helper = getter.regions[0][2]
+    assert cloudwatch_helper.get_metric_data.call_count == 1
+    # 2 streams with 2 metrics plus bytes and records for the utilization
+    assert len(cloudwatch_helper.get_metric_data.call_args[0][0]) == 8
+
+  def test_aggregate(self):
+    datapoints = [{'Average': 1}, {'Average': 3}]
+    assert FleetMetricsGetter.aggregate(datapoints, 'Average') == 2.0
+    assert FleetMetricsGetter.aggregate([], 'Sum') == 0.0
+    assert FleetMetricsGetter.aggregate([{'Maximum': 1}, {'Maximum': 4}], 'Maximum') == 4.0
@@ -0,0 +1,34 @@
+from kinesis_awscli_plugin.lib.hashkeyindex import HashKeyIndex
+
+MAX_HASH_KEY = 2 ** 128 - 1
+
+def shard(shard_id, start, end):
+  return {'ShardId': shard_id, 'HashKeyRange': {'StartingHashKey': str(start), 'EndingHashKey': str(end)}}
+
+class TestHashKeyIndex:
+
+  def setUp(self):
+    half = MAX_HASH_KEY // 2
+    self.index = HashKeyIndex([
+      # the closed parent overlaps both children
+      shard('parent', 0, MAX_HASH_KEY),
+      shard('low', 0, half),
+      shard('high', half + 1, MAX_HASH_KEY),
+    ])
+    self.half = half
+
+  def test_hash_key(self):
+    # MD5 of "a" is 0cc175b9c0f1b6a831c399e269772661
+    assert HashKeyIndex.hash_key('a') == 0x0cc175b9c0f1b6a831c399e269772661
+
+  def test_lookup(self):
+    assert self.index.shards_for_hash_key(0) == ['parent', 'low']
+    assert self.index.shards_for_hash_key(self.half) == ['parent', 'low']
+    assert self.index.shards_for_hash_key(self.half + 1) == ['parent', 'high']
+    assert self.index.shards_for_hash_key(MAX_HASH_KEY) == ['parent', 'high']
+    assert self.index.shards_for_key('a') == ['parent', 'low']
+
+  def test_keys_map_to_shards_once(self):
+    index = HashKeyIndex([shard('shard%d' % i, i * 2 ** 124, (i + 1) * 2 ** 124 - 1) for i in range(0, 16)])
+    # the first hex digit of the hash selects the shard
+    assert index.shards_for_keys(['a', 'a', 'b']) == ['shard0', 'shard9']
@@ -0,0 +1,73 @@
+import json
+import random
+import six
+
+from kinesis_awscli_plugin.lib.countminsketch import CountMinSketch
+from kinesis_awscli_plugin.lib.keystatsreporter import KeyStatsReporter
+from kinesis_awscli_plugin.lib.keystatstracker import KeyStatsTracker
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from kinesis_awscli_plugin.lib.spacesaving import SpaceSaving
+from threading import Event
+
+class TestCountMinSketch:
+
+  def test_estimates_are_never_too_low(self):
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {}
+    for i in range(0, 2000):
+      key = 'key%d' % random.randint(0, 500)
+      counts[key] = counts.get(key, 0) + 1
+      sketch.add(key)
+    assert sketch.total == 2000
+    for key, count in counts.items():
+      assert sketch.estimate(key) >= count
+
+class TestSpaceSaving:
+
+  def test_heavy_hitters_are_kept(self):
+    summary = SpaceSaving(capacity=10)
+    counts = {}
+    for i in range(0, 5000):
+      key = 'heavy%d' % (i % 3) if i % 2 == 0 else 'light%d' % i
+      counts[key] = counts.get(key, 0) + 1
+      summary.add(key, 1, 'shard%d' % (i % 3))
+    top = summary.top(3)
+    assert sorted(key for key, count, error, label in top) == ['heavy0', 'heavy1', 'heavy2']
+    assert len(summary.keys()) == 10
+    for key, count, error, label in top:
+      assert count - error <= counts[key] <= count
+
+  def test_weights(self):
+    summary = SpaceSaving(capacity=2)
+    summary.add('a', 100)
+    summary.add('b', 1)
+    summary.add('c', 5)
+    # c replaced b and inherited its count as error
+    assert summary.top(2) == [('a', 100, 0, None), ('c', 6, 1, None)]
+
+class TestKeyStatsTracker:
+
+  def batch(self, keys, shard_id='shard1', size=10):
+    return RecordBatch([{'SequenceNumber': str(i), 'PartitionKey': key, 'Data': b'x' * size} for i, key in enumerate(keys)], shard_id)
+
+  def test_snapshot(self):
+    tracker = KeyStatsTracker(window=60, top=2)
+    tracker.record(self.batch(['hot'] * 50 + ['key%d' % i for i in range(0, 500)]))
+    tracker.record(self.batch(['big'] * 5, 'shard2', size=10000))
+    snapshot = tracker.snapshot()
+    by_records = [key for key in snapshot if key['Metric'] == 'Records']
+    by_bytes = [key for key in snapshot if key['Metric'] == 'Bytes']
+    assert len(by_records) == 2
+    assert by_records[0]['PartitionKey'] == 'hot'
+    assert by_records[0]['ShardId'] == 'shard1'
+    assert by_bytes[0]['PartitionKey'] == 'big'
+    assert by_bytes[0]['ShardId'] == 'shard2'
+    assert by_bytes[0]['Share'] > 80
+
+  def test_report(self):
+    tracker = KeyStatsTracker(top=1)
+    tracker.record(self.batch(['hot', 'hot', 'cold']))
+    output = six.StringIO()
+    KeyStatsReporter(Event(), tracker, 1, output, 'jsonl').report()
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line['PartitionKey'] for line in lines] == ['hot', 'hot']
@@ -25,3 +25,12 @@ class TestKinesisHelper:
 
 
 
+
+  def test_list_streams(self):
+     k = KinesisHelper(MagicMock(), MagicMock())
+     k.client.list_streams.side_effect = [
+       {'StreamNames': ['a', 'b'], 'HasMoreStreams': True},
+       {'StreamNames': ['c'], 'HasMoreStreams': False},
+     ]
+     assert k.list_streams() == ['a', 'b', 'c']
+     assert k.client.list_streams.call_args[1] == {'ExclusiveStartStreamName': 'b'}
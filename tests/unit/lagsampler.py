@@ -0,0 +1,58 @@
+import json
+import os
+import shutil
+import tempfile
+
+from botocore.exceptions import ClientError
+from kinesis_awscli_plugin.lib.lagsampler import LagSampler
+from kinesis_awscli_plugin.lib.lagtracker import LagTracker
+from mock import MagicMock
+from threading import Event
+
+class TestLagSampler:
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.checkpoint_path = os.path.join(self.directory, 'checkpoints.json')
+    self.kinesis_helper = MagicMock()
+    self.kinesis_helper.get_shard_iterator = MagicMock(side_effect=lambda stream_name, shard_id, iterator_type, sequence_number=None: '%s:%s' % (shard_id, sequence_number))
+    self.kinesis_helper.client.get_records = MagicMock(return_value={
+      'Records': [{'SequenceNumber': '11', 'Data': u'eA==', 'ApproximateArrivalTimestamp': 1476962220.5}],
+      'NextShardIterator': 'next',
+      'MillisBehindLatest': 4000})
+    self.lag_tracker = LagTracker()
+    self.sampler = LagSampler(Event(), self.kinesis_helper, 'test', ['shard1', 'shard2'], self.checkpoint_path, self.lag_tracker, 5)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def write_checkpoints(self, checkpoints):
+    with open(self.checkpoint_path, 'w') as checkpoint_file:
+      json.dump(checkpoints, checkpoint_file)
+
+  def test_samples_after_checkpoints(self):
+    self.write_checkpoints({'shard1': '10'})
+    self.sampler.sample()
+    # a single record after the checkpoint, nothing is consumed
+    self.kinesis_helper.client.get_records.assert_any_call(ShardIterator='shard1:10', Limit=1)
+    # shard2 has no checkpoint and is sampled at the default position
+    self.kinesis_helper.get_shard_iterator.assert_any_call('test', 'shard2', 'LATEST')
+    snapshot = self.lag_tracker.snapshot()
+    assert [shard['MillisBehindLatest'] for shard in snapshot] == [4000, 4000]
+    # the records of the consumer are not counted
+    assert snapshot[0]['RecordsPerSecond'] is None
+    assert snapshot[0]['BytesPerSecond'] is None
+
+  def test_checkpoint_file_is_read_every_sample(self):
+    self.write_checkpoints({'shard1': '10'})
+    self.sampler.sample()
+    self.write_checkpoints({'shard1': '20'})
+    self.sampler.sample()
+    self.kinesis_helper.client.get_records.assert_called_with(ShardIterator='shard2:None', Limit=1)
+    self.kinesis_helper.client.get_records.assert_any_call(ShardIterator='shard1:20', Limit=1)
+
+  def test_throttled_samples_are_skipped(self):
+    self.kinesis_helper.client.get_records = MagicMock(side_effect=ClientError(
+      {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'slow down'}}, 'GetRecords'))
+    self.sampler.sample()
+    assert self.lag_tracker.snapshot() == []
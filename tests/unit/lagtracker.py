@@ -0,0 +1,30 @@
+import time
+
+from kinesis_awscli_plugin.lib.lagtracker import LagTracker
+
+class TestLagTracker:
+
+  def test_snapshot(self):
+    tracker = LagTracker()
+    tracker.record('shard1', 0, 1, 2)
+    tracker.record('shard2', 5000, 2, 8)
+    tracker.record('shard2', 3000, 0, 0)
+    time.sleep(0.1)
+    snapshot = tracker.snapshot()
+    # the shard that is the furthest behind comes first
+    assert [shard['ShardId'] for shard in snapshot] == ['shard2', 'shard1']
+    assert snapshot[0]['MillisBehindLatest'] == 3000
+    assert 0 < snapshot[0]['RecordsPerSecond'] <= 20
+    assert abs(snapshot[0]['BytesPerSecond'] - snapshot[0]['RecordsPerSecond'] * 4) < 0.1
+    # counters are reset, the lag is kept
+    snapshot = tracker.snapshot()
+    assert snapshot[0]['RecordsPerSecond'] == 0
+    assert snapshot[0]['MillisBehindLatest'] == 3000
+
+  def test_sampled_shards_have_no_rates(self):
+    tracker = LagTracker()
+    tracker.record('shard1', 2000, None, None)
+    snapshot = tracker.snapshot()
+    assert snapshot[0]['MillisBehindLatest'] == 2000
+    assert snapshot[0]['RecordsPerSecond'] is None
+    assert snapshot[0]['BytesPerSecond'] is None
@@ -0,0 +1,199 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from kinesis_awscli_plugin.lib.leasecoordinator import LeaseCoordinator
+from kinesis_awscli_plugin.lib.leasestore import LeaseStore
+from mock import MagicMock
+from threading import Event, Thread, Timer
+
+class FakeReader(Thread):
+
+  def __init__(self, stop_flag, finished=False, last_sequence_number=None):
+    super(FakeReader, self).__init__()
+    self.daemon = True
+    self.stop_flag = stop_flag
+    self.finished = finished
+    self.last_sequence_number = last_sequence_number
+
+  def run(self):
+    if not self.finished:
+      self.stop_flag.wait()
+
+class RenderingReader(Thread):
+  '''
+  Reads a shard to its end at once. Its last record is checkpointed a
+  little later, like a renderer does once it wrote it.
+  '''
+  def __init__(self, stop_flag, shard_id, lease_store, events):
+    super(RenderingReader, self).__init__()
+    self.stop_flag = stop_flag
+    self.shard_id = shard_id
+    self.lease_store = lease_store
+    self.events = events
+    self.finished = True
+    self.last_sequence_number = 'end-' + shard_id
+
+  def run(self):
+    self.events.put(('read', self.shard_id, self.lease_store.worker_id, time.time()))
+    Timer(0.3, self.render).start()
+
+  def render(self):
+    started = time.time()
+    self.lease_store.checkpoint(self.shard_id, self.last_sequence_number)
+    # the checkpoint of a stolen lease is not written
+    if self.lease_store.get(self.shard_id) == self.last_sequence_number:
+      self.events.put(('checkpoint', self.shard_id, self.lease_store.worker_id, started))
+
+def run_worker(path, worker_id, shards, events):
+  lease_store = LeaseStore(path, 'group1', 5, worker_id)
+  stop_flag = Event()
+  coordinator = LeaseCoordinator(
+    stop_flag, lease_store, lambda: shards,
+    lambda reader_stop_flag, shard_id: RenderingReader(reader_stop_flag, shard_id, lease_store, events),
+    0.05, refresh_interval=0.1)
+  coordinator.start()
+  deadline = time.time() + 15
+  while len(lease_store.finished_shards()) < len(shards) and time.time() < deadline:
+    time.sleep(0.05)
+  stop_flag.set()
+  coordinator.join()
+  lease_store.release_all()
+
+
+class TestLeaseCoordinator:
+
+  def setUp(self):
+    self.stop_flag = Event()
+    self.lease_store = MagicMock()
+    self.readers = {}
+    self.shards = [{'ShardId': 'shard0'}, {'ShardId': 'shard1'}]
+    self.coordinator = LeaseCoordinator(self.stop_flag, self.lease_store, lambda: self.shards, self.create_reader, 0.1)
+
+  def create_reader(self, stop_flag, shard_id):
+    reader = FakeReader(stop_flag, finished=(shard_id in ('shard0', 'shard9')), last_sequence_number='5')
+    self.readers[shard_id] = reader
+    return reader
+
+  def test_readers_follow_leases(self):
+    self.coordinator.assign(['shard2', 'shard1'])
+    assert sorted(self.coordinator.readers.keys()) == ['shard1', 'shard2']
+    self.coordinator.assign(['shard1'])
+    assert list(self.coordinator.readers.keys()) == ['shard1']
+    assert not self.readers['shard2'].is_alive()
+    self.stop_flag.set()
+    self.coordinator.stop_reader('shard1')
+
+  def test_finished_and_dead_readers_are_reaped(self):
+    self.coordinator.assign(['shard9', 'shard1'])
+    self.readers['shard9'].join()
+    self.readers['shard1'].stop_flag.set()
+    self.readers['shard1'].join()
+    self.coordinator.reap_readers()
+    self.lease_store.release.assert_called_with('shard1')
+    assert self.coordinator.readers == {}
+    # the finished shard keeps its lease until its tail is checkpointed
+    assert self.coordinator.ending == {'shard9': '5'}
+    assert not self.lease_store.finish_shard.called
+
+  def test_stops_after_duration(self):
+    self.lease_store.balance = MagicMock(return_value=['shard2'])
+    coordinator = LeaseCoordinator(self.stop_flag, self.lease_store, lambda: self.shards, self.create_reader, 0.1, 1)
+    coordinator.start()
+    coordinator.join(5)
+    assert self.stop_flag.is_set()
+    assert not self.readers['shard2'].is_alive()
+
+
+class TestLeaseCoordinatorWithStore:
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.lease_store = LeaseStore(os.path.join(self.directory, 'leases.db'), 'group1', 30, 'a')
+    self.readers = {}
+    # shard0 was split into shard1 and shard2
+    self.shards = [
+      {'ShardId': 'shard0'},
+      {'ShardId': 'shard1', 'ParentShardId': 'shard0'},
+      {'ShardId': 'shard2', 'ParentShardId': 'shard0'},
+    ]
+    self.coordinator = LeaseCoordinator(Event(), self.lease_store, lambda: self.shards, self.create_reader, 0.1)
+
+  def tearDown(self):
+    self.lease_store.close()
+    shutil.rmtree(self.directory)
+
+  def create_reader(self, stop_flag, shard_id):
+    reader = FakeReader(stop_flag, finished=(shard_id == 'shard0'), last_sequence_number='5')
+    self.readers[shard_id] = reader
+    return reader
+
+  def round(self):
+    self.coordinator.reap_readers()
+    self.coordinator.finish_ended_shards()
+    self.coordinator.refresh_shards()
+    self.coordinator.assign(self.lease_store.balance())
+
+  def test_children_wait_for_the_last_checkpoint_of_their_parent(self):
+    self.round()
+    # the children are held back until shard0 ended
+    assert list(self.readers.keys()) == ['shard0']
+    self.readers['shard0'].join()
+    self.round()
+    # shard0 was read to its end but the renderer did not checkpoint it
+    assert self.lease_store.finished_shards() == set()
+    assert self.lease_store.balance() == ['shard0']
+    assert list(self.readers.keys()) == ['shard0']
+    self.lease_store.checkpoint('shard0', '5')
+    self.round()
+    assert self.lease_store.finished_shards() == set(['shard0'])
+    assert sorted(self.readers.keys()) == ['shard0', 'shard1', 'shard2']
+    for reader in self.coordinator.readers.values():
+      reader.stop_flag.set()
+
+
+class TestLeaseCoordinatorProcesses:
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'leases.db')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_workers_read_children_after_the_checkpoints_of_their_parents(self):
+    # shard0 was split into shard2 and shard3, which were merged into shard4
+    shards = [
+      {'ShardId': 'shard0'},
+      {'ShardId': 'shard1'},
+      {'ShardId': 'shard2', 'ParentShardId': 'shard0'},
+      {'ShardId': 'shard3', 'ParentShardId': 'shard0'},
+      {'ShardId': 'shard4', 'ParentShardId': 'shard2', 'AdjacentParentShardId': 'shard3'},
+    ]
+    # the schema is created before the workers race for it
+    LeaseStore(self.path, 'group1').close()
+    events = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=run_worker, args=(self.path, worker_id, shards, events)) for worker_id in ('a', 'b')]
+    for worker in workers:
+      worker.daemon = True
+      worker.start()
+    for worker in workers:
+      worker.join(30)
+      assert worker.exitcode == 0
+    reads = {}
+    checkpoints = {}
+    while not events.empty():
+      event, shard_id, worker_id, timestamp = events.get()
+      times = reads if event == 'read' else checkpoints
+      times[shard_id] = min(times.get(shard_id, timestamp), timestamp)
+    assert sorted(reads.keys()) == ['shard%d' % i for i in range(0, 5)]
+    for shard in shards:
+      for parent in (shard.get('ParentShardId'), shard.get('AdjacentParentShardId')):
+        if parent is not None:
+          # a child is only read once the tail of its parent is rendered
+          assert reads[shard['ShardId']] > checkpoints[parent]
+    lease_store = LeaseStore(self.path, 'group1')
+    assert lease_store.finished_shards() == set(reads.keys())
+    lease_store.close()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+
+from kinesis_awscli_plugin.lib.leasestore import LeaseStore
+
+class TestLeaseStore:
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'leases.db')
+    self.shard_ids = ['shard%d' % i for i in range(0, 4)]
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def store(self, worker_id, lease_duration=30):
+    store = LeaseStore(self.path, 'group1', lease_duration, worker_id)
+    store.add_shards(self.shard_ids)
+    return store
+
+  def test_single_worker_takes_all_shards(self):
+    assert self.store('a').balance() == self.shard_ids
+
+  def test_shards_are_rebalanced_when_workers_join(self):
+    a = self.store('a')
+    b = self.store('b')
+    assert len(a.balance()) == 4
+    # b registers and steals one lease per round until both own two
+    assert len(b.balance()) == 1
+    assert len(b.balance()) == 2
+    assert len(b.balance()) == 2
+    owned_a = a.balance()
+    owned_b = b.balance()
+    assert len(owned_a) == 2
+    assert sorted(owned_a + owned_b) == self.shard_ids
+
+  def test_expired_leases_are_taken_over(self):
+    a = self.store('a', lease_duration=1)
+    b = self.store('b', lease_duration=1)
+    a.balance()
+    b.balance()
+    b.balance()
+    # a dies and stops renewing
+    time.sleep(1.2)
+    assert b.balance() == self.shard_ids
+
+  def test_checkpoints_require_the_lease(self):
+    a = self.store('a')
+    a.balance()
+    a.checkpoint('shard0', '100')
+    assert a.get('shard0') == '100'
+    b = self.store('b')
+    b.balance()
+    stolen = [shard_id for shard_id in b.balance() if shard_id in self.shard_ids]
+    a.checkpoint(stolen[0], '200')
+    # the checkpoint of a lost lease is ignored
+    assert a.get(stolen[0]) != '200'
+
+  def test_finished_shards_are_not_leased_again(self):
+    a = self.store('a')
+    a.balance()
+    a.finish_shard('shard0')
+    a.checkpoint('shard0', '300')
+    a.release_all()
+    assert self.store('b').balance() == ['shard1', 'shard2', 'shard3']
+    assert a.get('shard0') is None
+
+  def test_groups_are_independent(self):
+    self.store('a').balance()
+    other = LeaseStore(self.path, 'group2', 30, 'b')
+    other.add_shards(self.shard_ids)
+    assert other.balance() == self.shard_ids
@@ -0,0 +1,120 @@
+import datetime
+from threading import Event
+
+from botocore.exceptions import ClientError
+from mock import MagicMock
+from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+from kinesis_awscli_plugin.lib.metricsexporter import MetricsExporter
+
+
+class TestMetricsExporter:
+  def setUp(self):
+    self.now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+    self.stream_metrics_getter = MagicMock()
+    self.stream_metrics_getter.stream_name = 'orders'
+    self.stream_metrics_getter.get = MagicMock(side_effect=self.fake_stream_get)
+    self.shard_metrics_getter = MagicMock()
+    self.shard_metrics_getter.stream_name = 'orders'
+    self.shard_metrics_getter.get_shard_ids_for_stream = MagicMock(
+      return_value=['shard-%d' % index for index in range(5)])
+    self.shard_metrics_getter.get_shard_metrics_by_name = MagicMock(
+      side_effect=self.fake_get_shard_metrics_by_name)
+
+  def datapoints(self, values):
+    # the last value is of the current minute, which is not complete yet
+    return [{'Timestamp': self.now - datetime.timedelta(minutes=len(values) - index),
+             'Sum': value, 'Unit': 'Count'}
+            for index, value in enumerate(values)] + [
+              {'Timestamp': self.now, 'Sum': 1, 'Unit': 'Count'}]
+
+  def fake_stream_get(self, metric_list, start_time, end_time):
+    return [KinesisMetrics(metric_name, self.datapoints([10, 20]), 'Sum')
+            for metric_name in metric_list]
+
+  def fake_get_shard_metrics_by_name(self, shard_ids, metric_names,
+                                     start_time, end_time):
+    return dict((metric_name, [
+      KinesisMetrics(shard_id, self.datapoints([index]), 'Sum')
+      for index, shard_id in enumerate(shard_ids)
+    ]) for metric_name in metric_names)
+
+  def mock_exporter(self, shard_metrics_getter=None):
+    return MetricsExporter(
+      Event(), [(self.stream_metrics_getter, shard_metrics_getter)],
+      ['IncomingBytes', 'GetRecords.IteratorAgeMilliseconds'],
+      ['IncomingRecords'], 'Sum', 60, max_shards=2)
+
+  def test_metric_name(self):
+    exporter = self.mock_exporter()
+    assert exporter.metric_name('IncomingBytes') == 'aws_kinesis_incoming_bytes_sum'
+    assert exporter.metric_name('GetRecords.IteratorAgeMilliseconds') == \
+      'aws_kinesis_get_records_iterator_age_milliseconds_sum'
+    assert exporter.metric_name('IncomingRecords', 'shard') == \
+      'aws_kinesis_shard_incoming_records_sum'
+
+  def test_render_serves_latest_complete_period(self):
+    exporter = self.mock_exporter()
+    assert exporter.refresh()
+    text = exporter.render()
+    assert '# TYPE aws_kinesis_incoming_bytes_sum gauge\n' in text
+    assert 'aws_kinesis_incoming_bytes_sum{stream_name="orders"} 20.0\n' in text
+    assert 'kinesis_exporter_refreshes_total 1.0\n' in text
+    assert 'kinesis_exporter_series 2.0\n' in text
+
+  def test_shard_series_are_bounded(self):
+    exporter = self.mock_exporter(self.shard_metrics_getter)
+    exporter.refresh()
+    lines = [line for line in exporter.render().split('\n')
+             if line.startswith('aws_kinesis_shard_incoming_records_sum')]
+    assert lines == [
+      'aws_kinesis_shard_incoming_records_sum{shard_id="shard-4",stream_name="orders"} 4.0',
+      'aws_kinesis_shard_incoming_records_sum{shard_id="shard-3",stream_name="orders"} 3.0',
+      'aws_kinesis_shard_incoming_records_sum{shard_id="other",stream_name="orders"} 3.0',
+    ]
+
+  def test_shards_are_listed_once(self):
+    exporter = self.mock_exporter(self.shard_metrics_getter)
+    exporter.refresh()
+    exporter.refresh()
+    assert self.shard_metrics_getter.get_shard_ids_for_stream.call_count == 1
+    assert self.shard_metrics_getter.get_shard_metrics_by_name.call_count == 2
+
+  def test_failed_refresh_keeps_snapshot(self):
+    exporter = self.mock_exporter()
+    exporter.refresh()
+    self.stream_metrics_getter.get = MagicMock(side_effect=ClientError(
+      {'Error': {'Code': 'AccessDenied'}}, 'GetMetricData'))
+    assert not exporter.refresh()
+    text = exporter.render()
+    assert 'aws_kinesis_incoming_bytes_sum{stream_name="orders"} 20.0\n' in text
+    assert 'kinesis_exporter_refresh_errors_total 1.0\n' in text
+
+  def test_unexpected_errors_keep_snapshot(self):
+    exporter = self.mock_exporter()
+    exporter.refresh()
+    self.stream_metrics_getter.get = MagicMock(side_effect=KeyError('Values'))
+    assert not exporter.refresh()
+    text = exporter.render()
+    assert 'aws_kinesis_incoming_bytes_sum{stream_name="orders"} 20.0\n' in text
+    assert 'kinesis_exporter_refresh_errors_total 1.0\n' in text
+
+  def test_latest_of_cli_timestamps(self):
+    # the AWS CLI returns the timestamps of CloudWatch as ISO8601 strings
+    exporter = self.mock_exporter()
+    metrics = KinesisMetrics('IncomingBytes', [
+      {'Timestamp': (self.now - datetime.timedelta(minutes=minutes)).isoformat() + 'Z',
+       'Sum': value, 'Unit': 'Bytes'}
+      for minutes, value in [(2, 10), (1, 20), (0, 30)]
+    ], 'Sum')
+    assert exporter.latest(metrics, self.now) == 20.0
+
+  def test_observe_scrape(self):
+    exporter = self.mock_exporter()
+    exporter.observe_scrape(0.25)
+    exporter.observe_scrape(0.5)
+    text = exporter.render()
+    assert 'kinesis_exporter_scrape_duration_seconds_count 2.0\n' in text
+    assert 'kinesis_exporter_scrape_duration_seconds_sum 0.75\n' in text
+
+  def test_escape(self):
+    assert MetricsExporter.escape('a"b\\c\n') == 'a\\"b\\\\c\\n'
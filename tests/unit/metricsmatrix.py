@@ -0,0 +1,77 @@
+import datetime
+from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+from kinesis_awscli_plugin.lib.metricsmatrix import MetricsMatrix
+
+
+def shard_metrics(shard_id, values):
+  start = datetime.datetime(2016, 10, 22, 5, 0)
+  return KinesisMetrics(shard_id, [
+    {
+      'Timestamp': start + datetime.timedelta(minutes=minute),
+      'Sum': value,
+      'Unit': 'Bytes'
+    }
+    for minute, value in values
+  ], 'Sum')
+
+
+class TestMetricsMatrix:
+  def setUp(self):
+    self.metrics_array = [
+      shard_metrics('shard-1', [(0, 1), (1, 2), (2, 3), (3, 4)]),
+      shard_metrics('shard-2', [(1, 10), (3, 30)]),
+      shard_metrics('shard-3', []),
+    ]
+
+  def mock_matrices(self):
+    matrices = [MetricsMatrix(self.metrics_array, 'Sum', use_numpy=False)]
+    if MetricsMatrix.numpy_available():
+      matrices.append(MetricsMatrix(self.metrics_array, 'Sum', use_numpy=True))
+    return matrices
+
+  def test_matrix_layout(self):
+    matrix = self.mock_matrices()[0]
+    assert matrix.width == 4
+    assert list(matrix.row(0)) == [1, 2, 3, 4]
+    row = list(matrix.row(1))
+    assert row[1] == 10 and row[3] == 30
+    assert row[0] != row[0] and row[2] != row[2]
+
+  def test_stats(self):
+    for matrix in self.mock_matrices():
+      stats = matrix.stats()
+      assert stats['Count'] == [4, 2, 0]
+      assert stats['Average'] == [2.5, 20.0, 0.0]
+      assert stats['Minimum'] == [1.0, 10.0, 0.0]
+      assert stats['Maximum'] == [4.0, 30.0, 0.0]
+      assert stats['P50'] == [2.5, 20.0, 0.0]
+      assert abs(stats['P95'][0] - 3.85) < 1e-9
+      assert abs(stats['P99'][1] - 29.8) < 1e-9
+
+  def test_average_matches_kinesis_metrics(self):
+    for matrix in self.mock_matrices():
+      for index, metrics in enumerate(self.metrics_array):
+        assert matrix.stats()['Average'][index] == metrics.datapoint_average
+
+  def test_order(self):
+    for matrix in self.mock_matrices():
+      assert matrix.order('Average') == [1, 0, 2]
+      assert matrix.order('Minimum', reverse=False) == [2, 0, 1]
+
+  def test_skew(self):
+    matrix = MetricsMatrix(self.metrics_array, 'Sum', use_numpy=False)
+    skew = matrix.skew('Average')
+    # averages are 2.5, 20 and 0
+    assert abs(skew['MaxMeanRatio'] - 20.0 / 7.5) < 1e-9
+    assert abs(skew['Gini'] - 80.0 / (2 * 9 * 7.5)) < 1e-9
+    assert skew['CoefficientOfVariation'] > 1
+
+  def test_skew_of_even_load(self):
+    metrics_array = [shard_metrics('shard-%d' % i, [(0, 5)]) for i in range(4)]
+    skew = MetricsMatrix(metrics_array, 'Sum', use_numpy=False).skew()
+    assert skew == {'MaxMeanRatio': 1.0, 'Gini': 0.0, 'CoefficientOfVariation': 0.0}
+
+  def test_empty_matrix(self):
+    matrix = MetricsMatrix([], 'Sum')
+    assert matrix.order() == []
+    assert matrix.skew()['Gini'] == 0.0
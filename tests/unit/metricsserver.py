@@ -0,0 +1,40 @@
+import time
+from threading import Event
+
+from mock import MagicMock
+from six.moves.urllib.error import HTTPError
+from six.moves.urllib.request import urlopen
+from kinesis_awscli_plugin.lib.metricsserver import MetricsServer
+
+
+class TestMetricsServer:
+  def setUp(self):
+    self.exporter = MagicMock()
+    self.exporter.render = MagicMock(return_value='up 1.0\n')
+    self.server = MetricsServer(Event(), self.exporter, '127.0.0.1', 0)
+    self.server.start()
+    self.url = 'http://127.0.0.1:%d' % self.server.port
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.join()
+
+  def test_serves_metrics(self):
+    response = urlopen(self.url + '/metrics')
+    assert response.read() == b'up 1.0\n'
+    assert response.info()['Content-Type'] == MetricsServer.CONTENT_TYPE
+    # the scrape is observed once the response is written, which may be
+    # after the client read it
+    for _ in range(100):
+      if self.exporter.observe_scrape.call_count > 0:
+        break
+      time.sleep(0.01)
+    assert self.exporter.observe_scrape.call_count == 1
+
+  def test_unknown_path(self):
+    try:
+      urlopen(self.url + '/')
+      assert False
+    except HTTPError as e:
+      assert e.code == 404
+    assert self.exporter.render.call_count == 0
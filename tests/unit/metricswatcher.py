@@ -0,0 +1,89 @@
+import datetime
+import json
+from threading import Event
+from botocore.exceptions import ClientError
+from mock import MagicMock
+from six import StringIO
+from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+from kinesis_awscli_plugin.lib.metricswatcher import MetricsWatcher
+
+
+class TestMetricsWatcher:
+  def setUp(self):
+    self.output = StringIO()
+    self.values = {'shard-1': 1.0, 'shard-2': 5.0}
+    self.fetch = MagicMock(side_effect=self.fake_fetch)
+    self.timestamp = datetime.datetime.utcnow().replace(
+      second=0, microsecond=0) - datetime.timedelta(minutes=1)
+
+  def fake_fetch(self, start_time, end_time):
+    return [
+      KinesisMetrics(shard_id, [{
+        'Timestamp': self.timestamp,
+        'Average': value,
+        'Unit': 'Count'
+      }], 'Average')
+      for shard_id, value in sorted(self.values.items())
+    ]
+
+  def mock_watcher(self, report_format='table'):
+    return MetricsWatcher(Event(), self.fetch, datetime.timedelta(minutes=10),
+                          'Average', 60, self.output, report_format)
+
+  def test_first_refresh_fetches_window(self):
+    watcher = self.mock_watcher()
+    watcher.report()
+    start_time, end_time = self.fetch.call_args[0]
+    assert end_time - start_time == datetime.timedelta(minutes=10)
+
+  def test_later_refreshes_fetch_recent_periods(self):
+    watcher = self.mock_watcher()
+    watcher.report()
+    watcher.report()
+    start_time, end_time = self.fetch.call_args[0]
+    assert end_time - start_time < datetime.timedelta(minutes=6)
+
+  def test_failed_refresh_keeps_window(self):
+    watcher = self.mock_watcher('jsonl')
+    assert watcher.refresh()
+    self.fetch.side_effect = ClientError(
+      {'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}, 'GetMetricData')
+    assert not watcher.refresh()
+    self.fetch.side_effect = self.fake_fetch
+    self.values['shard-1'] = 3.0
+    assert watcher.refresh()
+    lines = self.output.getvalue().splitlines()
+    # the unchanged shard is still in the window
+    assert len(lines) == 3
+    assert json.loads(lines[-1])['ShardId'] == 'shard-1'
+
+  def test_table_is_sorted_by_average(self):
+    watcher = self.mock_watcher()
+    watcher.report()
+    lines = self.output.getvalue().splitlines()
+    assert lines[0].startswith('ShardId')
+    assert lines[1].startswith('shard-2')
+    assert lines[2].startswith('shard-1')
+
+  def test_jsonl_writes_changes_only(self):
+    watcher = self.mock_watcher('jsonl')
+    watcher.report()
+    assert len(self.output.getvalue().splitlines()) == 2
+    self.values['shard-1'] = 3.0
+    watcher.report()
+    lines = self.output.getvalue().splitlines()
+    assert len(lines) == 3
+    change = json.loads(lines[-1])
+    assert change['ShardId'] == 'shard-1'
+    assert change['Average'] == 3.0
+
+  def test_cli_timestamps(self):
+    # the AWS CLI returns the timestamps of CloudWatch as ISO8601 strings
+    timestamp = self.timestamp
+    self.timestamp = timestamp.isoformat() + 'Z'
+    watcher = self.mock_watcher('jsonl')
+    changes = watcher.snapshot()
+    assert [c['DatapointTimestamp'] for c in changes] == [timestamp.isoformat()] * 2
+    # the same minute as a datetime is no change
+    self.timestamp = timestamp
+    assert watcher.snapshot() == []
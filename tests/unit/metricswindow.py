@@ -0,0 +1,48 @@
+import datetime
+from kinesis_awscli_plugin.lib.metricswindow import MetricsWindow
+
+
+def datapoint(minute, value):
+  return {
+    'Timestamp': datetime.datetime(2016, 10, 22, 5, minute),
+    'Average': value,
+    'Unit': 'Count'
+  }
+
+
+class TestMetricsWindow:
+  def setUp(self):
+    self.window = MetricsWindow(600, 'Average')
+
+  def test_update_returns_new_and_changed_datapoints(self):
+    changed = self.window.update('shard-1', [datapoint(0, 1), datapoint(1, 2)])
+    assert len(changed) == 2
+    changed = self.window.update('shard-1', [datapoint(1, 2), datapoint(2, 3)])
+    assert changed == [datapoint(2, 3)]
+    changed = self.window.update('shard-1', [datapoint(2, 4)])
+    assert changed == [datapoint(2, 4)]
+    metrics = self.window.metrics()[0]
+    assert [d['Average'] for d in metrics.datapoints] == [1, 2, 4]
+
+  def test_trim_drops_old_datapoints(self):
+    self.window.update('shard-1', [datapoint(0, 1), datapoint(5, 2)])
+    self.window.trim(datetime.datetime(2016, 10, 22, 5, 12))
+    metrics = self.window.metrics()[0]
+    assert metrics.datapoints == [datapoint(5, 2)]
+
+  def test_metrics_keep_order_of_first_update(self):
+    self.window.update('shard-2', [datapoint(0, 1)])
+    self.window.update('shard-1', [datapoint(0, 5)])
+    self.window.update('shard-2', [datapoint(1, 1)])
+    assert [m.metric_id for m in self.window.metrics()] == ['shard-2', 'shard-1']
+
+  def test_cli_timestamps(self):
+    # the AWS CLI returns the timestamps of CloudWatch as ISO8601 strings
+    self.window.update('shard-1', [datapoint(0, 1)])
+    changed = self.window.update('shard-1', [
+      {'Timestamp': '2016-10-22T05:00:00Z', 'Average': 1, 'Unit': 'Count'},
+      {'Timestamp': '2016-10-22T05:01:00Z', 'Average': 2, 'Unit': 'Count'},
+    ])
+    assert [d['Average'] for d in changed] == [2]
+    self.window.trim(datetime.datetime(2016, 10, 22, 5, 10, 30))
+    assert [d['Average'] for d in self.window.metrics()[0].datapoints] == [2]
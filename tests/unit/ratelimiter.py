@@ -0,0 +1,20 @@
+import time
+
+from kinesis_awscli_plugin.lib.ratelimiter import TokenBucket
+
+class TestTokenBucket:
+
+  def test_rate(self):
+    bucket = TokenBucket(20, 1)
+    start = time.time()
+    for i in range(0, 11):
+      bucket.acquire()
+    # the first token is available right away
+    elapsed = time.time() - start
+    assert 0.4 < elapsed < 1
+
+  def test_debt_is_paid_back(self):
+    bucket = TokenBucket(100)
+    assert bucket.acquire(100) == 0
+    waited = bucket.acquire(50)
+    assert 0.4 < waited < 0.6
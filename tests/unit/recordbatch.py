@@ -0,0 +1,108 @@
+import datetime
+import pickle
+
+from kinesis_awscli_plugin.lib.batchqueue import BatchQueue
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from six.moves import queue as Queue
+
+class TestRecordBatch:
+
+  def setUp(self):
+    self.batch = RecordBatch([
+      {
+        'SequenceNumber': '1',
+        'PartitionKey': 'key1',
+        'ApproximateArrivalTimestamp': datetime.datetime(2016, 10, 22, 4, 57, 1, 250000),
+        'Data': b'first'
+      },
+      {'SequenceNumber': '2', 'PartitionKey': 'key2', 'Data': b''},
+      {'SequenceNumber': '3', 'PartitionKey': 'key3', 'Data': b'third'},
+    ], 'shard1')
+
+  def test_layout(self):
+    assert len(self.batch) == 3
+    assert self.batch.size == 10
+    assert self.batch.last_sequence_number == '3'
+    assert self.batch.payload(0) == b'first'
+    assert self.batch.payload(1) == b''
+    assert self.batch.data(2).tobytes() == b'third'
+    assert self.batch.payload_size(2) == 5
+    assert self.batch.arrival_timestamp(0) == datetime.datetime(2016, 10, 22, 4, 57, 1, 250000)
+    assert self.batch.arrival_timestamp(1) is None
+    assert [record.partition_key for record in self.batch] == ['key1', 'key2', 'key3']
+
+  def test_cli_records(self):
+    # the AWS CLI leaves blobs base64 encoded and timestamps as epoch seconds
+    batch = RecordBatch([
+      {'SequenceNumber': '1', 'PartitionKey': 'key1',
+       'ApproximateArrivalTimestamp': 1476962220.5, 'Data': u'aGVsbG8='},
+      {'SequenceNumber': '2', 'PartitionKey': 'key2',
+       'ApproximateArrivalTimestamp': 1476962221, 'Data': u''},
+    ], 'shard1')
+    assert batch.payload(0) == b'hello'
+    assert batch.payload(1) == b''
+    assert batch.size == 5
+    assert batch.arrival_timestamp(0) == datetime.datetime(2016, 10, 20, 11, 17, 0, 500000)
+    assert batch.arrival_timestamp(1) == datetime.datetime(2016, 10, 20, 11, 17, 1)
+
+  def test_cli_payloads_are_decoded_when_read(self):
+    batch = RecordBatch([
+      {'SequenceNumber': str(index), 'Data': data}
+      for index, data in enumerate([u'eA==', u'eHk=', u'eHl6', u''])
+    ], 'shard1')
+    # sizes are known without decoding
+    assert [batch.payload_size(index) for index in range(4)] == [1, 2, 3, 0]
+    assert batch.size == 6
+    head = batch.head(3)
+    # a batch handed to a worker process carries the encoded payloads
+    pickled = pickle.dumps(head, pickle.HIGHEST_PROTOCOL)
+    assert b'eHl6' in pickled
+    assert [record.payload for record in pickle.loads(pickled)] == [b'x', b'xy', b'xyz']
+    assert batch.payload(2) == b'xyz'
+    assert b'eHl6' not in pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+
+  def test_head(self):
+    assert self.batch.head(3) is self.batch
+    head = self.batch.head(1)
+    assert len(head) == 1
+    assert head.payload(0) == b'first'
+    assert head.last_sequence_number == '1'
+    assert self.batch.head(0).last_sequence_number is None
+
+  def test_derive_keeps_checkpoint(self):
+    derived = self.batch.derive([record for record in self.batch if record.sequence_number == '1'])
+    assert len(derived) == 1
+    assert derived.payload(0) == b'first'
+    assert derived.arrival_timestamp(0) == self.batch.arrival_timestamp(0)
+    assert derived.shard_id == 'shard1'
+    assert derived.last_sequence_number == '3'
+
+  def test_pickle(self):
+    self.batch.formatted = b'formatted'
+    batch = pickle.loads(pickle.dumps(self.batch, pickle.HIGHEST_PROTOCOL))
+    assert [record.payload for record in batch] == [b'first', b'', b'third']
+    assert batch.arrival_timestamp(0) == self.batch.arrival_timestamp(0)
+    assert batch.formatted == b'formatted'
+
+
+class TestBatchQueue:
+
+  def test_bounded_by_bytes(self):
+    queue = BatchQueue(10)
+    queue.put(RecordBatch([{'SequenceNumber': '1', 'Data': b'x' * 6}]))
+    queue.put(RecordBatch([{'SequenceNumber': '2', 'Data': b'x' * 6}]), False)
+    try:
+      queue.put(RecordBatch([{'SequenceNumber': '3', 'Data': b'x'}]), False)
+      assert False
+    except Queue.Full:
+      pass
+    assert queue.batch_count() == 2
+    assert queue.get().last_sequence_number == '1'
+    queue.get()
+    assert queue.empty()
+
+  def test_empty_batches_are_queued(self):
+    queue = BatchQueue(10)
+    queue.put(RecordBatch([], last_sequence_number='1'))
+    assert not queue.empty()
+    assert queue.get(False).last_sequence_number == '1'
@@ -0,0 +1,78 @@
+import base64
+import json
+
+from kinesis_awscli_plugin.lib.recordfilter import RecordFilter
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+
+class TestRecordFilter:
+
+  def setUp(self):
+    payloads = [
+      b'{"level": "error", "request": {"status": 500, "id": "a"}}',
+      b'{"level": "info", "request": {"status": 200, "id": "b"}}',
+      b'plain text error',
+      b'\xff\xfe not UTF-8',
+    ]
+    # shaped like the records of the AWS CLI, with base64 text as Data
+    self.batch = RecordBatch([
+      {'SequenceNumber': str(i), 'PartitionKey': 'key%d' % i,
+       'ApproximateArrivalTimestamp': 1476962220.5 + i,
+       'Data': base64.b64encode(data).decode('ascii')}
+      for i, data in enumerate(payloads)
+    ], 'shard1')
+    self.records = list(self.batch)
+
+  def sequence_numbers(self, records):
+    return [record.sequence_number for record in records]
+
+  def test_regex_filter(self):
+    records = RecordFilter('regex:error').apply(self.records)
+    assert self.sequence_numbers(records) == ['0', '2']
+    records = RecordFilter('^plain').apply(self.records)
+    assert self.sequence_numbers(records) == ['2']
+
+  def test_filters_see_decoded_payloads(self):
+    # eyJ is the base64 encoding of the start of the JSON payloads
+    assert RecordFilter('regex:eyJ').apply(self.records) == []
+    records = RecordFilter('regex:^\\{').apply(self.records)
+    assert self.sequence_numbers(records) == ['0', '1']
+
+  def test_json_filter(self):
+    records = RecordFilter('json:request.status=500').apply(self.records)
+    assert self.sequence_numbers(records) == ['0']
+    records = RecordFilter('json:level=info').apply(self.records)
+    assert self.sequence_numbers(records) == ['1']
+    records = RecordFilter('json:request.missing=1').apply(self.records)
+    assert records == []
+
+  def test_projection(self):
+    records = RecordFilter(projection='level,request.id').apply(self.records)
+    assert self.sequence_numbers(records) == ['0', '1']
+    assert json.loads(records[0].payload.decode('utf-8')) == {'level': 'error', 'request.id': 'a'}
+    # the original record is not modified
+    assert self.records[0].payload.startswith(b'{"level": "error", "request"')
+
+  def test_sampling_is_deterministic(self):
+    records = list(RecordBatch([{'SequenceNumber': str(i), 'PartitionKey': 'key%d' % (i % 100), 'Data': b''} for i in range(0, 1000)]))
+    sampled = RecordFilter(sample_rate=0.5).apply(records)
+    assert 300 < len(sampled) < 700
+    sampled_keys = set(record.partition_key for record in sampled)
+    for record in records:
+      assert (record in sampled) == (record.partition_key in sampled_keys)
+    assert len(RecordFilter(sample_rate=1).apply(records)) == 1000
+
+  def test_filter_batch_keeps_checkpoint(self):
+    batch = RecordFilter('no match').filter_batch(self.batch)
+    assert len(batch) == 0
+    assert batch.shard_id == 'shard1'
+    assert batch.last_sequence_number == '3'
+
+  def test_filter_batch_repacks_projected_records(self):
+    batch = RecordFilter('json:level=error', projection='request.status').filter_batch(self.batch)
+    assert len(batch) == 1
+    assert batch.payload(0) == b'{"request.status": 500}'
+    assert batch.partition_key(0) == 'key0'
+
+  def test_partition_key_filter(self):
+    records = RecordFilter(partition_keys=['key1', 'key3']).apply(self.records)
+    assert self.sequence_numbers(records) == ['1', '3']
@@ -0,0 +1,77 @@
+import datetime
+import json
+import struct
+
+from kinesis_awscli_plugin.lib.recordformatter import RecordFormatter
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+
+class TestRecordFormatter:
+
+  def setUp(self):
+    self.batch = RecordBatch([
+      {
+        'SequenceNumber': '1',
+        'PartitionKey': 'key1',
+        'ApproximateArrivalTimestamp': datetime.datetime(2016, 10, 22, 4, 57),
+        'Data': b'first'
+      },
+      {
+        'SequenceNumber': '2',
+        'PartitionKey': 'key2',
+        'ApproximateArrivalTimestamp': datetime.datetime(2016, 10, 22, 4, 58),
+        # not valid UTF-8
+        'Data': b'\xff\xfe'
+      },
+    ], 'shard1')
+
+  def test_raw(self):
+    assert RecordFormatter('raw').format_batch(self.batch) == b'first\n\xff\xfe\n'
+
+  def test_length_prefixed(self):
+    output = RecordFormatter('length-prefixed').format_batch(self.batch)
+    assert output == struct.pack('>I', 5) + b'first' + struct.pack('>I', 2) + b'\xff\xfe'
+
+  def test_jsonl(self):
+    output = RecordFormatter('jsonl').format_batch(self.batch)
+    lines = output.decode('utf-8').splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[1])
+    assert record['ShardId'] == 'shard1'
+    assert record['SequenceNumber'] == '2'
+    assert record['PartitionKey'] == 'key2'
+    assert record['ApproximateArrivalTimestamp'] == '2016-10-22T04:58:00'
+    assert record['Data'] == '//4='
+
+  def test_cli_records(self):
+    # Data and timestamps as the AWS CLI returns them
+    batch = RecordBatch([{
+      'SequenceNumber': '1',
+      'PartitionKey': 'key1',
+      'ApproximateArrivalTimestamp': 1476962220.5,
+      'Data': u'aGVsbG8='
+    }], 'shard1')
+    assert RecordFormatter('raw').format_batch(batch) == b'hello\n'
+    record = json.loads(RecordFormatter('jsonl').format_batch(batch).decode('utf-8'))
+    assert record['ApproximateArrivalTimestamp'] == '2016-10-20T11:17:00.500000'
+    # encoded once, like the Data of GetRecords
+    assert record['Data'] == 'aGVsbG8='
+
+  def test_max_batch_size(self):
+    # the largest response of GetRecords with the longest metadata
+    size = RecordFormatter.MAX_BATCH_BYTES // RecordFormatter.MAX_BATCH_RECORDS
+    batch = RecordBatch([{
+      'SequenceNumber': '9' * 128,
+      'PartitionKey': u'\U0001F600' * 256,
+      'ApproximateArrivalTimestamp': 1476962220.5,
+      'Data': b'\xff' * size
+    }] * RecordFormatter.MAX_BATCH_RECORDS, 's' * 128)
+    for output_format in RecordFormatter.OUTPUT_FORMATS:
+      output = RecordFormatter(output_format).format_batch(batch)
+      assert len(output) <= RecordFormatter.max_batch_size(output_format)
+
+  def test_unknown_format(self):
+    try:
+      RecordFormatter('xml')
+      assert False
+    except ValueError:
+      pass
@@ -0,0 +1,45 @@
+import io
+import time
+
+from kinesis_awscli_plugin.lib.recordrenderer import RecordRenderer
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from mock import MagicMock
+from six.moves import queue as Queue
+from threading import Event
+
+class TestRecordRenderer:
+
+  def setUp(self):
+    self.stop_flag = Event()
+    self.queue = Queue.Queue()
+    self.output = io.BytesIO()
+    self.output.write = MagicMock(wraps=self.output.write)
+    self.checkpointer = MagicMock()
+
+  def test_cli_records_are_decoded(self):
+    self.queue.put(RecordBatch([
+      {'SequenceNumber': '1', 'ApproximateArrivalTimestamp': 1476962220.5, 'Data': u'aGVsbG8='},
+      {'SequenceNumber': '2', 'ApproximateArrivalTimestamp': 1476962221.0, 'Data': u'd29ybGQ='},
+    ], 'shard0'))
+    renderer = RecordRenderer(self.stop_flag, self.queue, 100, self.checkpointer, output=self.output)
+    self.stop_flag.set()
+    renderer.start()
+    renderer.join()
+    assert self.output.getvalue() == b'hello\nworld\n'
+    self.checkpointer.checkpoint.assert_called_with('shard0', '2')
+
+  def test_batches_are_written_at_once(self):
+    for i in range(0, 10):
+      records = [{'SequenceNumber': '%d-%d' % (i, j), 'Data': b'x'} for j in range(0, 10)]
+      self.queue.put(RecordBatch(records, 'shard%d' % (i % 2)))
+    renderer = RecordRenderer(self.stop_flag, self.queue, 100, self.checkpointer, output=self.output)
+    renderer.start()
+    time.sleep(1)
+    self.stop_flag.set()
+    renderer.join()
+    assert self.output.getvalue() == b'x\n' * 100
+    # all queued batches are written with a single write
+    assert self.output.write.call_count == 1
+    self.checkpointer.checkpoint.assert_any_call('shard0', '8-9')
+    self.checkpointer.checkpoint.assert_any_call('shard1', '9-9')
+    assert self.checkpointer.flush.called
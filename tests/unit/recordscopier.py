@@ -0,0 +1,82 @@
+from botocore.exceptions import ClientError
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from kinesis_awscli_plugin.lib.recordscopier import RecordsCopier
+from mock import MagicMock
+from six.moves import queue as Queue
+from threading import Event
+
+class TestRecordsCopier:
+
+  def setUp(self):
+    self.stop_flag = Event()
+    self.queue = Queue.Queue()
+    self.kinesis_helper = MagicMock()
+    self.checkpointer = MagicMock()
+    self.copier = RecordsCopier(self.stop_flag, self.queue, self.kinesis_helper, 'target', 10, self.checkpointer)
+    self.copier.INITIAL_RETRY_DELAY = 0.001
+
+  def batch(self, count, size=1):
+    return RecordBatch([{'SequenceNumber': str(i), 'PartitionKey': 'key%d' % i, 'Data': b'x' * size} for i in range(0, count)], 'shard1')
+
+  def succeed(self, StreamName=None, Records=None):
+    return {'FailedRecordCount': 0, 'Records': [{'SequenceNumber': '1'} for record in Records]}
+
+  def test_keeps_keys_and_payloads(self):
+    self.kinesis_helper.put_records = MagicMock(side_effect=lambda stream_name, records: self.succeed(Records=records))
+    self.copier.copy_batch(self.batch(3))
+    stream_name, records = self.kinesis_helper.put_records.call_args[0]
+    assert stream_name == 'target'
+    assert records == [{'Data': b'x', 'PartitionKey': 'key%d' % i} for i in range(0, 3)]
+    self.checkpointer.checkpoint.assert_called_with('shard1', '2')
+    assert self.copier.records_copied == 3
+
+  def test_requests_stay_within_limits(self):
+    self.kinesis_helper.put_records = MagicMock(side_effect=lambda stream_name, records: self.succeed(Records=records))
+    self.copier.copy_batch(self.batch(1200))
+    assert [len(call[0][1]) for call in self.kinesis_helper.put_records.call_args_list] == [500, 500, 200]
+    self.kinesis_helper.put_records.reset_mock()
+    self.copier.copy_batch(self.batch(6, 1024 * 1024))
+    assert [len(call[0][1]) for call in self.kinesis_helper.put_records.call_args_list] == [4, 2]
+
+  def test_failed_records_are_retried(self):
+    throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'PutRecords')
+    partial = {'FailedRecordCount': 1, 'Records': [{'SequenceNumber': '1'}, {'ErrorCode': 'InternalFailure'}, {'SequenceNumber': '3'}]}
+    self.kinesis_helper.put_records = MagicMock(side_effect=[throttled, partial, {'FailedRecordCount': 0, 'Records': [{'SequenceNumber': '4'}]}])
+    self.copier.copy_batch(self.batch(3))
+    assert self.kinesis_helper.put_records.call_count == 3
+    assert self.kinesis_helper.put_records.call_args[0][1] == [{'Data': b'x', 'PartitionKey': 'key1'}]
+    assert self.copier.records_copied == 3
+    assert self.copier.records_retried == 4
+
+  def test_cli_records(self):
+    self.kinesis_helper.put_records = MagicMock(side_effect=lambda stream_name, records: self.succeed(Records=records))
+    # base64 text and epoch seconds like the AWS CLI returns them
+    self.copier.copy_batch(RecordBatch([
+      {'SequenceNumber': '1', 'PartitionKey': 'key1', 'ApproximateArrivalTimestamp': 1476962220.5, 'Data': u'aGVsbG8='},
+    ], 'shard1'))
+    # botocore encodes the payload bytes again
+    assert self.kinesis_helper.put_records.call_args[0][1] == [{'Data': b'hello', 'PartitionKey': 'key1'}]
+    self.checkpointer.checkpoint.assert_called_with('shard1', '1')
+
+  def test_retries_are_limited(self):
+    self.copier.MAX_ATTEMPTS = 3
+    failing = {'FailedRecordCount': 1, 'Records': [{'ErrorCode': 'InternalFailure'}]}
+    self.kinesis_helper.put_records = MagicMock(return_value=failing)
+    self.queue.put(self.batch(1))
+    self.copier.start()
+    self.copier.join(5)
+    assert not self.copier.is_alive()
+    assert self.kinesis_helper.put_records.call_count == 3
+    # the failed batch is not checkpointed and the other threads stop
+    assert not self.checkpointer.checkpoint.called
+    assert self.checkpointer.flush.called
+    assert self.stop_flag.is_set()
+
+  def test_other_errors_are_raised(self):
+    self.kinesis_helper.put_records = MagicMock(side_effect=ClientError({'Error': {'Code': 'AccessDeniedException'}}, 'PutRecords'))
+    try:
+      self.copier.copy_batch(self.batch(1))
+      assert False
+    except ClientError:
+      pass
+    assert not self.checkpointer.checkpoint.called
@@ -0,0 +1,77 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+
+from kinesis_awscli_plugin.lib.recordsink import RecordSink
+from kinesis_awscli_plugin.lib.recordbatch import RecordBatch
+from mock import MagicMock
+from six.moves import queue as Queue
+from threading import Event
+
+class TestRecordSink:
+
+  def setUp(self):
+    self.sink_dir = tempfile.mkdtemp()
+    self.stop_flag = Event()
+    self.queue = Queue.Queue()
+    self.checkpointer = MagicMock()
+
+  def tearDown(self):
+    shutil.rmtree(self.sink_dir)
+
+  def create_sink(self, **kwargs):
+    return RecordSink(self.stop_flag, self.queue, 100, self.sink_dir, self.checkpointer, **kwargs)
+
+  def shard_files(self, shard_id):
+    directory = os.path.join(self.sink_dir, shard_id)
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+  def test_files_per_shard(self):
+    for i in range(0, 4):
+      self.queue.put(RecordBatch([{'SequenceNumber': str(i), 'Data': b'record%d' % i}], 'shard%d' % (i % 2)))
+    sink = self.create_sink()
+    sink.start()
+    time.sleep(1)
+    # nothing is checkpointed before the files are rotated
+    assert not self.checkpointer.checkpoint.called
+    self.stop_flag.set()
+    sink.join()
+    files = self.shard_files('shard0')
+    assert len(files) == 1
+    assert files[0].endswith('.raw.gz')
+    assert gzip.open(files[0]).read() == b'record0\nrecord2\n'
+    self.checkpointer.checkpoint.assert_any_call('shard0', '2')
+    self.checkpointer.checkpoint.assert_any_call('shard1', '3')
+
+  def test_size_rotation(self):
+    for i in range(0, 3):
+      self.queue.put(RecordBatch([{'SequenceNumber': str(i), 'Data': b'x' * 100}], 'shard0'))
+    sink = self.create_sink(compression='none', rotate_size=150)
+    sink.start()
+    time.sleep(1)
+    self.checkpointer.checkpoint.assert_called_with('shard0', '1')
+    # the third record is still in a .part file
+    files = self.shard_files('shard0')
+    assert len(files) == 2
+    assert files[1].endswith('.part') or files[0].endswith('.part')
+    self.stop_flag.set()
+    sink.join()
+    self.checkpointer.checkpoint.assert_called_with('shard0', '2')
+    assert len(self.shard_files('shard0')) == 2
+
+  def test_interval_rotation_with_busy_queue(self):
+    for i in range(0, 3):
+      self.queue.put(RecordBatch([{'SequenceNumber': str(i), 'Data': u'eA=='}], 'shard0'))
+    sink = self.create_sink(compression='none', rotate_interval=0)
+    sink.start()
+    time.sleep(1)
+    # every batch expired its file before the queue was empty
+    self.checkpointer.checkpoint.assert_any_call('shard0', '0')
+    self.checkpointer.checkpoint.assert_any_call('shard0', '1')
+    files = self.shard_files('shard0')
+    assert len(files) == 3
+    assert [open(path, 'rb').read() for path in files] == [b'x\n'] * 3
+    self.stop_flag.set()
+    sink.join()
@@ -1,4 +1,6 @@
+import datetime
 import time
+from botocore.exceptions import ClientError
 from kinesis_awscli_plugin.lib.recordspuller import RecordsPuller
 from mock import MagicMock
 from six.moves import queue as Queue
@@ -6,8 +8,9 @@ from threading import Event
 
 class TestRecordsPuller:
   def setUp(self):
+    self.records = [{'SequenceNumber': str(i), 'Data': u'eA=='} for i in range(1, 4)]
     self.kinesis_mock = MagicMock()
-    self.kinesis_mock.get_records = MagicMock(return_value = {'Records': [1,2,3], 'NextShardIterator': 'new_iterator'})
+    self.kinesis_mock.get_records = MagicMock(return_value = {'Records': self.records, 'NextShardIterator': 'new_iterator'})
     self.stop_flag = Event()
     self.queue = Queue.Queue()
     self.kinesis = MagicMock()
@@ -23,6 +26,99 @@ class TestRecordsPuller:
   def test_pull(self):
     self.rp.start()
     time.sleep(4)      
-    print "qsize: %s" % self.queue.qsize()
+    print("qsize: %s" % self.queue.qsize())
     # loop should at least run twice to make sure it works
     assert self.queue.qsize() > 2
+
+  def test_expired_iterator_is_rebuilt(self):
+    expired = ClientError({'Error': {'Code': 'ExpiredIteratorException', 'Message': 'expired'}}, 'GetRecords')
+    response = {'Records': self.records, 'NextShardIterator': 'new_iterator'}
+    self.kinesis_mock.get_records = MagicMock(side_effect = [response, expired] + [response] * 20)
+    iterator_factory = MagicMock(return_value = 'rebuilt_iterator')
+    rp = RecordsPuller(
+      self.stop_flag,
+      self.queue,
+      self.kinesis_mock,
+      'test',
+      100,
+      1,
+      shard_id='shard1',
+      iterator_factory=iterator_factory)
+    rp.start()
+    rp.join()
+    iterator_factory.assert_called_once_with('3')
+    assert self.kinesis_mock.get_records.call_args_list[2][1] == {'ShardIterator': 'rebuilt_iterator'}
+    assert self.queue.qsize() > 2
+    assert self.queue.get().shard_id == 'shard1'
+
+  def test_end_timestamp(self):
+    start = datetime.datetime(2016, 10, 22, 9, 0)
+    records = [{'SequenceNumber': str(i), 'Data': u'eA==', 'ApproximateArrivalTimestamp': start + datetime.timedelta(minutes=i)} for i in range(0, 6)]
+    self.kinesis_mock.get_records = MagicMock(side_effect = [
+      {'Records': records[0:3], 'NextShardIterator': 'second', 'MillisBehindLatest': 1000},
+      {'Records': records[3:6], 'NextShardIterator': 'third', 'MillisBehindLatest': 1000},
+    ])
+    rp = RecordsPuller(
+      self.stop_flag,
+      self.queue,
+      self.kinesis_mock,
+      'test',
+      10,
+      -1,
+      shard_id='shard1',
+      end_timestamp=start + datetime.timedelta(minutes=4))
+    rp.start()
+    rp.join(5)
+    assert rp.finished
+    # other shards keep pulling
+    assert not self.stop_flag.is_set()
+    batches = [self.queue.get() for i in range(0, 2)]
+    assert [len(batch) for batch in batches] == [3, 2]
+    assert batches[1].payload(1) == b'x'
+
+  def test_closed_shard(self):
+    self.kinesis_mock.get_records = MagicMock(return_value = {'Records': self.records, 'NextShardIterator': None})
+    self.rp.start()
+    self.rp.join(5)
+    assert self.rp.finished
+    assert self.rp.reached_shard_end
+    assert self.kinesis_mock.get_records.call_count == 1
+
+  def test_cli_records(self):
+    # records as the AWS CLI returns them, epoch seconds and base64 text
+    start = 1476962220.5
+    records = [{'SequenceNumber': str(i), 'Data': u'aGVsbG8=', 'ApproximateArrivalTimestamp': start + 60 * i} for i in range(0, 6)]
+    self.kinesis_mock.get_records = MagicMock(side_effect = [
+      {'Records': records[0:3], 'NextShardIterator': 'second', 'MillisBehindLatest': 1000},
+      {'Records': records[3:6], 'NextShardIterator': None, 'MillisBehindLatest': 1000},
+    ])
+    read_limiter = MagicMock()
+    rp = RecordsPuller(
+      self.stop_flag,
+      self.queue,
+      self.kinesis_mock,
+      'test',
+      10,
+      -1,
+      shard_id='shard1',
+      end_timestamp=datetime.datetime(2016, 10, 20, 11, 21),
+      read_limiter=read_limiter)
+    rp.start()
+    rp.join(5)
+    assert rp.finished
+    # the shard was closed after the end timestamp
+    assert not rp.reached_shard_end
+    # read limits count the decoded payloads
+    assert [call[0][0] for call in read_limiter.acquire_bytes.call_args_list] == [15, 15]
+    batches = [self.queue.get() for i in range(0, 2)]
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert batches[1].payload(0) == b'hello'
+    # the checkpoint stops at the last exported record
+    assert batches[1].last_sequence_number == '3'
+
+  def test_lag_tracker_counts_decoded_bytes(self):
+    lag_tracker = MagicMock()
+    self.rp.lag_tracker = lag_tracker
+    self.rp.process_response({'Records': self.records, 'NextShardIterator': 'next', 'MillisBehindLatest': 100})
+    # three records of 'eA==', one decoded byte each
+    lag_tracker.record.assert_called_once_with(None, 100, 3, 3)
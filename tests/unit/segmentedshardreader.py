@@ -0,0 +1,94 @@
+import base64
+import datetime
+
+from dateutil.tz import tzoffset
+from kinesis_awscli_plugin.lib.ratelimiter import ShardReadLimiter
+from kinesis_awscli_plugin.lib.segmentedshardreader import SegmentedShardReader
+from kinesis_awscli_plugin.lib.timeutils import TimeUtils
+from six.moves import queue as Queue
+from threading import Event
+
+
+class FakeShard:
+  '''
+  A shard with one record per minute. Shard iterators are record indexes.
+  '''
+  def __init__(self, start, record_count):
+    self.records = [{
+      'SequenceNumber': str(1000 + i),
+      'ApproximateArrivalTimestamp': start + datetime.timedelta(minutes=i),
+      'Data': b'%d' % i
+    } for i in range(0, record_count)]
+
+  def get_shard_iterator(self, stream_name, shard_id, shard_iterator_type, timestamp=None, sequence_number=None):
+    for index, record in enumerate(self.records):
+      if TimeUtils.to_naive_utc(record['ApproximateArrivalTimestamp']) >= \
+          TimeUtils.to_naive_utc(timestamp):
+        return index
+    return len(self.records)
+
+  def use_cli_records(self):
+    # epoch seconds and base64 text like the AWS CLI returns them
+    for record in self.records:
+      record['ApproximateArrivalTimestamp'] = TimeUtils.to_epoch(record['ApproximateArrivalTimestamp'])
+      record['Data'] = base64.b64encode(record['Data']).decode('ascii')
+
+  def get_records(self, ShardIterator, Limit=5):
+    records = self.records[ShardIterator:ShardIterator + Limit]
+    next_iterator = ShardIterator + len(records)
+    return {
+      'Records': records,
+      'NextShardIterator': next_iterator,
+      'MillisBehindLatest': 0 if next_iterator == len(self.records) else 1000
+    }
+
+
+class TestSegmentedShardReader:
+
+  def setUp(self):
+    self.start = datetime.datetime(2016, 10, 22, 9, 0)
+    self.shard = FakeShard(self.start, 120)
+    # the shard doubles as kinesis helper and client
+    self.shard.client = self.shard
+    self.stop_flag = Event()
+    self.queue = Queue.Queue()
+
+  def read(self, start_minute, end_minute, segments):
+    reader = SegmentedShardReader(
+      self.stop_flag,
+      self.queue,
+      self.shard,
+      'test',
+      'shard1',
+      self.start + datetime.timedelta(minutes=start_minute),
+      self.start + datetime.timedelta(minutes=end_minute),
+      segments)
+    reader.read_limiter = ShardReadLimiter(1000, 1024 * 1024)
+    reader.start()
+    reader.join(10)
+    assert not reader.is_alive()
+    sequence_numbers = []
+    while not self.queue.empty():
+      sequence_numbers.extend(record.sequence_number for record in self.queue.get())
+    return sequence_numbers
+
+  def test_segments_are_stitched_in_order(self):
+    sequence_numbers = self.read(10, 70, 4)
+    assert sequence_numbers == [str(1000 + i) for i in range(10, 71)]
+    assert not self.stop_flag.is_set()
+
+  def test_more_segments_than_records(self):
+    sequence_numbers = self.read(10, 11, 7)
+    assert sequence_numbers == ['1010', '1011']
+
+  def test_cli_records(self):
+    self.shard.use_cli_records()
+    sequence_numbers = self.read(10, 70, 4)
+    assert sequence_numbers == [str(1000 + i) for i in range(10, 71)]
+
+  def test_offset_aware_times(self):
+    # times like "2016-10-22T11:10:00+02:00" parsed by dateparser
+    self.shard.use_cli_records()
+    self.start = self.start.replace(tzinfo=tzoffset(None, 7200)) + datetime.timedelta(hours=2)
+    sequence_numbers = self.read(10, 70, 4)
+    assert sequence_numbers == [str(1000 + i) for i in range(10, 71)]
@@ -0,0 +1,27 @@
+from kinesis_awscli_plugin.lib.shardlineage import ShardLineage
+
+class TestShardLineage:
+
+  def setUp(self):
+    # shard0 was trimmed, shard1 split into shard3 and shard4 which merged
+    # into shard5
+    self.lineage = ShardLineage([
+      {'ShardId': 'shard1', 'ParentShardId': 'shard0'},
+      {'ShardId': 'shard2'},
+      {'ShardId': 'shard3', 'ParentShardId': 'shard1'},
+      {'ShardId': 'shard4', 'ParentShardId': 'shard1'},
+      {'ShardId': 'shard5', 'ParentShardId': 'shard3', 'AdjacentParentShardId': 'shard4'},
+    ])
+
+  def test_roots(self):
+    assert self.lineage.roots() == ['shard1', 'shard2']
+
+  def test_children_wait_for_all_parents(self):
+    assert self.lineage.ready_children('shard1', set(['shard1'])) == ['shard3', 'shard4']
+    assert self.lineage.ready_children('shard3', set(['shard1', 'shard3'])) == []
+    assert self.lineage.ready_children('shard4', set(['shard1', 'shard3', 'shard4'])) == ['shard5']
+    assert self.lineage.ready_children('shard2', set(['shard2'])) == []
+
+  def test_ready_shards(self):
+    assert self.lineage.ready_shards(set()) == ['shard1', 'shard2']
+    assert self.lineage.ready_shards(set(['shard1', 'shard3'])) == ['shard2', 'shard4']
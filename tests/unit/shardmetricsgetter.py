@@ -25,7 +25,8 @@ class TestShardMetricsGetter:
             "Unit": "Bytes"
         }, 
     ]
-    self.cloudwatch_helper_mock.get_metric_datapoints = MagicMock(return_value = self.get_metric_datapoints_response)
+    self.cloudwatch_helper_mock.get_metric_data = MagicMock(
+      side_effect = lambda queries, start_time, end_time: [self.get_metric_datapoints_response for _ in queries])
 
   def mock_shard_metrics_getter(self):
     return ShardMetricsGetter(
@@ -46,3 +47,33 @@ class TestShardMetricsGetter:
     metrics_getter = self.mock_shard_metrics_getter()
     values = metrics_getter.get_shard_datapoints('abc')
     assert len(values) == 3
+
+  def test_get_shard_metrics_single_request(self):
+    metrics_getter = self.mock_shard_metrics_getter()
+    metrics_getter.get()
+    assert self.cloudwatch_helper_mock.get_metric_data.call_count == 1
+    queries = self.cloudwatch_helper_mock.get_metric_data.call_args[0][0]
+    assert len(queries) == 2
+    assert queries[0]['MetricName'] == 'IncomingRecords'
+    assert queries[0]['Statistic'] == 'Average'
+
+  def test_get_shard_metrics_by_name(self):
+    shard_metrics_getter = self.mock_shard_metrics_getter()
+    metrics_by_name = shard_metrics_getter.get_shard_metrics_by_name(
+      ['Shard1', 'Shard2'], ['IncomingBytes', 'OutgoingBytes'])
+    # all metrics of all shards in one call
+    assert self.cloudwatch_helper_mock.get_metric_data.call_count == 1
+    queries = self.cloudwatch_helper_mock.get_metric_data.call_args[0][0]
+    assert [query['MetricName'] for query in queries] == [
+      'IncomingBytes', 'IncomingBytes', 'OutgoingBytes', 'OutgoingBytes']
+    assert sorted(metrics_by_name.keys()) == ['IncomingBytes', 'OutgoingBytes']
+    assert [metrics.metric_id for metrics in metrics_by_name['OutgoingBytes']] == ['Shard1', 'Shard2']
+
+  def test_get_matrices_in_batches(self):
+    self.kinesis_helper_mock.stream_shards = MagicMock(
+      return_value = ['Shard%d' % index for index in range(5)])
+    shard_metrics_getter = self.mock_shard_metrics_getter()
+    matrices = list(shard_metrics_getter.get_matrices(batch_size=2))
+    assert [matrix.metric_ids for matrix in matrices] == [
+      ['Shard0', 'Shard1'], ['Shard2', 'Shard3'], ['Shard4']]
+    assert self.cloudwatch_helper_mock.get_metric_data.call_count == 3
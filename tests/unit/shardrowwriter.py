@@ -0,0 +1,71 @@
+import datetime
+import json
+
+from six import StringIO
+from kinesis_awscli_plugin.lib.kinesismetrics import KinesisMetrics
+from kinesis_awscli_plugin.lib.metricsmatrix import MetricsMatrix
+from kinesis_awscli_plugin.lib.shardrowwriter import ShardRowWriter
+
+
+class TestShardRowWriter:
+  def setUp(self):
+    self.output = StringIO()
+    minutes = [datetime.datetime(2026, 10, 1, 12, minute) for minute in range(3)]
+    self.matrix = MetricsMatrix([
+      KinesisMetrics('Shard1', [
+        {'Timestamp': minute, 'Sum': value, 'Unit': 'Bytes'}
+        for minute, value in zip(minutes, [1.0, 2.0, 6.0])
+      ], 'Sum'),
+      KinesisMetrics('Shard2', [], 'Sum'),
+    ], 'Sum', use_numpy=False)
+
+  def test_jsonl(self):
+    writer = ShardRowWriter(self.output, 'jsonl', 'Sum')
+    assert writer.write_matrix(self.matrix) == 2
+    rows = [json.loads(line) for line in self.output.getvalue().splitlines()]
+    assert [row['ShardId'] for row in rows] == ['Shard1', 'Shard2']
+    assert rows[0]['DatapointAverage'] == 3.0
+    assert rows[0]['DatapointMaximum'] == 6.0
+    assert rows[0]['DatapointCount'] == 3
+    assert rows[0]['Datapoints'][0] == {
+      'Timestamp': '2026-10-01T12:00:00', 'Sum': 1.0, 'Unit': 'Bytes'}
+    assert rows[1]['DatapointCount'] == 0
+    assert rows[1]['Datapoints'] == []
+
+  def test_cli_timestamps(self):
+    # the AWS CLI returns the timestamps of CloudWatch as ISO8601 strings
+    matrix = MetricsMatrix([
+      KinesisMetrics('Shard1', [
+        {'Timestamp': '2026-10-01T12:00:00Z', 'Sum': 1.0, 'Unit': 'Bytes'}
+      ], 'Sum'),
+    ], 'Sum', use_numpy=False)
+    writer = ShardRowWriter(self.output, 'jsonl', 'Sum')
+    writer.write_matrix(matrix)
+    row = json.loads(self.output.getvalue())
+    assert row['Datapoints'] == [
+      {'Timestamp': '2026-10-01T12:00:00', 'Sum': 1.0, 'Unit': 'Bytes'}]
+
+  def test_jsonl_without_datapoints(self):
+    writer = ShardRowWriter(self.output, 'jsonl', 'Sum', include_datapoints=False)
+    writer.write_matrix(self.matrix)
+    row = json.loads(self.output.getvalue().splitlines()[0])
+    assert 'Datapoints' not in row
+    assert row['DatapointP50'] == 2.0
+
+  def test_csv(self):
+    writer = ShardRowWriter(self.output, 'csv', 'Sum')
+    writer.write_matrix(self.matrix)
+    writer.write_matrix(self.matrix)
+    lines = self.output.getvalue().splitlines()
+    # one header for all batches
+    assert lines[0] == 'ShardId,DatapointAverage,DatapointP50,DatapointP95,' \
+      'DatapointP99,DatapointMinimum,DatapointMaximum,DatapointCount'
+    assert lines[1] == 'Shard1,3.0,2.0,5.6,5.92,1.0,6.0,3'
+    assert len(lines) == 5
+
+  def test_invalid_format(self):
+    try:
+      ShardRowWriter(self.output, 'xml')
+      assert False
+    except ValueError:
+      pass
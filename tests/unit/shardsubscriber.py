@@ -0,0 +1,160 @@
+import json
+
+from botocore.exceptions import ClientError
+from kinesis_awscli_plugin.lib.shardsubscriber import ShardSubscriber
+from six.moves import queue as Queue
+from threading import Event
+
+
+class StubEventStream:
+  '''
+  Stand-in for botocore.eventstream.EventStream. It is built from raw
+  event stream messages, a dict of headers and a JSON payload, and parses
+  them like botocore: events of the SubscribeToShardEvent type are yielded
+  as {'SubscribeToShardEvent': payload}, other events like the initial
+  response are skipped and exception events are raised as a ClientError
+  (EventStreamError in botocore). The payload is parsed like the AWS CLI
+  does, Data stays base64 text and timestamps epoch seconds.
+  '''
+  def __init__(self, messages):
+    self.messages = messages
+    self.closed = False
+
+  def __iter__(self):
+    for headers, payload in self.messages:
+      if self.closed:
+        break
+      parsed = json.loads(payload.decode('utf-8'))
+      if headers[':message-type'] == 'exception':
+        raise ClientError(
+          {'Error': {'Code': headers[':exception-type'],
+                     'Message': parsed.get('message')}},
+          'SubscribeToShard')
+      if headers[':event-type'] == 'SubscribeToShardEvent':
+        yield {'SubscribeToShardEvent': parsed}
+
+  def close(self):
+    self.closed = True
+
+
+class FakeKinesis:
+  '''
+  Serves one subscription per list of messages, continuing at the
+  requested starting position.
+  '''
+  def __init__(self, subscriptions):
+    self.subscriptions = subscriptions
+    self.starting_positions = []
+    self.event_streams = []
+
+  def subscribe_to_shard(self, ConsumerARN, ShardId, StartingPosition):
+    self.starting_positions.append(StartingPosition)
+    event_stream = StubEventStream(self.subscriptions[len(self.event_streams)])
+    self.event_streams.append(event_stream)
+    return {'EventStream': event_stream}
+
+
+def message(event_type, payload, message_type='event'):
+  headers = {':message-type': message_type}
+  if message_type == 'exception':
+    headers[':exception-type'] = event_type
+  else:
+    headers[':event-type'] = event_type
+  return (headers, json.dumps(payload).encode('utf-8'))
+
+
+def initial_response():
+  return message('initial-response', {})
+
+
+def shard_event(sequence_numbers, continuation_sequence_number):
+  payload = {
+    'Records': [{'SequenceNumber': n,
+                 'PartitionKey': 'key',
+                 'ApproximateArrivalTimestamp': 1476962220.5,
+                 'Data': 'eA=='} for n in sequence_numbers],
+    'MillisBehindLatest': 0
+  }
+  if continuation_sequence_number is not None:
+    payload['ContinuationSequenceNumber'] = continuation_sequence_number
+  return message('SubscribeToShardEvent', payload)
+
+
+class TestShardSubscriber:
+
+  def setUp(self):
+    self.stop_flag = Event()
+    self.queue = Queue.Queue()
+    events = [
+      shard_event(['1', '2'], '2'),
+      shard_event([], '2'),
+      shard_event(['3'], '3'),
+      shard_event([], None),
+    ]
+    self.kinesis = FakeKinesis([[initial_response()] + events] +
+                               [[initial_response(), event] for event in events[1:]])
+
+  def create_subscriber(self):
+    return ShardSubscriber(
+      self.stop_flag,
+      self.queue,
+      self.kinesis,
+      'consumer-arn',
+      'shard1',
+      {'Type': 'LATEST'},
+      -1)
+
+  def test_events_are_queued_until_shard_is_closed(self):
+    subscriber = self.create_subscriber()
+    subscriber.start()
+    subscriber.join(5)
+    assert not subscriber.is_alive()
+    assert subscriber.subscription_count == 1
+    assert self.queue.qsize() == 2
+    batch = self.queue.get()
+    assert batch.shard_id == 'shard1'
+    assert batch.last_sequence_number == '2'
+    # the payloads are decoded once
+    assert batch.payload(0) == b'x'
+    assert batch.arrival_timestamp(0).microsecond == 500000
+    assert self.kinesis.event_streams[0].closed
+
+  def test_subscription_is_renewed(self):
+    subscriber = self.create_subscriber()
+    # renew the subscription after every event
+    subscriber.SUBSCRIPTION_DURATION = 0
+    subscriber.start()
+    subscriber.join(5)
+    assert subscriber.subscription_count == 4
+    assert self.kinesis.starting_positions[0] == {'Type': 'LATEST'}
+    assert self.kinesis.starting_positions[3] == {'Type': 'AFTER_SEQUENCE_NUMBER', 'SequenceNumber': '3'}
+    assert self.queue.qsize() == 2
+
+  def test_exception_event_resubscribes(self):
+    self.kinesis = FakeKinesis([
+      [initial_response(), shard_event(['1'], '1'),
+       message('InternalFailureException', {'message': 'try again'}, 'exception')],
+      [initial_response(), shard_event(['2'], None)],
+    ])
+    subscriber = self.create_subscriber()
+    subscriber.RESUBSCRIBE_DELAY = 0
+    subscriber.start()
+    subscriber.join(5)
+    assert not subscriber.is_alive()
+    assert not self.stop_flag.is_set()
+    assert self.kinesis.starting_positions[1] == {'Type': 'AFTER_SEQUENCE_NUMBER', 'SequenceNumber': '1'}
+    assert [self.queue.get().last_sequence_number for _ in range(2)] == ['1', '2']
+    assert self.kinesis.event_streams[0].closed
+
+  def test_other_exception_events_stop_the_reader(self):
+    self.kinesis = FakeKinesis([
+      [initial_response(),
+       message('ResourceNotFoundException', {'message': 'gone'}, 'exception')],
+    ])
+    subscriber = self.create_subscriber()
+    subscriber.start()
+    subscriber.join(5)
+    assert not subscriber.is_alive()
+    # BaseThread stops the other threads
+    assert self.stop_flag.is_set()
+    assert self.queue.qsize() == 0
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+
+from kinesis_awscli_plugin.lib.shmring import ShmRingReader, ShmRingWriter, shm_path
+
+class TestShmRing:
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'ring')
+    self.writer = ShmRingWriter(self.path, 64)
+
+  def tearDown(self):
+    self.writer.close()
+    shutil.rmtree(self.directory)
+
+  def read_all(self, reader):
+    messages = []
+    while True:
+      message = reader.read(timeout=0)
+      if message is None:
+        return messages
+      assert reader.valid()
+      messages.append(bytes(message))
+
+  def test_readers_have_own_cursors(self):
+    self.writer.write(b'before')
+    first = ShmRingReader(self.path)
+    oldest = ShmRingReader(self.path, 'oldest')
+    self.writer.write(b'first')
+    self.writer.write(b'second')
+    assert self.read_all(first) == [b'first', b'second']
+    assert self.read_all(oldest) == [b'before', b'first', b'second']
+    self.writer.write(b'third')
+    assert self.read_all(first) == [b'third']
+    assert self.read_all(oldest) == [b'third']
+    first.close()
+    oldest.close()
+
+  def test_messages_do_not_wrap(self):
+    reader = ShmRingReader(self.path)
+    written = []
+    for i in range(0, 20):
+      message = b'%02d' % i * (i % 5 + 1)
+      self.writer.write(message)
+      written.append(message)
+      assert self.read_all(reader) == [message]
+    reader.close()
+
+  def test_slow_readers_skip_overwritten_messages(self):
+    reader = ShmRingReader(self.path)
+    for i in range(0, 20):
+      self.writer.write(b'message%02d' % i)
+    messages = self.read_all(reader)
+    # only the messages that are still intact are read
+    assert 0 < len(messages) < 20
+    assert messages[-1] == b'message19'
+    assert reader.lost_bytes > 0
+    reader.close()
+
+  def test_overwritten_message_is_not_valid(self):
+    reader = ShmRingReader(self.path)
+    self.writer.write(b'message')
+    assert reader.read(timeout=0) is not None
+    for i in range(0, 10):
+      self.writer.write(b'overwrite')
+    assert not reader.valid()
+    reader.close()
+
+  def test_oversized_message(self):
+    try:
+      self.writer.write(b'x' * 40)
+      assert False
+    except ValueError:
+      pass
+
+  def test_replaced_buffer_is_reopened(self):
+    reader = ShmRingReader(self.path)
+    self.writer.close()
+    self.writer = ShmRingWriter(self.path, 64)
+    assert reader.read(timeout=0) is None
+    self.writer.write(b'new')
+    assert self.read_all(reader) == [b'new']
+    reader.close()
+
+  def test_shm_path(self):
+    assert shm_path('/tmp/ring') == '/tmp/ring'
+    assert shm_path('test').endswith('kinesis-cli-test')
@@ -26,7 +26,8 @@ class TestStreamMetricsGetter:
         "Unit": "Bytes"
       },
     ]
-    self.cloudwatch_helper_mock.get_metric_datapoints = MagicMock(return_value = self.get_metric_datapoints_response)
+    self.cloudwatch_helper_mock.get_metric_data = MagicMock(
+      side_effect = lambda queries, start_time, end_time: [self.get_metric_datapoints_response for _ in queries])
 
   def mock_stream_metrics_getter(self):
     return StreamMetricsGetter(
@@ -41,3 +42,11 @@ class TestStreamMetricsGetter:
     metrics = metrics_getter.get(['metric1', 'metric2'])  
     assert len(metrics) == 2
     assert metrics[0].datapoint_average == 6.0
+
+  def test_get_single_request(self):
+    metrics_getter = self.mock_stream_metrics_getter()
+    metrics = metrics_getter.get(['metric1', 'metric2'])
+    assert self.cloudwatch_helper_mock.get_metric_data.call_count == 1
+    queries = self.cloudwatch_helper_mock.get_metric_data.call_args[0][0]
+    assert [query['MetricName'] for query in queries] == ['metric1', 'metric2']
+    assert [metric.metric_id for metric in metrics] == ['metric1', 'metric2']
@@ -1,3 +1,6 @@
+import datetime
+
+from dateutil.tz import tzutc
 from kinesis_awscli_plugin.lib.timeutils import TimeUtils
 
 class TestTimeUtils:
@@ -6,3 +9,20 @@ class TestTimeUtils:
      is_available = TimeUtils.dateparser_available()
      assert (is_available == True or is_available == False)
 
+
+  def test_parse_timestamp(self):
+    expected = datetime.datetime(2016, 10, 20, 11, 17, 0, 500000)
+    # Kinesis responses of the AWS CLI
+    assert TimeUtils.parse_timestamp(1476962220.5) == expected
+    assert TimeUtils.parse_timestamp(u'1476962220.5') == expected
+    # CloudWatch responses of the AWS CLI
+    assert TimeUtils.parse_timestamp(u'2016-10-20T11:17:00Z') == expected.replace(microsecond=0)
+    assert TimeUtils.parse_timestamp('2016-10-20T13:17:00.500+02:00') == expected
+    assert TimeUtils.parse_timestamp(expected.replace(tzinfo=tzutc())) == expected
+    assert TimeUtils.parse_timestamp(None) is None
+
+  def test_to_epoch(self):
+    assert TimeUtils.to_epoch(1476962220.5) == 1476962220.5
+    assert TimeUtils.to_epoch(u'2016-10-20T11:17:00Z') == 1476962220.0
+    assert TimeUtils.to_epoch(datetime.datetime(2016, 10, 20, 11, 17)) == 1476962220.0
+    assert TimeUtils.to_naive_utc(u'2016-10-20T11:17:00Z') == datetime.datetime(2016, 10, 20, 11, 17)